@@ -1,18 +1,22 @@
 #!/usr/bin/env python
 
 import sys
-import pandas as pd
 from warnings import warn
 
-from civaclib.parseTiters import (
-    getPRNTDiscrete,
-    parseTiterExcel,
-    convertRawCountsToDiscreteDf,
-    convertRawCountsToNeutcurveDf,
-    getPRNTContinuous,
-)
-from civaclib.common import titerSteps
+import pandas as pd
 
+from civaclib.cache import FitCache, loadParsedTiters
+from civaclib.common import VIRUSES
+from civaclib.parseTiters import FITTERS
+from civaclib.plate import Plate
+from civaclib.titerTable import (
+    METHODS,
+    TITER_STEP_ADAPTATIONS,
+    makeConfidenceIntervals,
+    makeTiterTableFiles,
+    makeTiterTables,
+    streamTiterTables,
+)
 
 if __name__ == "__main__":
     import argparse
@@ -26,7 +30,24 @@ if __name__ == "__main__":
         help=(
             "The name of the file containing the raw data. See "
             "`data/220706-hamster/PRNT_Hamster_compressed.csv` for a "
-            "template of the file format."
+            "template of the file format. This can also be an .xlsx "
+            "workbook with the same layout."
+        ),
+    )
+
+    parser.add_argument(
+        "--sheet",
+        help=(
+            "The name of the sheet to read if --rawTiters is an .xlsx "
+            "workbook. Defaults to the first sheet."
+        ),
+    )
+
+    parser.add_argument(
+        "--cellRange",
+        help=(
+            "The range of cells (e.g. A1:GT126) to read if --rawTiters is an "
+            ".xlsx workbook. Defaults to the whole sheet."
         ),
     )
 
@@ -60,13 +81,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "--method",
         default="continuous-fixtop-fixbottom",
-        choices=(
-            "discrete",
-            "continuous-fixtop-fixbottom",
-            "continuous-fixtop",
-            "continuous-fixbottom",
-            "continuous",
-        ),
+        choices=METHODS,
         help="The method used to calculate the titers.",
     )
 
@@ -84,210 +99,267 @@ if __name__ == "__main__":
     )
 
     parser.add_argument(
-        "--fixedTiterFile", default=False, help="A csv file of fixed titers."
+        "--jobs",
+        default=1,
+        type=int,
+        help=(
+            "The number of processes to fit the curves of continuous titers "
+            "in. The titer table is the same for any number of processes."
+        ),
     )
 
     parser.add_argument(
-        "--adaptTiterSteps",
-        default=False,
+        "--output",
+        action="append",
+        nargs="+",
+        metavar="ARG",
         help=(
-            "Specify if titersteps other than the default titersteps "
-            "specified in common.titerSteps should be used. This can be "
-            "done by giving keywords corresponding for different "
-            "alternative titersteps for particular variant and sera "
-            "combinations. For the adaptations to the BN.1.3.1 and XBB.2 "
-            'use "230219-xbb2-bn131".'
+            "Make several titer tables in one run, fitting each curve only "
+            "once. Give the method, the limit, the name of the file to write "
+            "the table to and optionally a fixed titer file, e.g. --output "
+            "discrete 50 titers-discrete-50.csv adaptations-discrete-50.csv. "
+            "May be repeated. If given, --method and --limit are ignored and "
+            "nothing is written to standard output."
         ),
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only calculate the titers of pairs whose plaque counts changed "
+            "since the --output tables were last made. A hash of each "
+            "serum/virus/replicate block and the titers calculated from it "
+            "are stored next to each table, in a file ending in "
+            "'.blocks.json'. Changing the method, limit, --interpolate, --nd "
+            "or --fitter of a table calculates all its titers again."
+        ),
+    )
 
-    assert args.adaptTiterSteps in {
-        "230219-xbb2-bn131",
-        False,
-    }, "Specify a valid adaptTiterSteps argument."
+    parser.add_argument(
+        "--long",
+        metavar="FILE",
+        help=(
+            "Write the titers to a long-format CSV file (serum, virus, "
+            "method, limit, titer, flags) as each chunk of pairs is done, "
+            "and make the tables from it at the end. If the file exists, "
+            "e.g. because an earlier run was interrupted, only the titers "
+            "missing from it are calculated. A key of the plaque counts and "
+            "options is stored in FILE.key, and the file is started over if "
+            "they changed."
+        ),
+    )
 
-    if args.fixedTiterFile:
-        fixedTiters = pd.read_csv(args.fixedTiterFile)
-    else:
-        fixedTiters = False
-
-    viruses = [
-        "SARS-CoV-2_WT (984)",
-        "SARS-CoV-2_Alpha (21528)",
-        "SARS-CoV-2_Beta (22131)",
-        "SARS-CoV-2_Delta (25853_23)",
-        "SARS-CoV-2_BA.1 (26335)",
-        "SARS-CoV-2_BA.2 (26729_12)",
-        "SARS-CoV-2_BA.2 (26729_2)",
-        "rSARS-CoV-2_B.1+E484K",
-        "SARS-CoV-2_BA.4",
-        "SARS-CoV-2_BA.5",
-        "SARS-CoV-2_Mu",
-        "BQ.1.18",
-        "BF.7",
-        "BN.1.3.1",
-        "XBB.2",
-        "EG.5.1 (V140)",
-        "JN.1 (V148)",
-    ]
-    raw = parseTiterExcel(
-        args.rawTiters,
-        args.rowTiterStart,
-        args.serumColumnsStart,
-        viruses,
-        addAverage=True,
+    parser.add_argument(
+        "--fitter",
+        default="neutcurve",
+        choices=FITTERS,
+        help=(
+            "How to fit the curves of continuous titers. 'neutcurve' fits "
+            "them one at a time, 'batch' fits all curves at once, which is "
+            "much faster. Batch fits that don't converge are done again with "
+            "neutcurve, but titers of poorly determined curves (e.g. very "
+            "steep or nearly flat ones) can differ slightly from those of "
+            "neutcurve."
+        ),
     )
 
-    titers = []
+    parser.add_argument(
+        "--noFitCache",
+        action="store_true",
+        help=(
+            "Fit all curves again instead of reusing curves fitted to the "
+            "same data in previous runs."
+        ),
+    )
 
-    if args.method == "discrete":
-        if args.interpolate:
-            raise ValueError("method=discrete cannot interpolate titers.")
-    else:
-        if args.interpolate and not args.fixedTiterFile:
-            warn(
-                "You should probably specify a fixed titer file when "
-                "interpolating titers."
-            )
+    parser.add_argument(
+        "--fitStats",
+        metavar="FILE",
+        help=(
+            "Write a CSV file describing each continuous fit: the wall time, "
+            "the number of iterations (batch fitter only), whether it "
+            "converged, the residual sum of squares, the fitted parameters "
+            "and, for each limit, the titer and whether it was read from the "
+            "curve, interpolated, not reached (a nan titer) or is a bound. "
+            "Useful for finding pairs that are slow to fit or badly behaved."
+        ),
+    )
 
-    for virus in viruses:
-        for serum in set(raw["sample ID"]):
-            # Figure out which titersteps to use
-            if args.adaptTiterSteps == "230219-xbb2-bn131":
-                if serum in {
-                    "1.1",
-                    "1.2",
-                    "1.3",
-                    "5.1",
-                    "5.2",
-                    "5.3",
-                    "9.1",
-                    "9.2",
-                    "9.3",
-                } and virus in {"BN.1.3.1", "XBB.2"}:
-                    ts = [
-                        "1:20",
-                        "1:40",
-                        "1:54",
-                        "1:108",
-                        "1:216",
-                        "1:432",
-                        "1:864",
-                        "1:1728",
-                        "1:5120",
-                    ]
-                elif serum in {"8.1", "8.2", "8.3"} and virus == "XBB.2":
-                    ts = [
-                        "1:20",
-                        "1:32",
-                        "1:65",
-                        "1:130",
-                        "1:259",
-                        "1:518",
-                        "1:1037",
-                        "1:2560",
-                        "1:5120",
-                    ]
-                elif serum == "8.3" and virus == "BN.1.3.1":
-                    ts = [
-                        "1:20",
-                        "1:32",
-                        "1:65",
-                        "1:130",
-                        "1:259",
-                        "1:518",
-                        "1:1037",
-                        "1:2560",
-                        "1:5120",
-                    ]
-                else:
-                    ts = titerSteps
-            else:
-                ts = titerSteps
-
-            rawSubset = raw.loc[(raw["Antigen"] == virus) & (raw["sample ID"] == serum)]
-
-            rawSubset.columns = [
-                "sample ID",
-                "Infektion Hamster",
-                "Antigen",
-                "Viruskontrolle",
-                "Replicate",
-            ] + ts
-
-            if args.method == "discrete":
-                reformattedDf = convertRawCountsToDiscreteDf(
-                    rawSubset, customTiterSteps=ts
-                )
+    parser.add_argument(
+        "--confidenceIntervals",
+        metavar="FILE",
+        help=(
+            "Write a CSV file with bootstrap confidence intervals of the "
+            "continuous titers of each pair, for each continuous table made. "
+            "The replicate points of each dilution are resampled and the "
+            "curves refitted with the batch fitter. The intervals don't "
+            "take fixed titers or interpolation into account."
+        ),
+    )
+
+    parser.add_argument(
+        "--resamples",
+        default=1000,
+        type=int,
+        help="The number of bootstrap resamples for --confidenceIntervals.",
+    )
+
+    parser.add_argument(
+        "--confidence",
+        default=0.95,
+        type=float,
+        help="The confidence level of --confidenceIntervals.",
+    )
+
+    parser.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help=(
+            "The random seed for --confidenceIntervals. The intervals only "
+            "depend on the seed, not on the number of --jobs."
+        ),
+    )
 
-                d = {titerStep: list(reformattedDf[titerStep])[0] for titerStep in ts}
+    parser.add_argument(
+        "--fixedTiterFile", default=False, help="A csv file of fixed titers."
+    )
 
-                prnt = getPRNTDiscrete(d, limit=args.limit, steps=ts, nd=args.nd)
+    parser.add_argument(
+        "--adaptTiterSteps",
+        default=False,
+        help=(
+            "Specify if titersteps other than the default titersteps "
+            "specified in common.titerSteps should be used. This can be "
+            "done by giving the name of a set of alternative titersteps for "
+            "particular variant and sera combinations, listed in "
+            "civaclib/titer-step-adaptations.csv. For the adaptations to the "
+            'BN.1.3.1 and XBB.2 use "230219-xbb2-bn131".'
+        ),
+    )
 
-                titers.append([serum, virus, prnt])
+    args = parser.parse_args()
 
-            else:
-                # Continuous titers
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
 
-                reformattedDf = convertRawCountsToNeutcurveDf(
-                    rawSubset, customTiterSteps=ts
-                )
+    if args.incremental and args.long:
+        parser.error("--incremental and --long cannot be used together.")
 
-                if args.method == "continuous-fixtop-fixbottom":
-                    fixtop = True
-                    fixbottom = True
-                elif args.method == "continuous-fixtop":
-                    fixtop = True
-                    fixbottom = False
-                elif args.method == "continuous-fixbottom":
-                    fixtop = False
-                    fixbottom = True
-                else:
-                    fixtop = False
-                    fixbottom = False
-
-                prnt, curve = getPRNTContinuous(
-                    reformattedDf,
-                    fixtop=fixtop,
-                    fixbottom=fixbottom,
-                    interpolate=args.interpolate,
-                    limit=args.limit,
-                )
+    if args.resamples < 1:
+        parser.error("--resamples must be at least 1.")
 
-                titers.append((serum, virus, prnt))
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be between 0 and 1.")
 
-    titersLong = pd.DataFrame(titers, columns=["serum", "virus", "prnt"])
+    assert (
+        not args.adaptTiterSteps or args.adaptTiterSteps in TITER_STEP_ADAPTATIONS
+    ), "Specify a valid adaptTiterSteps argument."
 
-    # Replace the previously specified fixed titers
-    if fixedTiters is not False:
-        for i, row in fixedTiters.iterrows():
-            origTiter = str(
-                titersLong.loc[
-                    (titersLong.serum == str(row["serum"]))
-                    & (titersLong.virus == row["virus"]),
-                    "prnt",
-                ].values[0]
+    if args.output:
+        if args.fixedTiterFile:
+            parser.error(
+                "Give the fixed titer files of the tables to --output instead "
+                "of using --fixedTiterFile."
             )
+        tables = []
+        for output in args.output:
+            if len(output) not in {3, 4}:
+                parser.error(
+                    "--output takes a method, a limit, an output file and "
+                    "optionally a fixed titer file."
+                )
+            method, limit, outputFile = output[:3]
+            if method not in METHODS:
+                parser.error(f"Unknown method {method!r} given to --output.")
             try:
-                expectedOrig = f'{row["prntOrig"]:.2f}'
+                limit = int(limit)
             except ValueError:
-                # Deal with '<' and '>' expected original titers
-                expectedOrig = row["prntOrig"]
-
-            if origTiter == expectedOrig:
-                titersLong.loc[
-                    (titersLong.serum == str(row["serum"]))
-                    & (titersLong.virus == row["virus"]),
-                    "prnt",
-                ] = row["prnt"]
-            else:
-                raise ValueError(
-                    f'For {row["serum"]} vs {row["virus"]}, the original '
-                    f'titers differ ({origTiter} vs {row["prntOrig"]}).'
+                parser.error(f"Invalid limit {limit!r} given to --output.")
+            tables.append(
+                (method, limit, output[3] if len(output) == 4 else None, outputFile)
+            )
+    else:
+        if args.incremental:
+            parser.error("--incremental can only be used with --output.")
+        tables = [(args.method, args.limit, args.fixedTiterFile, None)]
+
+    viruses = VIRUSES
+    raw = Plate(
+        loadParsedTiters(
+            args.rawTiters,
+            args.rowTiterStart,
+            args.serumColumnsStart,
+            viruses,
+            sheet=args.sheet,
+            cellRange=args.cellRange,
+        )
+    )
+
+    for method, _, fixedTiterFile, _ in tables:
+        if method == "discrete":
+            # Interpolation only applies to continuous titers when making
+            # several tables at once.
+            if args.interpolate and not args.output:
+                raise ValueError("method=discrete cannot interpolate titers.")
+        else:
+            if args.interpolate and not fixedTiterFile:
+                warn(
+                    "You should probably specify a fixed titer file when "
+                    "interpolating titers."
                 )
 
-    # Convert from long to wide format
-    titersWide = pd.pivot(titersLong, index="virus", columns="serum", values="prnt")
+    fitStats = None if args.fitStats is None else []
 
-    titersWide.to_csv(sys.stdout)
+    options = dict(
+        adaptTiterSteps=args.adaptTiterSteps,
+        interpolate=args.interpolate,
+        nd=args.nd,
+        jobs=args.jobs,
+        fitter=args.fitter,
+        fitCache=None if args.noFitCache else FitCache(),
+        fitStats=fitStats,
+    )
+
+    if args.long:
+        titersWide = streamTiterTables(
+            raw,
+            viruses,
+            [
+                (method, limit, fixedTiterFile)
+                for method, limit, fixedTiterFile, _ in tables
+            ],
+            args.long,
+            **options,
+        )
+        for (_, _, _, outputFile), table in zip(tables, titersWide):
+            table.to_csv(outputFile or sys.stdout)
+    elif args.output:
+        calculated = makeTiterTableFiles(
+            raw, viruses, tables, incremental=args.incremental, **options
+        )
+        if args.incremental:
+            for (_, _, _, outputFile), count in zip(tables, calculated):
+                print(f"{outputFile}: calculated {count} titers.", file=sys.stderr)
+    else:
+        ((method, limit, fixedTiterFile, _),) = tables
+        (table,) = makeTiterTables(
+            raw, viruses, [(method, limit, fixedTiterFile)], **options
+        )
+        table.to_csv(sys.stdout)
+
+    if fitStats is not None:
+        pd.DataFrame(fitStats).to_csv(args.fitStats, index=False)
+
+    if args.confidenceIntervals:
+        makeConfidenceIntervals(
+            raw,
+            viruses,
+            [(method, limit) for method, limit, _, _ in tables],
+            adaptTiterSteps=args.adaptTiterSteps,
+            resamples=args.resamples,
+            confidence=args.confidence,
+            seed=args.seed,
+            jobs=args.jobs,
+        ).to_csv(args.confidenceIntervals, index=False)
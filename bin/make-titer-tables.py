@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import sys
+
+import pandas as pd
+
+from civaclib.cache import FitCache
+from civaclib.manifest import buildManifest, readManifest
+from civaclib.parseTiters import FITTERS
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Make all the titer tables listed in a manifest file in one run."
+    )
+
+    parser.add_argument(
+        "manifest",
+        help=(
+            "The name of the manifest, a CSV file with one titer table per "
+            "row and rawTiters, method, limit, fixedTiterFile, "
+            "adaptTiterSteps, interpolate (true or false) and output "
+            "columns. Optional sheet, cellRange, rowTiterStart, "
+            "serumColumnsStart and nd columns are used like the "
+            "make-titer-table.py options of the same names. File names are "
+            "relative to the directory of the manifest."
+        ),
+    )
+
+    parser.add_argument(
+        "--jobs",
+        default=1,
+        type=int,
+        help=(
+            "The number of processes to fit the curves of continuous titers "
+            "in. The titer tables are the same for any number of processes."
+        ),
+    )
+
+    parser.add_argument(
+        "--fitter",
+        default="neutcurve",
+        choices=FITTERS,
+        help="How to fit the curves of continuous titers (see make-titer-table.py).",
+    )
+
+    parser.add_argument(
+        "--noFitCache",
+        action="store_true",
+        help=(
+            "Fit all curves again instead of reusing curves fitted to the "
+            "same data in previous runs."
+        ),
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only calculate the titers of pairs whose plaque counts changed "
+            "since the tables were last made (see make-titer-table.py)."
+        ),
+    )
+
+    parser.add_argument(
+        "--fitStats",
+        metavar="FILE",
+        help="Write a CSV file describing each continuous fit.",
+    )
+
+    args = parser.parse_args()
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
+
+    try:
+        entries = readManifest(args.manifest)
+    except ValueError as e:
+        parser.error(str(e))
+
+    fitStats = None if args.fitStats is None else []
+
+    calculated = buildManifest(
+        entries,
+        jobs=args.jobs,
+        fitter=args.fitter,
+        fitCache=None if args.noFitCache else FitCache(),
+        fitStats=fitStats,
+        incremental=args.incremental,
+    )
+
+    if fitStats is not None:
+        pd.DataFrame(fitStats).to_csv(args.fitStats, index=False)
+
+    for entry in entries:
+        print(
+            f"{entry['output']}: calculated {calculated[entry['output']]} titers.",
+            file=sys.stderr,
+        )
@@ -0,0 +1,227 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .hill import (
+    PARAMETERS,
+    _padData,
+    fitHillArrays,
+    fitHillCurves,
+    locateICXX,
+    titerBounds,
+)
+
+
+def _replicateGroups(cs, mask):
+    """
+    Find the points of each pair that were measured at the same
+    concentration, i.e. the replicates of each dilution.
+
+    @param cs: a C{numpy.ndarray} of concentrations with one row per pair,
+        sorted in each row, as made by C{hill._padData}.
+    @param mask: a C{bool} C{numpy.ndarray} that is C{True} for the data
+        points.
+    @return: a C{tuple} of two C{int} C{numpy.ndarray}s with the shape of
+        C{cs}: the index of the first point of the dilution of each point
+        and the number of points of that dilution.
+    """
+    starts = np.zeros(cs.shape, dtype=int)
+    sizes = np.ones(cs.shape, dtype=int)
+    for i in range(len(cs)):
+        n = mask[i].sum()
+        _, first, counts = np.unique(cs[i, :n], return_index=True, return_counts=True)
+        starts[i, :n] = np.repeat(first, counts)
+        sizes[i, :n] = np.repeat(counts, counts)
+    return starts, sizes
+
+
+def resampleReplicates(fs, starts, sizes, resamples, rng):
+    """
+    Resample the replicate points of many pairs. At each dilution, as many
+    points as were measured are drawn with replacement from the replicates
+    of that dilution.
+
+    @param fs: a C{numpy.ndarray} of fraction infectivities with one row per
+        pair.
+    @param starts: the C{numpy.ndarray} of first points returned by
+        C{_replicateGroups}.
+    @param sizes: the C{numpy.ndarray} of dilution sizes returned by
+        C{_replicateGroups}.
+    @param resamples: the C{int} number of resamples.
+    @param rng: a C{numpy.random.Generator}.
+    @return: a C{numpy.ndarray} of resampled fraction infectivities of shape
+        (resamples, pairs, points).
+    """
+    draws = starts + (rng.random((resamples,) + fs.shape) * sizes).astype(int)
+    return fs[np.arange(len(fs))[:, np.newaxis], draws]
+
+
+def _bootstrapChunk(
+    cs, fs, mask, initial, limits, fixtop, fixbottom, resamples, seedSequence
+):
+    """
+    Fit the curves of a chunk of resamples of all pairs and read out their
+    titers. This is the unit of work run in each process by
+    C{bootstrapTiters}.
+
+    @param seedSequence: the C{numpy.random.SeedSequence} of this chunk.
+    @return: a C{dict} mapping each limit to a C{numpy.ndarray} of titers of
+        shape (resamples, pairs). Titers above the highest dilution are
+        C{inf}, those below the lowest dilution 0, and those of fits that
+        didn't converge C{nan}.
+    """
+    nPairs, nPoints = cs.shape
+    starts, sizes = _replicateGroups(cs, mask)
+    resampled = resampleReplicates(
+        fs, starts, sizes, resamples, np.random.default_rng(seedSequence)
+    )
+
+    fits = fitHillArrays(
+        np.tile(cs, (resamples, 1)),
+        resampled.reshape(-1, nPoints),
+        np.tile(mask, (resamples, 1)),
+        fixtop=fixtop,
+        fixbottom=fixbottom,
+        initial={name: np.tile(initial[name], resamples) for name in PARAMETERS},
+    )
+
+    lowest = np.tile(cs[:, 0], resamples)
+    highest = np.tile(cs[np.arange(nPairs), mask.sum(axis=1) - 1], resamples)
+    titers = {}
+    for limit in limits:
+        icXX, inRange, below = locateICXX(
+            *(fits[name] for name in PARAMETERS), lowest, highest, limit / 100
+        )
+        limitTiters = np.where(inRange, 1 / icXX, np.where(below, np.inf, 0.0))
+        limitTiters[~fits["converged"]] = np.nan
+        titers[limit] = limitTiters.reshape(resamples, nPairs)
+
+    return titers
+
+
+def _formatTiter(titer, aboveBound, belowBound):
+    """
+    Format a bootstrapped titer like the titers of
+    C{parseTiters.getContinuousTiters}.
+
+    @param titer: a C{float} titer, C{inf} if above the highest dilution and
+        0 if below the lowest dilution.
+    @param aboveBound: the C{int} bound for titers above the highest
+        dilution (see C{hill.titerBounds}).
+    @param belowBound: the C{int} bound for titers below the lowest
+        dilution.
+    @return: a C{str} titer.
+    """
+    if titer == np.inf:
+        return f">{aboveBound}"
+    elif titer == 0:
+        return f"<{belowBound}"
+    else:
+        return f"{titer:.2f}"
+
+
+def bootstrapTiters(
+    datasets,
+    limits=(50,),
+    fixtop=True,
+    fixbottom=True,
+    resamples=1000,
+    confidence=0.95,
+    seed=0,
+    jobs=1,
+    chunkSize=100,
+):
+    """
+    Get bootstrap confidence intervals of the continuous titers of many
+    serum/virus pairs. The replicate points of each dilution are resampled
+    with replacement and the curves refitted, all pairs and a chunk of
+    resamples at a time with C{hill.fitHillArrays}, starting from the curves
+    fitted to the data. The intervals are percentiles of the titers of the
+    resamples whose fits converged.
+
+    Each chunk of resamples has its own random stream, spawned from C{seed},
+    so the intervals only depend on the seed and the chunk size, not on the
+    number of processes.
+
+    @param datasets: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair.
+    @param limits: an iterable of C{int} levels of sensitivity, e.g. [50, 90].
+    @param fixtop: Fix the top of the neutralisation curve at 1.
+    @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+    @param resamples: the C{int} number of resamples.
+    @param confidence: the C{float} confidence level of the intervals.
+    @param seed: the C{int} seed of the random streams.
+    @param jobs: the C{int} number of processes to fit the resamples in.
+    @param chunkSize: the C{int} number of resamples fitted at a time.
+    @return: a C{dict} mapping each limit to a C{dict} with 'lower' and
+        'upper' C{list}s of C{str} titers and a 'resamples' C{list} with the
+        C{int} number of converged resamples, one per pair. Pairs without
+        data have '*' bounds and 0 resamples, and pairs without converged
+        resamples '*' bounds.
+    """
+    datasets = list(datasets)
+    limits = list(limits)
+    fitted = [i for i, data in enumerate(datasets) if data.shape[0]]
+
+    result = {
+        limit: {
+            "lower": ["*"] * len(datasets),
+            "upper": ["*"] * len(datasets),
+            "resamples": [0] * len(datasets),
+        }
+        for limit in limits
+    }
+    if not fitted:
+        return result
+
+    fitData = [datasets[i] for i in fitted]
+    cs, fs, mask = _padData(fitData)
+    initial = fitHillCurves(fitData, fixtop=fixtop, fixbottom=fixbottom)
+    # Start the resamples of pairs whose fit didn't converge from the same
+    # initial guess as neutcurve.
+    for name in PARAMETERS:
+        initial[name][~initial["converged"]] = np.nan
+
+    chunks = [
+        min(chunkSize, resamples - start) for start in range(0, resamples, chunkSize)
+    ]
+    seedSequences = np.random.SeedSequence(seed).spawn(len(chunks))
+    args = (cs, fs, mask, initial, limits, fixtop, fixbottom)
+
+    if jobs == 1 or len(chunks) < 2:
+        results = [
+            _bootstrapChunk(*args, size, seedSequence)
+            for size, seedSequence in zip(chunks, seedSequences)
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(_bootstrapChunk, *args, size, seedSequence)
+                for size, seedSequence in zip(chunks, seedSequences)
+            ]
+            results = [future.result() for future in futures]
+
+    lowest = cs[np.arange(len(cs)), mask.sum(axis=1) - 1]
+    aboveBounds = titerBounds(cs[:, 0], above=True)
+    belowBounds = titerBounds(lowest, above=False)
+    alpha = (1 - confidence) / 2
+    for limit in limits:
+        titers = np.concatenate([chunk[limit] for chunk in results])
+        for pair, i in enumerate(fitted):
+            pairTiters = titers[:, pair]
+            pairTiters = pairTiters[~np.isnan(pairTiters)]
+            result[limit]["resamples"][i] = len(pairTiters)
+            if len(pairTiters):
+                # Take titers of actual resamples, so that bounds such as
+                # '>5120' are not interpolated.
+                lower, upper = np.quantile(
+                    pairTiters, [alpha, 1 - alpha], method="inverted_cdf"
+                )
+                result[limit]["lower"][i] = _formatTiter(
+                    lower, aboveBounds[pair], belowBounds[pair]
+                )
+                result[limit]["upper"][i] = _formatTiter(
+                    upper, aboveBounds[pair], belowBounds[pair]
+                )
+
+    return result
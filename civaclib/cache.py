@@ -0,0 +1,620 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import neutcurve
+import numpy as np
+import pandas as pd
+
+from .common import TOPDIR, titerSteps
+from .hill import makeHillCurve
+from .parseTiters import parseTiterExcel
+
+# Increment this whenever the output of parseTiterExcel changes, so that
+# previously cached files are not used anymore.
+CACHE_VERSION = 1
+
+# Increment this whenever hill.py fitting changes (the batch fitter or the
+# curves made by makeHillCurve), so that previously cached fits are not used
+# anymore. Fits by neutcurve are also keyed on its version.
+FIT_CACHE_VERSION = 1
+
+# Increment this whenever the titers calculated from the same plaque counts
+# change, so that titers stored next to titer tables (see writeTableState)
+# are calculated again.
+TABLE_STATE_VERSION = 1
+
+CACHE_DIR = Path(os.environ.get("CIVACLIB_CACHE_DIR", Path(TOPDIR) / ".cache"))
+
+# The kinds of values that can be stored in an object column.
+_NUMBER = 0
+_TEXT = 1
+
+
+def hashFile(fileName):
+    """
+    Calculate the SHA256 hash of the contents of a file.
+
+    @param fileName: the C{str} name of the file to hash.
+    @return: the C{str} hex digest of the file contents.
+    """
+    sha = hashlib.sha256()
+    with open(fileName, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def parsedTitersKey(
+    fileName,
+    rowTiterStart,
+    serumColumnsStart,
+    viruses,
+    serumColumnsNames=None,
+    sheet=None,
+    cellRange=None,
+):
+    """
+    Get the cache key for parsing a file with C{parseTiterExcel}. The key
+    depends on the contents of the file and on all parse parameters.
+
+    @param fileName: the C{str} filename of the file with the raw counts.
+    @param rowTiterStart: the C{int} index of the row on which the titrations
+        start.
+    @param serumColumnsStart: the C{int} index of the column of the first
+        virus.
+    @param viruses: a C{list} of virus names that the sera were titrated
+        against.
+    @param serumColumnsNames: a C{list} of column headers present for all
+        viruses.
+    @param sheet: the C{str} name of the sheet to read from a workbook.
+    @param cellRange: a C{str} range of cells to read from a workbook.
+    @return: a C{str} hex digest.
+    """
+    params = {
+        "version": CACHE_VERSION,
+        "file": hashFile(fileName),
+        "rowTiterStart": rowTiterStart,
+        "serumColumnsStart": serumColumnsStart,
+        "viruses": list(viruses),
+        "serumColumnsNames": list(serumColumnsNames or titerSteps),
+        "sheet": sheet,
+        "cellRange": cellRange,
+    }
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+
+def _encodeColumn(name, column):
+    """
+    Convert a C{pandas.Series} into C{numpy} arrays that can be saved without
+    pickling.
+
+    @param name: the C{str} prefix to use for the array names.
+    @param column: the C{pandas.Series} to encode.
+    @return: a C{dict} mapping array names to arrays.
+    """
+    if column.dtype != object:
+        return {f"{name}.values": column.to_numpy()}
+
+    values = column.to_numpy()
+    isText = np.array([isinstance(value, str) for value in values], dtype=bool)
+    numbers = np.full(len(values), np.nan)
+    numbers[~isText] = values[~isText].astype(float)
+    text = np.where(isText, values, "").astype(str)
+
+    return {
+        f"{name}.kind": np.where(isText, _TEXT, _NUMBER).astype(np.int8),
+        f"{name}.numbers": numbers,
+        f"{name}.text": text,
+    }
+
+
+def _decodeColumn(name, arrays):
+    """
+    Convert the arrays written by C{_encodeColumn} back into column values.
+
+    @param name: the C{str} prefix of the array names.
+    @param arrays: the C{numpy.lib.npyio.NpzFile} with the saved arrays.
+    @return: a C{numpy.ndarray} with the column values.
+    """
+    if f"{name}.values" in arrays:
+        return arrays[f"{name}.values"]
+
+    isText = arrays[f"{name}.kind"] == _TEXT
+    values = np.array(list(arrays[f"{name}.numbers"]), dtype=object)
+    values[isText] = arrays[f"{name}.text"][isText].astype(object)
+    return values
+
+
+def writeParsedTiters(df, fileName):
+    """
+    Write a C{pandas.DataFrame} returned by C{parseTiterExcel} to a C{numpy}
+    .npz file, one set of arrays per column.
+
+    @param df: the C{pandas.DataFrame} to write.
+    @param fileName: the C{str} or C{Path} name of the file to write to.
+    """
+    arrays = {"columns": np.array(list(df.columns), dtype=str)}
+    for i, column in enumerate(df.columns):
+        arrays.update(_encodeColumn(f"c{i}", df[column]))
+
+    # Write to a temporary file first, so concurrent readers never see a
+    # partially written file.
+    fileName = Path(fileName)
+    tmp = fileName.with_name(f"{fileName.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as fp:
+        np.savez(fp, **arrays)
+    os.replace(tmp, fileName)
+
+
+def readParsedTiters(fileName):
+    """
+    Read a C{pandas.DataFrame} written by C{writeParsedTiters}.
+
+    @param fileName: the C{str} or C{Path} name of the file to read.
+    @return: a C{pandas.DataFrame}.
+    """
+    with np.load(fileName, allow_pickle=False) as arrays:
+        columns = list(arrays["columns"])
+        return pd.DataFrame(
+            {
+                column: _decodeColumn(f"c{i}", arrays)
+                for i, column in enumerate(columns)
+            },
+            columns=columns,
+        )
+
+
+def loadParsedTiters(
+    fileName,
+    rowTiterStart,
+    serumColumnsStart,
+    viruses,
+    serumColumnsNames=None,
+    sheet=None,
+    cellRange=None,
+    cacheDir=None,
+):
+    """
+    Get the result of C{parseTiterExcel(..., addAverage=True)}. The result is
+    cached on disk and the file is only parsed again if its contents or the
+    parse parameters change.
+
+    @param fileName: the C{str} filename of the file with the raw counts.
+    @param rowTiterStart: the C{int} index of the row on which the titrations
+        start.
+    @param serumColumnsStart: the C{int} index of the column of the first
+        virus.
+    @param viruses: a C{list} of virus names that the sera were titrated
+        against.
+    @param serumColumnsNames: a C{list} of column headers present for all
+        viruses.
+    @param sheet: the C{str} name of the sheet to read from a workbook.
+    @param cellRange: a C{str} range of cells to read from a workbook.
+    @param cacheDir: the C{str} or C{Path} directory to keep cached files in.
+        Defaults to C{CACHE_DIR}, which can be set with the
+        C{CIVACLIB_CACHE_DIR} environment variable.
+    @return: a C{pandas.DataFrame} with raw and average plaque counts.
+    """
+    cacheDir = Path(cacheDir or CACHE_DIR) / "parsed-titers"
+    key = parsedTitersKey(
+        fileName,
+        rowTiterStart,
+        serumColumnsStart,
+        viruses,
+        serumColumnsNames=serumColumnsNames,
+        sheet=sheet,
+        cellRange=cellRange,
+    )
+    cacheFile = cacheDir / f"{key}.npz"
+
+    if cacheFile.exists():
+        return readParsedTiters(cacheFile)
+
+    df = parseTiterExcel(
+        fileName,
+        rowTiterStart,
+        serumColumnsStart,
+        viruses,
+        serumColumnsNames=serumColumnsNames,
+        addAverage=True,
+        sheet=sheet,
+        cellRange=cellRange,
+    )
+    cacheDir.mkdir(parents=True, exist_ok=True)
+    writeParsedTiters(df, cacheFile)
+
+    return df
+
+
+# The attributes of a fitted neutcurve.HillCurve that are kept in the fit
+# cache. Everything else is derived from the data.
+_FIT_ATTRIBUTES = (
+    "midpoint",
+    "slope",
+    "bottom",
+    "top",
+    "params_stdev",
+    "midpoint_bound",
+    "midpoint_bound_type",
+    "r2",
+    "rmsd",
+)
+
+
+def fitKey(data, fixtop=True, fixbottom=True, fitter="neutcurve"):
+    """
+    Get the cache key for fitting a neutralisation curve to data. The key
+    depends on the concentrations and fraction infectivities (in the order
+    given), on the fit options, on C{FIT_CACHE_VERSION} and on the neutcurve
+    version.
+
+    @param data: a C{pandas.DataFrame} returned by
+        C{convertRawCountsToNeutcurveDf}.
+    @param fixtop: Fix the top of the neutralisation curve at 1.
+    @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+    @param fitter: the C{str} name of the fitter used (see
+        C{parseTiters.FITTERS}).
+    @return: a C{str} hex digest.
+    """
+    sha = hashlib.sha256()
+    sha.update(
+        json.dumps(
+            {
+                "version": FIT_CACHE_VERSION,
+                "neutcurve": neutcurve.__version__,
+                "fixtop": fixtop,
+                "fixbottom": fixbottom,
+                "fitlogc": False,
+                "fitter": fitter,
+                "n": len(data),
+            }
+        ).encode()
+    )
+    sha.update(data["concentration"].to_numpy(dtype=float).tobytes())
+    sha.update(data["fraction infectivity"].to_numpy(dtype=float).tobytes())
+    return sha.hexdigest()
+
+
+def _toJSON(value):
+    """
+    Convert a fitted curve attribute to something that can be saved as JSON.
+    """
+    if isinstance(value, dict):
+        return {key: float(stdev) for key, stdev in value.items()}
+    elif isinstance(value, str) or value is None:
+        return value
+    else:
+        return float(value)
+
+
+class FitCache:
+    """
+    A cache of fitted neutralisation curves, so that the curve of a
+    serum/virus pair is only fitted once for the same data and fit options.
+    Fitted parameters and bounds are held in memory (least recently used
+    curves are dropped first) and in JSON files on disk (least recently used
+    files are removed when the total size gets too large).
+
+    @param cacheDir: the C{str} or C{Path} directory to keep cached files in.
+        Defaults to C{CACHE_DIR}, which can be set with the
+        C{CIVACLIB_CACHE_DIR} environment variable.
+    @param maxEntries: the C{int} maximum number of fits to hold in memory.
+    @param maxBytes: the C{int} maximum total size of the cached files. When
+        it is exceeded, the least recently used files are removed until the
+        size is down to 90% of it.
+    """
+
+    def __init__(self, cacheDir=None, maxEntries=4096, maxBytes=64 * 2**20):
+        self.cacheDir = Path(cacheDir or CACHE_DIR) / "fits"
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self._memory = OrderedDict()
+        self._diskBytes = None
+
+    def __getstate__(self):
+        # Don't send the fits held in memory to other processes, they can
+        # read them from disk.
+        state = self.__dict__.copy()
+        state["_memory"] = OrderedDict()
+        state["_diskBytes"] = None
+        return state
+
+    def _remember(self, key, params):
+        """
+        Hold fitted parameters in memory, dropping the least recently used
+        ones if there are too many.
+        """
+        self._memory[key] = params
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxEntries:
+            self._memory.popitem(last=False)
+
+    def get(self, data, fixtop=True, fixbottom=True, fitter="neutcurve"):
+        """
+        Get a previously fitted curve.
+
+        @param data: a C{pandas.DataFrame} returned by
+            C{convertRawCountsToNeutcurveDf}.
+        @param fixtop: Fix the top of the neutralisation curve at 1.
+        @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+        @param fitter: the C{str} name of the fitter used.
+        @return: a C{neutcurve.HillCurve}, or C{None} if the curve isn't in
+            the cache.
+        """
+        key = fitKey(data, fixtop=fixtop, fixbottom=fixbottom, fitter=fitter)
+
+        params = self._memory.get(key)
+        if params is None:
+            cacheFile = self.cacheDir / f"{key}.json"
+            try:
+                with open(cacheFile) as fp:
+                    params = json.load(fp)
+                # Mark the file as recently used.
+                os.utime(cacheFile)
+            except (FileNotFoundError, ValueError):
+                return None
+
+        self._remember(key, params)
+
+        return makeHillCurve(data, params)
+
+    def put(self, data, curve, fixtop=True, fixbottom=True, fitter="neutcurve"):
+        """
+        Add a fitted curve to the cache.
+
+        @param data: the C{pandas.DataFrame} the curve was fitted to.
+        @param curve: the fitted C{neutcurve.HillCurve}.
+        @param fixtop: Fix the top of the neutralisation curve at 1.
+        @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+        @param fitter: the C{str} name of the fitter used.
+        """
+        key = fitKey(data, fixtop=fixtop, fixbottom=fixbottom, fitter=fitter)
+        params = {name: _toJSON(getattr(curve, name)) for name in _FIT_ATTRIBUTES}
+        self._remember(key, params)
+
+        self.cacheDir.mkdir(parents=True, exist_ok=True)
+        cacheFile = self.cacheDir / f"{key}.json"
+        tmp = cacheFile.with_name(f"{cacheFile.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as fp:
+            json.dump(params, fp)
+        os.replace(tmp, cacheFile)
+
+        if self._diskBytes is None:
+            self._diskBytes = self.diskBytes()
+        else:
+            self._diskBytes += cacheFile.stat().st_size
+
+        if self._diskBytes > self.maxBytes:
+            self.evict()
+
+    def diskBytes(self):
+        """
+        Get the total size of the cached files.
+
+        @return: the C{int} number of bytes.
+        """
+        return sum(entry.stat().st_size for entry in self._files())
+
+    def _files(self):
+        """
+        Get the cached files.
+
+        @return: a C{list} of C{os.DirEntry}s.
+        """
+        try:
+            return [
+                entry
+                for entry in os.scandir(self.cacheDir)
+                if entry.name.endswith(".json")
+            ]
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        """
+        Remove the least recently used files until their total size is down
+        to 90% of C{maxBytes}.
+        """
+        entries = sorted(
+            ((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+            for entry in self._files()
+        )
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= 0.9 * self.maxBytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # Another process removed it already.
+                pass
+            total -= size
+        self._diskBytes = total
+
+
+def blockHashes(plate, pairs):
+    """
+    Hash the plaque counts of each (serum, virus, replicate) block of a plate,
+    so that a later run can tell which blocks changed.
+
+    @param plate: a C{plate.Plate}.
+    @param pairs: a C{list} of (serum, virus, titer steps) C{tuple}s, as
+        returned by C{titerTable.getPairs}. The titer steps of a pair are
+        part of the hashes of its blocks.
+    @return: a C{dict} mapping each (serum, virus) C{tuple} to a C{dict}
+        mapping the C{str} names of its replicates to C{str} hex digests.
+    """
+    replicates = plate.info["Replicate"].to_numpy()
+    result = {}
+    for serum, virus, steps in pairs:
+        shas = {}
+        for row in plate.pairRows(serum, virus):
+            replicate = str(replicates[row])
+            if replicate not in shas:
+                shas[replicate] = hashlib.sha256(json.dumps(list(steps)).encode())
+            sha = shas[replicate]
+            sha.update(plate.counts[row].tobytes())
+            sha.update(plate.flags[row].tobytes())
+            sha.update(plate.vk[row].tobytes())
+        result[serum, virus] = {
+            replicate: sha.hexdigest() for replicate, sha in shas.items()
+        }
+    return result
+
+
+def tableKey(method, limit, interpolate=False, nd="<20", fitter="neutcurve"):
+    """
+    Get the key of the options a titer table was made with. Titers stored for
+    one key are not reused for another.
+
+    @param method: the C{str} method of the table (see C{titerTable.METHODS}).
+    @param limit: the C{int} level of sensitivity.
+    @param interpolate: If C{True} continuous titers that are out of bounds
+        are interpolated.
+    @param nd: the lowest discrete titer level.
+    @param fitter: the C{str} name of the fitter used (see
+        C{parseTiters.FITTERS}).
+    @return: a C{str} hex digest.
+    """
+    discrete = method == "discrete"
+    params = {
+        "version": TABLE_STATE_VERSION,
+        "method": method,
+        "limit": limit,
+        "interpolate": False if discrete else bool(interpolate),
+        "nd": nd if discrete else None,
+        "fitter": None if discrete else fitter,
+        "neutcurve": None if discrete else neutcurve.__version__,
+    }
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+
+def tableStateFile(fileName):
+    """
+    Get the name of the file the state of a titer table is stored in.
+
+    @param fileName: the C{str} name of the titer table file.
+    @return: the C{str} name of the state file, next to the table.
+    """
+    return f"{fileName}.blocks.json"
+
+
+def writeTableState(fileName, key, hashes, titers):
+    """
+    Store the block hashes and titers a titer table was made from, next to
+    the table.
+
+    @param fileName: the C{str} name of the titer table file.
+    @param key: the C{str} key returned by C{tableKey}.
+    @param hashes: a C{dict} returned by C{blockHashes}.
+    @param titers: a C{dict} mapping (serum, virus) C{tuple}s to the C{str}
+        titers calculated for them, before fixed titers were applied.
+    """
+    state = {
+        "key": key,
+        "pairs": {
+            f"{serum}\t{virus}": {"blocks": blocks, "titer": titers[serum, virus]}
+            for (serum, virus), blocks in hashes.items()
+        },
+    }
+    with open(tableStateFile(fileName), "w") as fp:
+        json.dump(state, fp, indent=1, ensure_ascii=False)
+
+
+def readTableState(fileName, key, hashes):
+    """
+    Get the titers of a previously made titer table that are still valid.
+
+    @param fileName: the C{str} name of the titer table file.
+    @param key: the C{str} key returned by C{tableKey} for the table to
+        make.
+    @param hashes: a C{dict} returned by C{blockHashes} for the plate the
+        table is made from.
+    @return: a C{dict} mapping the (serum, virus) C{tuple}s of the pairs
+        whose blocks didn't change to their stored C{str} titers. It is empty
+        if the table or its state file doesn't exist or the table was made
+        with other options.
+    """
+    if not os.path.exists(fileName):
+        return {}
+    try:
+        with open(tableStateFile(fileName)) as fp:
+            state = json.load(fp)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if state.get("key") != key:
+        return {}
+
+    result = {}
+    for pair, pairState in state["pairs"].items():
+        serum, virus = pair.split("\t")
+        if hashes.get((serum, virus)) == pairState["blocks"]:
+            result[serum, virus] = pairState["titer"]
+    return result
+
+
+def longTitersKey(hashes, limits, interpolate=False, nd="<20", fitter="neutcurve"):
+    """
+    Get the key of the plaque counts and options the titers in a long-format
+    titer file (see C{titerTable.streamTiterTables}) are calculated from.
+    Titers in a file with one key are not reused for another.
+
+    @param hashes: a C{dict} returned by C{blockHashes} for the pairs in the
+        file.
+    @param limits: an iterable of (method, limit) C{tuple}s, one per table.
+    @param interpolate: If C{True} continuous titers that are out of bounds
+        are interpolated.
+    @param nd: the lowest discrete titer level.
+    @param fitter: the C{str} name of the fitter used (see
+        C{parseTiters.FITTERS}).
+    @return: a C{str} hex digest.
+    """
+    params = {
+        "tables": sorted(
+            tableKey(method, limit, interpolate, nd, fitter) for method, limit in limits
+        ),
+        "pairs": {
+            f"{serum}\t{virus}": blocks for (serum, virus), blocks in hashes.items()
+        },
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def longTitersKeyFile(fileName):
+    """
+    Get the name of the file the key of a long-format titer file is stored
+    in.
+
+    @param fileName: the C{str} name of the long-format titer file.
+    @return: the C{str} name of the key file, next to the long-format file.
+    """
+    return f"{fileName}.key"
+
+
+def readLongTitersKey(fileName):
+    """
+    Get the key a long-format titer file was written with.
+
+    @param fileName: the C{str} name of the long-format titer file.
+    @return: the C{str} key stored by C{writeLongTitersKey}, or C{None} if
+        there is none.
+    """
+    try:
+        with open(longTitersKeyFile(fileName)) as fp:
+            return fp.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def writeLongTitersKey(fileName, key):
+    """
+    Store the key a long-format titer file is written with, next to the file.
+
+    @param fileName: the C{str} name of the long-format titer file.
+    @param key: the C{str} key returned by C{longTitersKey}.
+    """
+    with open(longTitersKeyFile(fileName), "w") as fp:
+        print(key, file=fp)
@@ -71,6 +71,6 @@ SERA = [
     "9.2",
     "9.3",
     "12SE0030",
-    "12SE0032",
     "12SE0031",
+    "12SE0032",
 ]
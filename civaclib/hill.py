@@ -0,0 +1,552 @@
+import neutcurve
+import numpy as np
+
+# The order of the parameters in the arrays used by fitHillCurves.
+MIDPOINT, SLOPE, BOTTOM, TOP = range(4)
+PARAMETERS = ("midpoint", "slope", "bottom", "top")
+
+# The slope used as a starting point, the same as in neutcurve.HillCurve.
+INIT_SLOPE = 1.5
+
+# The largest change of the log midpoint in one step of a fit.
+MAX_LOG_MIDPOINT_STEP = 1.0
+
+# Fits of curves that are nearly flat over the tested concentrations creep
+# towards a midpoint far outside them and stop before the cost is minimal.
+# Fits with a midpoint more than this factor outside the concentrations are
+# not considered converged.
+MIDPOINT_RANGE = 100.0
+
+# The highest dilutions of the usual titer series. Titers above them are
+# given as e.g. '>5120', and may be interpolated. Titers above other
+# dilutions are bounds as neutcurve gives them (see titerBounds), which
+# doesn't have enough digits to get to the dilution, e.g. 1 / 0.000195 is
+# 5128, not 5120.
+HIGHEST_DILUTIONS = (160, 320, 640, 1280, 2560, 5120)
+
+
+def _padData(datasets):
+    """
+    Put the data of many pairs into padded arrays, sorted by concentration
+    in the same way as C{neutcurve.HillCurve} does.
+
+    @param datasets: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair.
+    @return: a C{tuple} of three C{numpy.ndarray}s with one row per pair:
+        the concentrations, the fraction infectivities and a C{bool} mask
+        that is C{True} for the data points (as opposed to padding).
+    """
+    nPoints = max((len(data) for data in datasets), default=0)
+    cs = np.ones((len(datasets), nPoints))
+    fs = np.zeros((len(datasets), nPoints))
+    mask = np.zeros((len(datasets), nPoints), dtype=bool)
+
+    for i, data in enumerate(datasets):
+        c = data["concentration"].to_numpy(dtype=float)
+        f = data["fraction infectivity"].to_numpy(dtype=float)
+        order = c.argsort()
+        cs[i, : len(c)] = c[order]
+        fs[i, : len(c)] = f[order]
+        mask[i, : len(c)] = True
+
+    return cs, fs, mask
+
+
+def _initialParameters(cs, fs, mask, fixtop, fixbottom):
+    """
+    Make the same initial guess of the parameters as C{neutcurve.HillCurve}.
+
+    @return: a C{numpy.ndarray} with one row of (log midpoint, slope, bottom,
+        top) per pair.
+    """
+    nPairs = len(cs)
+    pairs = np.arange(nPairs)
+    counts = mask.sum(axis=1)
+    last = cs[pairs, counts - 1]
+    secondLast = cs[pairs, np.maximum(counts - 2, 0)]
+
+    top = np.ones(nPairs)
+    if not fixtop:
+        top = np.maximum(1, np.where(mask, fs, -np.inf).max(axis=1))
+    bottom = np.zeros(nPairs)
+    if not fixbottom:
+        bottom = np.minimum(0, np.where(mask, fs, np.inf).min(axis=1))
+
+    midval = ((top - bottom) / 2)[:, np.newaxis]
+    above = fs > midval
+    allAbove = (above | ~mask).all(axis=1)
+    allBelow = (~above | ~mask).all(axis=1)
+    # The first point where the data crosses the midpoint value.
+    crossing = (above[:, :-1] != above[:, 1:]) & mask[:, 1:]
+    i = crossing.argmax(axis=1)
+    midpoint = np.where(
+        allAbove,
+        last**2 / secondLast,
+        np.where(
+            allBelow,
+            cs[:, 0] / (last / secondLast),
+            (cs[pairs, i] + cs[pairs, np.minimum(i + 1, cs.shape[1] - 1)]) / 2,
+        ),
+    )
+
+    return np.stack(
+        [np.log(midpoint), np.full(nPairs, INIT_SLOPE), bottom, top], axis=1
+    )
+
+
+def _residualsAndJacobian(params, cs, fs, mask):
+    """
+    Calculate the residuals of the Hill model and their derivatives with
+    respect to (log midpoint, slope, bottom, top).
+
+    @return: a C{tuple} of a C{numpy.ndarray} of residuals with the shape of
+        C{cs} and a C{numpy.ndarray} of derivatives with an extra last axis
+        of length 4. Both are zero for padding.
+    """
+    logMidpoint, slope, bottom, top = (params[:, i, np.newaxis] for i in range(4))
+    logRatio = np.log(cs) - logMidpoint
+    with np.errstate(over="ignore", invalid="ignore"):
+        u = np.exp(slope * logRatio)
+        denominator = 1 + u
+        fit = bottom + (top - bottom) / denominator
+        dFitdU = -(top - bottom) / denominator**2
+
+        jacobian = np.stack(
+            [
+                dFitdU * -slope * u,
+                dFitdU * u * logRatio,
+                1 - 1 / denominator,
+                1 / denominator,
+            ],
+            axis=-1,
+        )
+    residuals = np.where(mask, fit - fs, 0.0)
+    jacobian = np.where(mask[..., np.newaxis], jacobian, 0.0)
+    return residuals, jacobian
+
+
+def _solve(A, b):
+    """
+    Solve the linear systems A x = b of all pairs, using the least-squares
+    solution for pairs whose matrix is singular.
+
+    @param A: a C{numpy.ndarray} of 4x4 matrices, one per pair.
+    @param b: a C{numpy.ndarray} of vectors, one per pair.
+    @return: a C{numpy.ndarray} of solutions with the shape of C{b}.
+    """
+    try:
+        return np.linalg.solve(A, b[..., np.newaxis])[..., 0]
+    except np.linalg.LinAlgError:
+        x = np.empty(b.shape)
+        for i in range(len(A)):
+            try:
+                x[i] = np.linalg.solve(A[i], b[i])
+            except np.linalg.LinAlgError:
+                x[i] = np.linalg.lstsq(A[i], b[i], rcond=None)[0]
+        return x
+
+
+def _levenbergMarquardt(params, free, cs, fs, mask, maxIterations, tolerance):
+    """
+    Minimise the sum of squared residuals of all pairs at once with
+    Levenberg-Marquardt steps. Each pair has its own damping and stops when
+    its cost no longer decreases.
+
+    @param params: a C{numpy.ndarray} of initial parameters, one row per
+        pair. It is not modified.
+    @param free: a C{bool} C{numpy.ndarray} of length 4 that is C{True} for
+        the parameters to fit.
+    @return: a C{tuple} of the fitted parameters, the C{int} number of
+        iterations of each pair, a C{bool} array that is C{True} for pairs
+        that converged and the matrix J^T J of the last iteration.
+    """
+    nPairs = len(params)
+    params = params.copy()
+    damping = np.full(nPairs, 1e-3)
+    iterations = np.zeros(nPairs, dtype=int)
+    active = np.ones(nPairs, dtype=bool)
+    converged = np.zeros(nPairs, dtype=bool)
+
+    residuals, jacobian = _residualsAndJacobian(params, cs, fs, mask)
+    cost = (residuals**2).sum(axis=1)
+    jacobian[..., ~free] = 0.0
+    fixed = np.diag(~free).astype(float)
+
+    for _ in range(maxIterations):
+        if not active.any():
+            break
+
+        rows = np.flatnonzero(active)
+        J = jacobian[rows]
+        JTJ = np.einsum("pni,pnj->pij", J, J)
+        gradient = np.einsum("pni,pn->pi", J, residuals[rows])
+        diagonal = np.einsum("pii->pi", JTJ)
+        # Scale the damping by the curvature (Marquardt) and keep fixed
+        # parameters where they are.
+        A = JTJ + damping[rows, np.newaxis, np.newaxis] * (
+            diagonal[:, :, np.newaxis] * np.eye(4)
+        )
+        A = A + fixed
+        # Pairs whose fit has broken down numerically are left where they
+        # are and stop.
+        finite = np.isfinite(A).all(axis=(1, 2)) & np.isfinite(gradient).all(axis=1)
+        A[~finite] = np.eye(4)
+        gradient[~finite] = 0.0
+        step = _solve(A, -gradient)
+
+        newParams = params[rows] + step
+        newResiduals, newJacobian = _residualsAndJacobian(
+            newParams, cs[rows], fs[rows], mask[rows]
+        )
+        newCost = (newResiduals**2).sum(axis=1)
+        iterations[rows] += 1
+
+        # Steps that move the midpoint too far are rejected like steps that
+        # don't lower the cost, so the damping grows until the step is small
+        # enough. Otherwise a fit can jump to a flat region far from the data.
+        better = (
+            np.isfinite(newCost)
+            & (newCost <= cost[rows])
+            & (np.abs(step[:, MIDPOINT]) <= MAX_LOG_MIDPOINT_STEP)
+        )
+        improved = rows[better]
+        params[improved] = newParams[better]
+        residuals[improved] = newResiduals[better]
+        newJacobian[..., ~free] = 0.0
+        jacobian[improved] = newJacobian[better]
+        damping[improved] = np.maximum(damping[improved] / 10, 1e-12)
+        damping[rows[~better]] *= 10
+
+        # A pair has converged when its cost or its parameters no longer
+        # change (relative to their size), or its gradient is zero.
+        oldCost = cost[rows]
+        cost[improved] = newCost[better]
+        costChange = np.abs(oldCost - cost[rows]) <= tolerance * (oldCost + tolerance)
+        stepSize = np.abs(step).max(axis=1) <= tolerance * (
+            np.abs(params[rows]).max(axis=1) + tolerance
+        )
+        done = (better & (costChange | stepSize)) | (
+            np.abs(gradient).max(axis=1) <= tolerance**2
+        )
+        converged[rows[done & finite]] = True
+        active[rows[done | ~finite | (damping[rows] > 1e16)]] = False
+
+    JTJ = np.einsum("pni,pnj->pij", jacobian, jacobian)
+    return params, iterations, converged, JTJ
+
+
+def fitHillCurves(
+    datasets,
+    fixtop=True,
+    fixbottom=True,
+    initial=None,
+    maxIterations=200,
+    tolerance=1e-10,
+):
+    """
+    Fit the four-parameter Hill model used by C{neutcurve.HillCurve},
+    f(c) = bottom + (top - bottom) / (1 + (c / midpoint) ** slope), to many
+    serum/virus pairs at once. Like neutcurve, the curves are first fitted
+    with the slope fixed at 1.5 and then with all parameters free, starting
+    from the same initial guess. All pairs are fitted together with
+    vectorized Levenberg-Marquardt steps over arrays padded to the largest
+    number of data points.
+
+    Fits can be warm-started from the curves of a more constrained fit to
+    the same data (e.g. with a fixed top and bottom). The fit with the
+    slope fixed is then skipped and far fewer iterations are needed.
+
+    @param datasets: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair. They must not be
+        empty.
+    @param fixtop: Fix the top of the neutralisation curve at 1.
+    @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+    @param initial: a C{dict} with C{numpy.ndarray}s of the 'midpoint',
+        'slope', 'bottom' and 'top' of each pair to start from (e.g. as
+        returned by a previous call), or C{None} to start from the same
+        initial guess as neutcurve. Pairs with non-finite initial
+        parameters are started from that guess. Fixed tops and bottoms are
+        set to 1 and 0 whatever their initial value.
+    @param maxIterations: the C{int} maximum number of iterations of each of
+        the two fits.
+    @param tolerance: the C{float} relative change in cost or parameters
+        below which a fit has converged.
+    @return: a C{dict} with C{numpy.ndarray}s with one value per pair for
+        'midpoint', 'slope', 'bottom' and 'top', the standard deviations of
+        the fitted parameters ('midpoint_stdev' etc., 0 for fixed
+        parameters and C{nan} if they can't be calculated), the total
+        number of 'iterations' and whether the fit 'converged'. Fits whose
+        midpoint ends up more than C{MIDPOINT_RANGE} times outside the
+        concentrations are not considered converged.
+    """
+    cs, fs, mask = _padData(datasets)
+    return fitHillArrays(
+        cs,
+        fs,
+        mask,
+        fixtop=fixtop,
+        fixbottom=fixbottom,
+        initial=initial,
+        maxIterations=maxIterations,
+        tolerance=tolerance,
+    )
+
+
+def fitHillArrays(
+    cs,
+    fs,
+    mask,
+    fixtop=True,
+    fixbottom=True,
+    initial=None,
+    maxIterations=200,
+    tolerance=1e-10,
+):
+    """
+    Fit Hill curves to data that is already in padded arrays, e.g. to fit
+    many resamplings of the same pairs without making a C{pandas.DataFrame}
+    for each of them. See C{fitHillCurves} for the arguments and the result.
+
+    @param cs: a C{numpy.ndarray} of concentrations with one row per pair,
+        sorted in each row.
+    @param fs: a C{numpy.ndarray} of fraction infectivities with the shape
+        of C{cs}.
+    @param mask: a C{bool} C{numpy.ndarray} with the shape of C{cs} that is
+        C{True} for the data points. The padding must come after the data
+        points of each row.
+    """
+    params = _initialParameters(cs, fs, mask, fixtop, fixbottom)
+    cold = np.ones(len(params), dtype=bool)
+
+    if initial is not None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            warm = np.stack(
+                [
+                    np.log(np.asarray(initial["midpoint"], dtype=float)),
+                    np.asarray(initial["slope"], dtype=float),
+                    np.asarray(initial["bottom"], dtype=float),
+                    np.asarray(initial["top"], dtype=float),
+                ],
+                axis=1,
+            )
+        if fixbottom:
+            warm[:, BOTTOM] = 0.0
+        if fixtop:
+            warm[:, TOP] = 1.0
+        cold = ~np.isfinite(warm).all(axis=1)
+        params[~cold] = warm[~cold]
+
+    free = np.array([True, False, not fixbottom, not fixtop])
+    iterations1 = np.zeros(len(params), dtype=int)
+    params[cold], iterations1[cold], _, _ = _levenbergMarquardt(
+        params[cold], free, cs[cold], fs[cold], mask[cold], maxIterations, tolerance
+    )
+    free[SLOPE] = True
+    params, iterations2, converged, JTJ = _levenbergMarquardt(
+        params, free, cs, fs, mask, maxIterations, tolerance
+    )
+
+    # The covariance of the parameters, as calculated by curve_fit with
+    # absolute_sigma=True.
+    JTJ = JTJ[:, free][:, :, free]
+    finite = np.isfinite(JTJ).all(axis=(1, 2))
+    stdevs = np.full(params.shape, np.nan)
+    stdevs[:, ~free] = 0.0
+    with np.errstate(invalid="ignore"):
+        covariance = np.linalg.pinv(JTJ[finite])
+        stdevs[np.ix_(finite, free)] = np.sqrt(np.einsum("pii->pi", covariance))
+
+    midpoint = np.exp(params[:, MIDPOINT])
+    lowest = cs[:, 0]
+    highest = cs[np.arange(len(cs)), mask.sum(axis=1) - 1]
+    result = {
+        "midpoint": midpoint,
+        "slope": params[:, SLOPE],
+        "bottom": params[:, BOTTOM],
+        "top": params[:, TOP],
+        "iterations": iterations1 + iterations2,
+        "converged": (
+            converged
+            & np.isfinite(params).all(axis=1)
+            & (midpoint >= lowest / MIDPOINT_RANGE)
+            & (midpoint <= highest * MIDPOINT_RANGE)
+        ),
+    }
+    # The midpoint was fitted on a log scale.
+    result["midpoint_stdev"] = stdevs[:, MIDPOINT] * midpoint
+    for i in SLOPE, BOTTOM, TOP:
+        result[f"{PARAMETERS[i]}_stdev"] = stdevs[:, i]
+
+    return result
+
+
+def makeHillCurve(data, params):
+    """
+    Make a C{neutcurve.HillCurve} from already fitted parameters, without
+    fitting it again.
+
+    @param data: the C{pandas.DataFrame} the curve was fitted to.
+    @param params: a C{dict} with the 'midpoint', 'slope', 'bottom' and 'top'
+        of the curve. It may also hold the 'params_stdev', 'midpoint_bound',
+        'midpoint_bound_type', 'r2' and 'rmsd' attributes of the curve,
+        otherwise they are calculated as neutcurve does.
+    @return: a C{neutcurve.HillCurve}.
+    """
+    curve = neutcurve.HillCurve.__new__(neutcurve.HillCurve)
+    cs = data["concentration"].to_numpy(dtype=float)
+    fs = data["fraction infectivity"].to_numpy(dtype=float)
+    order = cs.argsort()
+    curve.cs = cs[order]
+    curve.fs = fs[order]
+    curve.fs_stderr = None
+    curve._infectivity_or_neutralized = "infectivity"
+
+    for name in PARAMETERS:
+        setattr(curve, name, float(params[name]))
+    curve.params_stdev = params.get("params_stdev")
+
+    if "midpoint_bound" in params:
+        curve.midpoint_bound = params["midpoint_bound"]
+        curve.midpoint_bound_type = params["midpoint_bound_type"]
+    elif curve.cs[0] <= curve.midpoint <= curve.cs[-1]:
+        curve.midpoint_bound = curve.midpoint
+        curve.midpoint_bound_type = "interpolated"
+    elif curve.midpoint < curve.cs[0]:
+        curve.midpoint_bound = float(curve.cs[0])
+        curve.midpoint_bound_type = "upper"
+    else:
+        curve.midpoint_bound = float(curve.cs[-1])
+        curve.midpoint_bound_type = "lower"
+
+    if "r2" in params:
+        curve.r2 = params["r2"]
+        curve.rmsd = params["rmsd"]
+    else:
+        ssres = float(((curve.fracinfectivity(curve.cs) - curve.fs) ** 2).sum())
+        sstot = float(((curve.fs - curve.fs.mean()) ** 2).sum())
+        if sstot == 0:
+            curve.r2 = 1.0 if ssres == 0 else 0.0
+        else:
+            curve.r2 = 1.0 - ssres / sstot
+        curve.rmsd = float(np.sqrt(ssres / len(curve.cs)))
+
+    return curve
+
+
+def makeHillCurves(datasets, fits):
+    """
+    Make a C{neutcurve.HillCurve} for each pair fitted by C{fitHillCurves}.
+
+    @param datasets: the C{list} of C{pandas.DataFrame}s given to
+        C{fitHillCurves}.
+    @param fits: the C{dict} returned by C{fitHillCurves}.
+    @return: a C{list} of C{neutcurve.HillCurve}s.
+    """
+    curves = []
+    for i, data in enumerate(datasets):
+        params = {name: fits[name][i] for name in PARAMETERS}
+        params["params_stdev"] = {
+            name: float(fits[f"{name}_stdev"][i]) for name in PARAMETERS
+        }
+        curves.append(makeHillCurve(data, params))
+    return curves
+
+
+def locateICXX(midpoint, slope, bottom, top, lowest, highest, fracneut):
+    """
+    Find the concentrations at which Hill curves neutralise a fraction of
+    the virus, and where they are relative to the tested concentrations.
+    This is what C{neutcurve.HillCurve.icXX} does, for many curves at once.
+
+    @param midpoint: a C{numpy.ndarray} of curve midpoints.
+    @param slope: a C{numpy.ndarray} of curve slopes.
+    @param bottom: a C{numpy.ndarray} of curve bottoms.
+    @param top: a C{numpy.ndarray} of curve tops.
+    @param lowest: a C{numpy.ndarray} with the lowest concentration tested
+        for each curve.
+    @param highest: a C{numpy.ndarray} with the highest concentration tested
+        for each curve.
+    @param fracneut: the C{float} fraction neutralised, e.g. 0.5.
+    @return: a C{tuple} of three C{numpy.ndarray}s: the icXX of each curve
+        (C{nan} if the curve never reaches the fraction), a C{bool} array
+        that is C{True} where the icXX is within the tested concentrations,
+        and a C{bool} array that is C{True} where it is below the lowest
+        concentration (i.e. the titer is above the highest dilution).
+    """
+    fracinf = 1 - fracneut
+    # Curves that lie entirely below the fraction infectivity neutralise at
+    # all concentrations, those that lie entirely above it at none. The
+    # others reach it at icXX.
+    crosses = (top >= fracinf) != (bottom >= fracinf)
+    with np.errstate(all="ignore"):
+        icXX = np.where(
+            crosses,
+            midpoint * ((top - fracinf) / (fracinf - bottom)) ** (1 / slope),
+            np.nan,
+        )
+    below = np.where(crosses, icXX < lowest, top < fracinf)
+    inRange = crosses & (lowest <= icXX) & (icXX <= highest)
+    return icXX, inRange, below
+
+
+def roundSignificant(values, digits=3):
+    """
+    Round numbers to significant digits, as C{neutcurve.HillCurve.icXX_str}
+    does (with decimal rounding of the exact value, which multiplying,
+    rounding and dividing doesn't always give). Each distinct value is only
+    rounded once.
+
+    @param values: a C{numpy.ndarray} of positive C{float}s.
+    @param digits: the C{int} number of significant digits.
+    @return: a C{numpy.ndarray} of the rounded C{float}s.
+    """
+    unique, inverse = np.unique(values, return_inverse=True)
+    rounded = np.array(
+        [
+            float(np.format_float_positional(value, precision=digits, fractional=False))
+            for value in unique
+        ],
+        dtype=float,
+    )
+    return rounded[inverse.reshape(np.shape(values))]
+
+
+def highestDilutions(concentrations):
+    """
+    Find the concentrations that are (to 3 significant digits) those of the
+    highest dilutions of the usual titer series.
+
+    @param concentrations: a C{numpy.ndarray} of the C{float} concentrations
+        of the highest dilutions tested.
+    @return: an C{int} C{numpy.ndarray} with the dilution in
+        C{HIGHEST_DILUTIONS} of each concentration, or 0 if it isn't one of
+        them.
+    """
+    dilutions = np.array(HIGHEST_DILUTIONS)
+    matches = roundSignificant(concentrations)[:, None] == roundSignificant(
+        1 / dilutions
+    )
+    return np.where(matches.any(axis=1), dilutions[matches.argmax(axis=1)], 0)
+
+
+def titerBounds(concentrations, above):
+    """
+    Get the titers given as bounds for titers out of the range of the tested
+    dilutions. A bound is the concentration to 3 significant digits (as
+    C{neutcurve.HillCurve.icXX_str} gives it), inverted and truncated, so a
+    dilution of 1:108 gives 107, except above the dilutions in
+    C{HIGHEST_DILUTIONS}, which give the dilution.
+
+    @param concentrations: a C{numpy.ndarray} of the C{float} concentrations
+        of the highest or lowest dilutions tested.
+    @param above: if C{True} the titers are above the highest dilutions, else
+        below the lowest.
+    @return: an C{int} C{numpy.ndarray} of bounds, e.g. 5120 for '>5120' or
+        20 for '<20'.
+    """
+    concentrations = np.asarray(concentrations, dtype=float)
+    bounds = (1 / roundSignificant(concentrations)).astype(int)
+    if above:
+        dilutions = highestDilutions(concentrations)
+        bounds = np.where(dilutions > 0, dilutions, bounds)
+    return bounds
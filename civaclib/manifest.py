@@ -0,0 +1,288 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from os.path import dirname, join
+
+from .cache import loadParsedTiters
+from .common import VIRUSES
+from .plate import Plate
+from .titerTable import METHODS, TITER_STEP_ADAPTATIONS, makeTiterTableFiles
+
+# The columns every manifest must have.
+MANIFEST_COLUMNS = (
+    "rawTiters",
+    "method",
+    "limit",
+    "fixedTiterFile",
+    "adaptTiterSteps",
+    "interpolate",
+    "output",
+)
+
+# Columns a manifest may have, with the values used if they're empty.
+OPTIONAL_COLUMNS = {
+    "sheet": None,
+    "cellRange": None,
+    "rowTiterStart": 10,
+    "serumColumnsStart": 3,
+    "nd": "<20",
+}
+
+
+def _parseBool(value, lineNumber):
+    """
+    Parse a true/false manifest value.
+
+    @param value: the C{str} value.
+    @param lineNumber: the C{int} line of the manifest the value is on.
+    @raise ValueError: if the value is not true or false.
+    @return: a C{bool}.
+    """
+    lowered = value.strip().lower()
+    if lowered in {"true", "yes", "1"}:
+        return True
+    elif lowered in {"false", "no", "0", ""}:
+        return False
+    raise ValueError(f"Line {lineNumber}: invalid true/false value {value!r}.")
+
+
+def readManifest(fileName):
+    """
+    Read a manifest of titer tables to make. A manifest is a CSV file with
+    one table per row and the C{MANIFEST_COLUMNS}, and optionally the
+    C{OPTIONAL_COLUMNS} (see C{bin/make-titer-table.py} for their meaning).
+    The fixed titer file and titer step adaptation may be empty. File names
+    are relative to the directory of the manifest.
+
+    @param fileName: the C{str} name of the manifest file.
+    @raise ValueError: if a column is missing or a value is invalid.
+    @return: a C{list} of C{dict}s, one per table, with the manifest columns
+        as keys. File names are joined to the directory of the manifest,
+        limits and row and column starts are C{int}s, 'interpolate' is a
+        C{bool}, and empty values are C{None} (C{False} for
+        'adaptTiterSteps').
+    """
+    directory = dirname(fileName)
+    entries = []
+
+    with open(fileName, newline="") as fp:
+        reader = csv.DictReader(fp)
+        missing = set(MANIFEST_COLUMNS) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(
+                f"Manifest {fileName!r} has no {', '.join(sorted(missing))} "
+                f"column{'s' if len(missing) > 1 else ''}."
+            )
+
+        # Line 1 is the header.
+        for lineNumber, row in enumerate(reader, start=2):
+            method = row["method"].strip()
+            if method not in METHODS:
+                raise ValueError(f"Line {lineNumber}: unknown method {method!r}.")
+            try:
+                limit = int(row["limit"])
+            except ValueError:
+                raise ValueError(
+                    f"Line {lineNumber}: invalid limit {row['limit']!r}."
+                ) from None
+            adaptTiterSteps = row["adaptTiterSteps"].strip() or False
+            if adaptTiterSteps and adaptTiterSteps not in TITER_STEP_ADAPTATIONS:
+                raise ValueError(
+                    f"Line {lineNumber}: unknown titer step adaptation "
+                    f"{adaptTiterSteps!r}."
+                )
+            if not row["rawTiters"].strip() or not row["output"].strip():
+                raise ValueError(
+                    f"Line {lineNumber}: the raw titer and output files must "
+                    "be given."
+                )
+
+            entry = {
+                "rawTiters": join(directory, row["rawTiters"].strip()),
+                "method": method,
+                "limit": limit,
+                "fixedTiterFile": (
+                    join(directory, row["fixedTiterFile"].strip())
+                    if row["fixedTiterFile"].strip()
+                    else None
+                ),
+                "adaptTiterSteps": adaptTiterSteps,
+                "interpolate": _parseBool(row["interpolate"], lineNumber),
+                "output": join(directory, row["output"].strip()),
+            }
+            for column, default in OPTIONAL_COLUMNS.items():
+                value = (row.get(column) or "").strip()
+                if not value:
+                    entry[column] = default
+                elif isinstance(default, int):
+                    try:
+                        entry[column] = int(value)
+                    except ValueError:
+                        raise ValueError(
+                            f"Line {lineNumber}: invalid {column} {value!r}."
+                        ) from None
+                else:
+                    entry[column] = value
+            entries.append(entry)
+
+    outputs = [entry["output"] for entry in entries]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(f"Manifest {fileName!r} has an output more than once.")
+
+    return entries
+
+
+def groupManifest(entries):
+    """
+    Group the tables of a manifest that can be made together, i.e. from the
+    same raw data with the same titer steps and options.
+
+    @param entries: a C{list} of C{dict}s returned by C{readManifest}.
+    @return: a C{dict} mapping (rawTiters, sheet, cellRange, rowTiterStart,
+        serumColumnsStart, adaptTiterSteps, interpolate, nd) C{tuple}s to
+        C{list}s of entries, in the order of the manifest. Interpolation
+        only applies to continuous tables, so discrete tables are grouped
+        with the tables that don't interpolate.
+    """
+    groups = {}
+    for entry in entries:
+        key = (
+            entry["rawTiters"],
+            entry["sheet"],
+            entry["cellRange"],
+            entry["rowTiterStart"],
+            entry["serumColumnsStart"],
+            entry["adaptTiterSteps"],
+            entry["interpolate"] and entry["method"] != "discrete",
+            entry["nd"],
+        )
+        groups.setdefault(key, []).append(entry)
+    return groups
+
+
+def _buildGroup(
+    key, group, viruses, plates, jobs, fitter, fitCache, fitStats, incremental
+):
+    """
+    Make the titer tables of one group of a manifest (see C{groupManifest}).
+
+    @param key: the C{tuple} key of the group.
+    @param group: a C{list} of the entries of the group.
+    @param plates: a C{dict} of the C{plate.Plate}s already read, keyed by
+        the first five elements of the group keys.
+    @return: a C{tuple} with a C{list} of the C{int} number of titers
+        calculated for each entry and the C{list} of C{fitStats} (or
+        C{None}).
+    """
+    (
+        rawTiters,
+        sheet,
+        cellRange,
+        rowTiterStart,
+        serumColumnsStart,
+        adaptTiterSteps,
+        interpolate,
+        nd,
+    ) = key
+    plateKey = key[:5]
+    if plateKey not in plates:
+        plates[plateKey] = Plate(
+            loadParsedTiters(
+                rawTiters,
+                rowTiterStart,
+                serumColumnsStart,
+                VIRUSES,
+                sheet=sheet,
+                cellRange=cellRange,
+            )
+        )
+
+    stats = [] if fitStats else None
+    counts = makeTiterTableFiles(
+        plates[plateKey],
+        viruses,
+        [
+            (entry["method"], entry["limit"], entry["fixedTiterFile"], entry["output"])
+            for entry in group
+        ],
+        adaptTiterSteps=adaptTiterSteps,
+        interpolate=interpolate,
+        nd=nd,
+        jobs=jobs,
+        fitter=fitter,
+        fitCache=fitCache,
+        fitStats=stats,
+        incremental=incremental,
+    )
+    return counts, stats
+
+
+def buildManifest(
+    entries,
+    viruses=VIRUSES,
+    jobs=1,
+    fitter="neutcurve",
+    fitCache=None,
+    fitStats=None,
+    incremental=False,
+):
+    """
+    Make all titer tables of a manifest in one run. Each raw data file is
+    parsed once, and the tables of each group (see C{groupManifest}) are
+    made together, so each curve is fitted once per method. With one
+    process, the groups also reuse each other's fits through C{fitCache}.
+
+    With more than one process, the groups are made concurrently, each
+    fitting its curves in its share of the processes. Each group then has
+    its own copy of C{fitCache}, starting with no fits in memory, so the
+    groups only share fits through the cache files on disk, and only once
+    they are written. The caller's C{fitCache} doesn't get the fits. The
+    tables are the same for any number of processes.
+
+    @param entries: a C{list} of C{dict}s returned by C{readManifest}.
+    @param viruses: a C{list} of the C{str} names of the viruses to put in
+        the tables. The raw data files must have the C{common.VIRUSES}.
+    @param jobs: the C{int} number of processes to use.
+    @param fitter: the C{str} name of the fitter to use, one of
+        C{parseTiters.FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse fits from, or C{None}.
+    @param fitStats: a C{list} to append a C{dict} describing each
+        continuous fit to, or C{None}.
+    @param incremental: If C{True} only calculate the titers of pairs whose
+        plaque counts changed (see C{titerTable.makeTiterTableFiles}).
+    @raise ValueError: if a fixed titer doesn't match its original titer.
+    @return: a C{dict} mapping each C{str} output file to the C{int} number
+        of titers calculated for it.
+    """
+    groups = groupManifest(entries)
+    options = dict(
+        fitter=fitter,
+        fitCache=fitCache,
+        fitStats=fitStats is not None,
+        incremental=incremental,
+    )
+
+    if jobs == 1 or len(groups) < 2:
+        plates = {}
+        results = [
+            _buildGroup(key, group, viruses, plates, jobs, **options)
+            for key, group in groups.items()
+        ]
+    else:
+        groupJobs = max(1, jobs // len(groups))
+        with ProcessPoolExecutor(max_workers=min(jobs, len(groups))) as executor:
+            futures = [
+                executor.submit(
+                    _buildGroup, key, group, viruses, {}, groupJobs, **options
+                )
+                for key, group in groups.items()
+            ]
+            results = [future.result() for future in futures]
+
+    calculated = {}
+    for group, (counts, stats) in zip(groups.values(), results):
+        for entry, count in zip(group, counts):
+            calculated[entry["output"]] = count
+        if fitStats is not None:
+            fitStats.extend(stats)
+
+    return calculated
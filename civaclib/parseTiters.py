@@ -4,11 +4,52 @@ import pandas as pd
 from warnings import warn
 import sys
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, lru_cache
 from math import log2
+from pathlib import Path
+from time import perf_counter
 
 import neutcurve
 
 from .common import titerSteps, LIMIT
+from .hill import (
+    PARAMETERS,
+    fitHillCurves,
+    highestDilutions,
+    locateICXX,
+    makeHillCurves,
+    titerBounds,
+)
+from .plate import (
+    Plate,
+    NOT_DONE,
+    averageReplicates,
+    decodePlaqueCounts,
+    encodePlaqueCounts,
+)
+from .registry import VIRUS_REGISTRY
+
+# The ways continuous curves can be fitted: one at a time by neutcurve, or
+# all pairs at once by hill.fitHillCurves.
+FITTERS = ("neutcurve", "batch")
+
+# The fixtop and fixbottom arguments to getPRNTContinuous for each continuous
+# method, from the most to the least constrained.
+CONTINUOUS_METHODS = {
+    "continuous-fixtop-fixbottom": (True, True),
+    "continuous-fixtop": (True, False),
+    "continuous-fixbottom": (False, True),
+    "continuous": (False, False),
+}
+
+# The more constrained method whose curves the batch fits of a continuous
+# method are started from.
+WARM_STARTS = {
+    "continuous-fixtop": "continuous-fixtop-fixbottom",
+    "continuous-fixbottom": "continuous-fixtop-fixbottom",
+    "continuous": "continuous-fixtop",
+}
 
 
 def averagePlaqueCounts(counts, vk):
@@ -48,6 +89,101 @@ def averagePlaqueCounts(counts, vk):
         return np.mean(toAverage)
 
 
+def _cellToText(value):
+    """
+    Convert the value of a workbook cell to the text it has in a CSV export
+    of the sheet.
+
+    @param value: the value of the cell as returned by C{openpyxl}.
+    @return: a C{str}, or C{numpy.nan} if the cell is empty.
+    """
+    if value is None:
+        return np.nan
+    elif isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    else:
+        return str(value)
+
+
+def readTiterSheet(fileName, sheet=None, cellRange=None):
+    """
+    Read a sheet of an .xlsx workbook with plaque counts. The workbook is
+    opened in read-only mode, so rows are streamed and only the requested
+    sheet is held in memory. The result is the same as calling
+    C{pandas.read_csv} on a CSV export of the sheet (or range of cells): the
+    first row is used as column headers and all other cells are text.
+
+    @param fileName: the C{str} filename of the workbook.
+    @param sheet: the C{str} name of the sheet to read. Defaults to the first
+        sheet.
+    @param cellRange: a C{str} range of cells (e.g. 'A1:GT126') to read.
+        Defaults to the whole sheet.
+    @return: a C{pandas.DataFrame}.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils.cell import range_boundaries
+
+    if cellRange:
+        minCol, minRow, maxCol, maxRow = range_boundaries(cellRange)
+    else:
+        minCol = minRow = maxCol = maxRow = None
+
+    workbook = load_workbook(fileName, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = [
+            [_cellToText(value) for value in row]
+            for row in worksheet.iter_rows(
+                min_row=minRow,
+                max_row=maxRow,
+                min_col=minCol,
+                max_col=maxCol,
+                values_only=True,
+            )
+        ]
+    finally:
+        workbook.close()
+
+    if not rows:
+        raise ValueError(f"No cells found in {fileName!r}.")
+
+    width = max(len(row) for row in rows)
+    rows = [row + [np.nan] * (width - len(row)) for row in rows]
+
+    # Name the columns the same way pandas.read_csv does.
+    columns = []
+    seen = {}
+    for i, name in enumerate(rows[0]):
+        name = f"Unnamed: {i}" if name is np.nan else name
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    return pd.DataFrame(rows[1:], columns=columns, dtype=object)
+
+
+def readTiterFile(fileName, sheet=None, cellRange=None):
+    """
+    Read a file with plaque counts, either a CSV file or an .xlsx workbook.
+
+    @param fileName: the C{str} filename of the file.
+    @param sheet: the C{str} name of the sheet to read if C{fileName} is an
+        .xlsx workbook.
+    @param cellRange: a C{str} range of cells to read if C{fileName} is an
+        .xlsx workbook.
+    @return: a C{pandas.DataFrame}.
+    """
+    if Path(fileName).suffix.lower() in {".xlsx", ".xlsm"}:
+        return readTiterSheet(fileName, sheet=sheet, cellRange=cellRange)
+    elif sheet or cellRange:
+        raise ValueError("A sheet or cell range can only be given for workbooks.")
+    else:
+        return pd.read_csv(fileName)
+
+
 def parseTiterExcel(
     fileName,
     rowTiterStart,
@@ -55,6 +191,8 @@ def parseTiterExcel(
     viruses,
     serumColumnsNames=None,
     addAverage=False,
+    sheet=None,
+    cellRange=None,
 ):
     """
     Parse the excel file with titers from Felix and Marie. The file has the
@@ -65,7 +203,8 @@ def parseTiterExcel(
     information about the Viruskontrolle. The information about the actual
     titers starts on the given by the index in 'rowTiterStart'.
 
-    @param fileName: the C{str} filename of the excel file.
+    @param fileName: the C{str} filename of the file. This is either a CSV
+        file exported from the excel file or an .xlsx workbook.
     @param rowTiterStart: the C{int} index of the row on which the titrations
         start.
     @param serumColumnsStart: the C{int} index of the column of the first
@@ -76,16 +215,23 @@ def parseTiterExcel(
         viruses.
     @param addAverage: if C{True}: add the average of the replicates per
         serum/ag to the dataframe.
+    @param sheet: the C{str} name of the sheet to read if C{fileName} is an
+        .xlsx workbook. Defaults to the first sheet.
+    @param cellRange: a C{str} range of cells (e.g. 'A1:GT126') to read if
+        C{fileName} is an .xlsx workbook. Defaults to the whole sheet.
 
     @return: a C{pandas.DataFrame} with raw plaque counts parsed out.
     """
     serumColumnsNames = serumColumnsNames or titerSteps
 
     # Read in the filename
-    d = pd.read_csv(fileName)
+    d = readTiterFile(fileName, sheet=sheet, cellRange=cellRange)
 
-    # Sanity checks
-    missingViruses = set(v for v in d.columns if "Unnamed" not in v) - set(viruses)
+    # Sanity checks. The headers may use aliases of the virus names (e.g.
+    # Greek letters).
+    missingViruses = set(
+        VIRUS_REGISTRY.canonical(v) for v in d.columns if "Unnamed" not in v
+    ) - set(viruses)
     if missingViruses:
         warn(
             f"These viruses specified by you are not present in the "
@@ -95,67 +241,70 @@ def parseTiterExcel(
 
     # Change the index
     d.columns = d.iloc[0]
+    header = d.columns.to_numpy(dtype=object)
+    values = d.to_numpy(dtype=object)
+
+    # Build the index of the titer columns of all viruses once. Each virus
+    # block starts at a '1:20' column and the blocks are in the same order as
+    # the viruses.
+    starts = np.flatnonzero(header == "1:20")
+    if len(starts) > len(viruses):
+        raise ValueError(
+            f"Found {len(starts)} blocks of titer columns, but only "
+            f"{len(viruses)} viruses were given."
+        )
+    elif len(starts) < len(viruses):
+        raise ValueError(
+            f"No titer columns found for these viruses: "
+            f"{list(viruses[len(starts):])}"
+        )
 
-    # Get the indices of the titers
-    firstTiterFound = 0
-
-    indices = {}
-
-    for i, colname in enumerate(d.columns):
-        if colname == "1:20":
-            virusName = viruses[firstTiterFound]
-            indices[virusName] = [i, i + len(serumColumnsNames) - 1]
-            firstTiterFound += 1
-
-    parsedTable = []
-    for virusIndex, virus in enumerate(viruses):
-        # Get the indices of the first and column that we're considering for
-        # this particular virus
-        virusColumnInfo = indices[virus]
-
-        # Make a note of the index of the first and last columns with plaque
-        # counts
-        countStart = virusColumnInfo[0]
-        countEnd = virusColumnInfo[1]
-
-        # Make sure the indices are correct
-        assert d.columns[countStart] == serumColumnsNames[0]
-        assert d.columns[countEnd] == serumColumnsNames[-1]
-
-        # Loop through the rows, and if it's a row related to raw plaque
-        # counts, keep them.
-        for i, row in d.iterrows():
-            if i >= rowTiterStart:
-                rowList = list(row)
-                if rowList[0] == rowList[0]:
-                    # If the first element in the row isn't nan, the first element is
-                    # the name of the serum, the second element the name of the virus.
-                    serumName = rowList[0]
-                    serumVirusName = rowList[1]
-                if rowList[2] in ["PFU Ansatz 1", "PFU Ansatz 2"]:
-                    # Get the information about the Viruskontrolle
-                    averageVirusKontrolle = None
-
-                    # Loop over the possible columns to find the column with the viruskontrolle
-                    for offset in (1, 2, 3):
-                        if rowList[countStart - offset] == "x":
-                            averageVirusKontrolle = float(
-                                d.iat[rowTiterStart - 1, countStart - offset]
-                            )
-                            break
-                    # Check if averageVirusKontrolle was found
-                    if averageVirusKontrolle is None:
-                        raise ValueError("No Viruskontrolle found for virus %s" % virus)
-
-                    # Add the data
-                    rowData = [
-                        serumName,
-                        serumVirusName,
-                        virus,
-                        averageVirusKontrolle,
-                        rowList[2],
-                    ] + rowList[countStart : countEnd + 1]
-                    parsedTable.append(rowData)
+    nSteps = len(serumColumnsNames)
+    countColumns = starts[:, np.newaxis] + np.arange(nSteps)
+
+    # Make sure the indices are correct
+    assert (header[countColumns[:, 0]] == serumColumnsNames[0]).all()
+    assert (header[countColumns[:, -1]] == serumColumnsNames[-1]).all()
+
+    # Find the rows related to raw plaque counts. The serum name and the
+    # name of the virus the hamster was infected with are only given in the
+    # first row of each serum, so carry them forward.
+    body = values[rowTiterStart:]
+    named = pd.notna(body[:, 0])
+    lastNamed = np.maximum.accumulate(np.where(named, np.arange(len(body)), -1))
+    rows = np.flatnonzero(
+        pd.Series(body[:, 2]).isin(["PFU Ansatz 1", "PFU Ansatz 2"]).to_numpy()
+    )
+    if (lastNamed[rows] < 0).any():
+        raise ValueError("Found plaque counts before the name of the first serum.")
+
+    countRows = body[rows]
+    serumNames = body[lastNamed[rows], 0]
+    serumVirusNames = body[lastNamed[rows], 1]
+
+    # Get the information about the Viruskontrolle. It is marked with an 'x'
+    # in one of the three columns before the titer columns of each virus.
+    vkColumns = starts[:, np.newaxis] - np.array([1, 2, 3])
+    marks = countRows[:, vkColumns] == "x"
+    found = marks.any(axis=2)
+    if not found.all():
+        virus = viruses[np.flatnonzero(~found.all(axis=0))[0]]
+        raise ValueError("No Viruskontrolle found for virus %s" % virus)
+    vkColumn = vkColumns[np.arange(len(viruses)), marks.argmax(axis=2)]
+    averageVirusKontrolle = values[rowTiterStart - 1, vkColumn].astype(float)
+
+    # Pull out the counts for all viruses at once, ordered by virus and then
+    # by row.
+    nRows = len(rows)
+    counts = countRows[:, countColumns].transpose(1, 0, 2).reshape(-1, nSteps)
+
+    parsedTable = np.empty((len(viruses) * nRows, 5 + nSteps), dtype=object)
+    parsedTable[:, 0] = np.tile(serumNames, len(viruses))
+    parsedTable[:, 1] = np.tile(serumVirusNames, len(viruses))
+    parsedTable[:, 2] = np.repeat(np.array(viruses, dtype=object), nRows)
+    parsedTable[:, 3] = averageVirusKontrolle.T.ravel()
+    parsedTable[:, 4] = np.tile(countRows[:, 2], len(viruses))
+    parsedTable[:, 5:] = counts
 
     countData = pd.DataFrame(
         parsedTable,
@@ -167,32 +316,29 @@ def parseTiterExcel(
             "Replicate",
         ]
         + serumColumnsNames,
-    )
+    ).infer_objects()
 
     if not addAverage:
         return countData
     else:
         # Add information about the average plaque counts of all replicates
         # per serum/virus pair.
-        averages = []
-        for group in countData.groupby(by=["sample ID", "Antigen"]):
-            groupData = []
-            groupData.extend(
-                [
-                    list(group[1]["sample ID"])[0],
-                    list(group[1]["Infektion Hamster"])[0],
-                    list(group[1]["Antigen"])[0],
-                    list(group[1]["Viruskontrolle"])[0],
-                    "Average",
-                ]
-            )
-
-            for titerStep in serumColumnsNames:
-                counts = list(group[1][titerStep])
-                avg = averagePlaqueCounts(counts, list(group[1]["Viruskontrolle"])[0])
-                groupData.append(avg)
+        groups = countData.groupby(by=["sample ID", "Antigen"]).ngroup().to_numpy()
+        rows = np.flatnonzero(groups >= 0)
+        firstRows = rows[np.unique(groups[rows], return_index=True)[1]]
+
+        counts, flags = encodePlaqueCounts(countData[serumColumnsNames].to_numpy())
+        averageCounts, averageFlags = averageReplicates(
+            counts[rows],
+            flags[rows],
+            countData["Viruskontrolle"].to_numpy(dtype=float)[firstRows],
+            groups[rows],
+        )
 
-            averages.append(groupData)
+        averages = np.empty((len(firstRows), 5 + nSteps), dtype=object)
+        averages[:, :4] = countData.iloc[firstRows, :4].to_numpy(dtype=object)
+        averages[:, 4] = "Average"
+        averages[:, 5:] = decodePlaqueCounts(averageCounts, averageFlags)
 
         averagesDf = pd.DataFrame(
             averages,
@@ -204,7 +350,7 @@ def parseTiterExcel(
                 "Replicate",
             ]
             + serumColumnsNames,
-        )
+        ).infer_objects()
         return pd.concat([countData, averagesDf], axis=0, ignore_index=True)
 
 
@@ -245,6 +391,28 @@ def calculateFractionInfectivity(nr, vk, neutralisationPercent=False):
             return float(nr) / vk
 
 
+@lru_cache(maxsize=None)
+def _stepConcentrations(steps):
+    """
+    Get the concentrations of a C{tuple} of titer steps (see
+    C{stepConcentrations}).
+    """
+    concentrations = 1 / np.array([int(step[2:]) for step in steps])
+    concentrations.flags.writeable = False
+    return concentrations
+
+
+def stepConcentrations(steps):
+    """
+    Get the serum concentrations of titer steps, e.g. 1/54 for '1:54'. Each
+    set of steps is only parsed once, and its concentrations are shared.
+
+    @param steps: an iterable of C{str} titer steps.
+    @return: a read-only C{numpy.ndarray} of C{float} concentrations.
+    """
+    return _stepConcentrations(tuple(steps))
+
+
 def convertRawCountsToNeutcurveDf(rawDf, dropAverages=True, customTiterSteps=None):
     """
     Convert the dataframe from the raw count data into the format
@@ -258,7 +426,7 @@ def convertRawCountsToNeutcurveDf(rawDf, dropAverages=True, customTiterSteps=Non
     """
     customTiterSteps = customTiterSteps or titerSteps
 
-    concentrations = [1 / int(step[2:]) for step in customTiterSteps]
+    concentrations = stepConcentrations(customTiterSteps)
 
     colNames = [
         "sample ID",
@@ -270,40 +438,28 @@ def convertRawCountsToNeutcurveDf(rawDf, dropAverages=True, customTiterSteps=Non
 
     rawDf.columns = colNames
 
-    rawDf = rawDf.copy(deep=True)
-
-    for i, titerStep in enumerate(customTiterSteps):
-        rawDf[concentrations[i]] = [
-            calculateFractionInfectivity(row[titerStep], row["Viruskontrolle"])
-            for i, row in rawDf.iterrows()
-        ]
+    plate = Plate(rawDf, titerSteps=customTiterSteps)
 
     if dropAverages:
-        rawDf = rawDf.loc[rawDf["Replicate"] != "Average"]
-
-    # Reformat the data so it has the right columns for neutcurve.
-    concentration = []
-    fractionInfectivity = []
-    virus = []
-    serum = []
-    replicate = []
-
-    for i, row in rawDf.iterrows():
-        for conc in concentrations:
-            if row[conc] != "nd":
-                concentration.append(conc)
-                fractionInfectivity.append(row[conc])
-                virus.append(row["Antigen"])
-                serum.append(row["sample ID"])
-                replicate.append(row["Replicate"][-1:])
+        rows = np.flatnonzero((plate.info["Replicate"] != "Average").to_numpy())
+    else:
+        rows = np.arange(len(plate))
+
+    # Reformat the data so it has the right columns for neutcurve. There is
+    # one row for each well that was titrated, ordered by row of the raw data
+    # and then by dilution.
+    rowIndex, stepIndex = np.nonzero(plate.flags[rows] != NOT_DONE)
+    info = plate.info.iloc[rows[rowIndex]]
 
     neutcurveData = pd.DataFrame(
         {
-            "concentration": concentration,
-            "fraction infectivity": fractionInfectivity,
-            "virus": virus,
-            "serum": serum,
-            "replicate": replicate,
+            "concentration": concentrations[stepIndex],
+            "fraction infectivity": plate.fractionInfectivity()[
+                rows[rowIndex], stepIndex
+            ],
+            "virus": info["Antigen"].to_numpy(),
+            "serum": info["sample ID"].to_numpy(),
+            "replicate": info["Replicate"].str[-1:].to_numpy(),
         }
     )
 
@@ -326,22 +482,15 @@ def convertRawCountsToDiscreteDf(rawDf, customTiterSteps=None):
     elif rawDf.shape[0] > 1 and "Average" not in list(rawDf["Replicate"]):
         raise ('Dataframe must contain "Average" replicate or only one replicate.')
 
-    reformatted = []
-    for i, row in rawDf.iterrows():
-        rowInfo = []
-        rowInfo.extend([row["sample ID"], row["Infektion Hamster"], row["Antigen"]])
+    plate = Plate(rawDf, titerSteps=customTiterSteps)
+    percent = plate.neutralisationPercent().astype(object)
+    percent[plate.flags == NOT_DONE] = "nd"
 
-        for titerStep in customTiterSteps:
-            rowInfo.append(
-                calculateFractionInfectivity(
-                    row[titerStep], row["Viruskontrolle"], neutralisationPercent=True
-                )
-            )
-        reformatted.append(rowInfo)
-
-    columnNames = ["sample ID", "Infektion Hamster", "Antigen"] + customTiterSteps
+    reformatted = plate.info[["sample ID", "Infektion Hamster", "Antigen"]].copy()
+    for i, titerStep in enumerate(customTiterSteps):
+        reformatted[titerStep] = percent[:, i]
 
-    return pd.DataFrame(reformatted, columns=columnNames)
+    return reformatted
 
 
 def getPRNTDiscrete(rawCounts, limit=None, steps=None, nd="<20"):
@@ -419,24 +568,109 @@ def getPRNTDiscrete(rawCounts, limit=None, steps=None, nd="<20"):
     return prnt
 
 
-def getPRNTContinuous(data, limit=50, fixtop=True, fixbottom=True, interpolate=False):
+def getPRNTDiscreteBatch(percent, notDone, limit=None, steps=None, nd="<20"):
     """
-    Get continuous PRNT titers. This uses the neutcurve package by the Bloom
+    Get the discrete titers of many serum/virus pairs at once. This gives
+    exactly the same titers as calling C{getPRNTDiscrete} for each pair.
+
+    @param percent: a C{numpy.ndarray} of C{float}s with one row per pair and
+        one column per dilution, holding the percent reduction in number of
+        plaques. Columns are ordered from lowest to highest dilution.
+    @param notDone: a C{numpy.ndarray} of C{bool}s with the shape of
+        C{percent} that is C{True} where no titration was done ('nd').
+    @param limit: the C{int} level of sensitivity. Usually 50 or 90.
+    @param steps: a C{list} of dilution levels that were tested, used for all
+        pairs, or a C{list} with one such C{list} per pair.
+    @param nd: the lowest titer level. Usually '<20'.
+    @raise ValueError: if the dilutions don't match the columns of
+        C{percent}, or if the titer of a pair would have to be compared with
+        a dilution that was not titrated.
+    @return: a C{list} of C{str} titers, one per pair.
+    """
+    limit = limit or LIMIT
+    steps = steps or titerSteps
+
+    percent = np.asarray(percent, dtype=float)
+    done = ~np.asarray(notDone, dtype=bool)
+    nPairs, nSteps = percent.shape
+
+    stepNames = np.array([[step[2:] for step in row] for row in np.atleast_2d(steps)])
+    if stepNames.shape[1] != nSteps:
+        raise ValueError("Data dilutions do not match given dilutions.")
+    stepNames = np.broadcast_to(stepNames, (nPairs, nSteps))
+
+    pairs = np.arange(nPairs)
+    anyDone = done.any(axis=1)
+    result = np.full(nPairs, nd, dtype=object)
+    result[~anyDone] = "*"
+
+    # Step through the dilutions from highest to lowest, looking for the
+    # first one where the reduction is above the limit.
+    reversedPercent = percent[:, ::-1]
+    reversedDone = done[:, ::-1]
+    above = reversedDone & (reversedPercent > limit)
+    found = above.any(axis=1)
+    # The offsets (from the highest dilution) of the first dilution above the
+    # limit and of the first dilution that was titrated at all.
+    aboveIndex = above.argmax(axis=1)
+    firstDoneIndex = reversedDone.argmax(axis=1)
+    stepIndex = nSteps - 1 - aboveIndex
+    value = percent[pairs, stepIndex]
+
+    # The titer at the highest titrated dilution is already above the limit.
+    first = found & (aboveIndex == firstDoneIndex)
+    result[first] = np.where(
+        value[first] - 5 > limit,
+        np.char.add(">", stepNames[first, stepIndex[first]]),
+        stepNames[first, stepIndex[first]],
+    )
+
+    # Otherwise choose between the dilution and the next higher one,
+    # depending on which is closer to the limit.
+    between = found & ~first
+    previousIndex = np.minimum(stepIndex + 1, nSteps - 1)
+    if not done[pairs[between], previousIndex[between]].all():
+        raise ValueError("The dilution after the one above the limit was not titrated.")
+    previousValue = percent[pairs, previousIndex]
+    closerToPrevious = np.abs(previousValue - limit) < np.abs(value - limit)
+    result[between] = stepNames[
+        pairs[between],
+        np.where(closerToPrevious, previousIndex, stepIndex)[between],
+    ]
+
+    # The reduction never went above the limit. Use the lowest titrated
+    # dilution that is below the limit, with a cut-off to prevent titers
+    # that are close to the limit to be nd.
+    below = done & (percent < limit)
+    notFound = anyDone & ~found & below.any(axis=1)
+    belowIndex = below.argmax(axis=1)
+    belowValue = percent[pairs, belowIndex]
+    result[notFound] = np.where(
+        belowValue[notFound] + 5 < limit,
+        np.char.add("<", stepNames[notFound, belowIndex[notFound]]),
+        stepNames[notFound, belowIndex[notFound]],
+    )
+
+    return [str(titer) for titer in result]
+
+
+def fitContinuousCurve(data, fixtop=True, fixbottom=True, fitCache=None):
+    """
+    Fit a neutralisation curve. This uses the neutcurve package by the Bloom
     lab.
 
-    @param limit: the C{int} level of sensitivity. Usually 0.5 or 0.9.
+    @param data: a C{pandas.DataFrame} returned by
+        C{convertRawCountsToNeutcurveDf}.
     @param fixtop: Fix the top of the neutralisation curve at 1.
     @param fixbottom: Fix the bottom of the neutralisation curve at 0.
-    @param interpolate: If C{True} interpolate titers that are out of bounds of
-        the dilutions tested. IF USING THIS, MAKE SURE TO CHECK THE
-        INTERPOLATED TITER AGAINST THE NEUTRALISATION CURVE TO MAKE SURE THE
-        TITER STILL MAKES SENSE!!
+    @param fitCache: a C{cache.FitCache} to get a previously fitted curve
+        from and to add new fits to, or C{None} to always fit the curve.
+    @return: a C{neutcurve.HillCurve}.
     """
-    limit = limit / 100
-
-    # If no titrations have ben done, return *
-    if data.shape[0] == 0:
-        return "*", "*"
+    if fitCache is not None:
+        curve = fitCache.get(data, fixtop=fixtop, fixbottom=fixbottom)
+        if curve is not None:
+            return curve
 
     if fixtop and fixbottom:
         curve = neutcurve.HillCurve(
@@ -468,62 +702,455 @@ def getPRNTContinuous(data, limit=50, fixtop=True, fixbottom=True, interpolate=F
             fixbottom=False,
         )
 
-    if curve.icXX(limit):
-        # The titer is within one of the performed dilutions of the assay.
-        prnt = f"{1/curve.icXX(limit):.2f}"
-    else:
-        # The titer is non-detectable, either as > or <.
-        if curve.icXX_str(limit).startswith("<"):
-            cutoffs = {
-                "<0.000195": {
-                    "limit": 10240,
-                    "newTiter": ">5120",
-                },
-                "<0.000391": {
-                    "limit": 5120,
-                    "newTiter": ">2560",
-                },
-                "<0.000781": {
-                    "limit": 2560,
-                    "newTiter": ">1280",
-                },
-                "<0.00156": {
-                    "limit": 1280,
-                    "newTiter": ">640",
-                },
-                "<0.00313": {
-                    "limit": 640,
-                    "newTiter": ">320",
-                },
-                "<0.00625": {
-                    "limit": 320,
-                    "newTiter": ">160",
-                },
+    if fitCache is not None:
+        fitCache.put(data, curve, fixtop=fixtop, fixbottom=fixbottom)
+
+    return curve
+
+
+def fitContinuousCurves(
+    datasets,
+    fixtop=True,
+    fixbottom=True,
+    fitter="neutcurve",
+    fitCache=None,
+    initialCurves=None,
+    stats=None,
+):
+    """
+    Fit the neutralisation curves of many serum/virus pairs.
+
+    With the 'batch' fitter, all curves are fitted at once by
+    C{hill.fitHillCurves}, which costs about as much as fitting one curve
+    with neutcurve. Fits that don't converge (typically curves that are
+    nearly flat, where the parameters are not well determined) are done
+    again with neutcurve. Fits with a free top or bottom are started from
+    the curves of the more constrained method given in C{WARM_STARTS},
+    which are fitted first if they aren't given.
+
+    @param datasets: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair.
+    @param fixtop: Fix the top of the neutralisation curve at 1.
+    @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+    @param fitter: the C{str} name of the fitter to use, one of C{FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param initialCurves: a C{list} of the C{neutcurve.HillCurve}s of the
+        method in C{WARM_STARTS}, one per pair, as returned by this
+        function with the same fitter. Only used by the 'batch' fitter.
+    @param stats: a C{list} to append a C{dict} describing the fit of each
+        pair to (see C{_fitStats}), an empty C{dict} for pairs without data,
+        or C{None}.
+    @raise ValueError: if the fitter is unknown.
+    @return: a C{list} of C{neutcurve.HillCurve}s, one per pair, C{None} for
+        pairs without data.
+    """
+    if fitter == "neutcurve":
+        curves = []
+        for data in datasets:
+            if data.shape[0]:
+                start = perf_counter()
+                curve = fitContinuousCurve(
+                    data, fixtop=fixtop, fixbottom=fixbottom, fitCache=fitCache
+                )
+                if stats is not None:
+                    stats.append(_fitStats(curve, fitter, perf_counter() - start))
+            else:
+                curve = None
+                if stats is not None:
+                    stats.append({})
+            curves.append(curve)
+        return curves
+    elif fitter != "batch":
+        raise ValueError(f"Unknown fitter {fitter!r}.")
+
+    curves = [None] * len(datasets)
+    pairStats = [{} for _ in datasets]
+    toFit = []
+    for i, data in enumerate(datasets):
+        if data.shape[0]:
+            if fitCache is not None:
+                start = perf_counter()
+                curves[i] = fitCache.get(
+                    data, fixtop=fixtop, fixbottom=fixbottom, fitter=fitter
+                )
+                if curves[i] is not None:
+                    pairStats[i] = _fitStats(curves[i], fitter, perf_counter() - start)
+            if curves[i] is None:
+                toFit.append(i)
+
+    if toFit:
+        fitData = [datasets[i] for i in toFit]
+
+        initial = None
+        method = next(
+            method
+            for method, options in CONTINUOUS_METHODS.items()
+            if options == (fixtop, fixbottom)
+        )
+        if method in WARM_STARTS:
+            if initialCurves is None:
+                startCurves = fitContinuousCurves(
+                    fitData,
+                    *CONTINUOUS_METHODS[WARM_STARTS[method]],
+                    fitter=fitter,
+                    fitCache=fitCache,
+                )
+            else:
+                startCurves = [initialCurves[i] for i in toFit]
+            initial = {
+                name: [getattr(curve, name) for curve in startCurves]
+                for name in PARAMETERS
             }
-            # This is a > non-detectable titer.
-            # The neutcurve program doesn't give enough decimal points to get to
-            # the correct discrete titer value. Therefore do it by hand.
-            neutcurveLimit = curve.icXX_str(limit)
-            if neutcurveLimit in cutoffs:
-                if interpolate:
-                    prnt = interpolateContinuous(curve, limit)
-                    if prnt > cutoffs[neutcurveLimit]["limit"]:
-                        # I don't want to interpolate too far out of range.
-                        prnt = cutoffs[neutcurveLimit]["newTiter"]
-                    else:
-                        prnt = f"{1/prnt:.2f}"
-                else:
-                    prnt = cutoffs[neutcurveLimit]["newTiter"]
+
+        start = perf_counter()
+        fits = fitHillCurves(
+            fitData, fixtop=fixtop, fixbottom=fixbottom, initial=initial
+        )
+        # The pairs are fitted together, so share the time out between them.
+        seconds = (perf_counter() - start) / len(toFit)
+        for i, data, curve, converged, iterations in zip(
+            toFit,
+            fitData,
+            makeHillCurves(fitData, fits),
+            fits["converged"],
+            fits["iterations"],
+        ):
+            pairFitter = fitter
+            pairSeconds = seconds
+            if not converged:
+                start = perf_counter()
+                curve = fitContinuousCurve(
+                    data, fixtop=fixtop, fixbottom=fixbottom, fitCache=fitCache
+                )
+                pairFitter = "batch+neutcurve"
+                pairSeconds += perf_counter() - start
+            pairStats[i] = _fitStats(
+                curve, pairFitter, pairSeconds, int(iterations), bool(converged)
+            )
+            curves[i] = curve
+            if fitCache is not None:
+                fitCache.put(
+                    data, curve, fixtop=fixtop, fixbottom=fixbottom, fitter=fitter
+                )
+
+    if stats is not None:
+        stats.extend(pairStats)
+
+    return curves
+
+
+def _fitStats(curve, fitter, seconds, iterations=None, converged=True):
+    """
+    Describe the fit of a curve, to find pairs that are slow to fit or badly
+    behaved.
+
+    @param curve: a C{neutcurve.HillCurve}.
+    @param fitter: the C{str} name of the fitter that fitted C{curve}.
+        'batch+neutcurve' means the batch fit didn't converge and was done
+        again with neutcurve.
+    @param seconds: the C{float} wall time the fit (or cache lookup) took.
+    @param iterations: the C{int} number of iterations of the batch fitter,
+        or C{None} if unknown (neutcurve doesn't report it).
+    @param converged: C{True} if the fit converged. neutcurve fits always
+        have, as neutcurve raises an error otherwise.
+    @return: a C{dict} with the 'fitter', 'seconds', 'iterations',
+        'converged', 'ssr' (residual sum of squares) and the parameters of
+        the curve.
+    """
+    stats = {
+        "fitter": fitter,
+        "seconds": seconds,
+        "iterations": iterations,
+        "converged": converged,
+        "ssr": float(((curve.fracinfectivity(curve.cs) - curve.fs) ** 2).sum()),
+    }
+    stats.update((name, float(getattr(curve, name))) for name in PARAMETERS)
+    return stats
+
+
+def getContinuousTiters(curves, limit=50, interpolate=False, readouts=None):
+    """
+    Read out the titers at a level of sensitivity from fitted neutralisation
+    curves. A titer that is out of the range of the dilutions of its curve is
+    given as a bound on the highest or lowest dilution, e.g. '>5120' or
+    '<20' (see C{hill.titerBounds}).
+
+    @param curves: an iterable of C{neutcurve.HillCurve}s.
+    @param limit: the C{int} level of sensitivity. Usually 50 or 90.
+    @param interpolate: If C{True} interpolate titers that are above the
+        highest dilution tested, if that is a dilution in
+        C{hill.HIGHEST_DILUTIONS}.
+    @param readouts: a C{list} to append how each titer was read out to:
+        'in range', 'interpolated', 'not reached' (interpolated, but the
+        curve never reaches the limit so the titer is 'nan') or 'bound', or
+        C{None}.
+    @return: a C{list} of C{str} titers, one per curve.
+    """
+    curves = list(curves)
+    # The concentrations of the highest and lowest dilutions of each curve.
+    highest = np.array([curve.cs[0] for curve in curves], dtype=float)
+    lowest = np.array([curve.cs[-1] for curve in curves], dtype=float)
+    icXX, inRange, above = locateICXX(
+        *(
+            np.array([getattr(curve, name) for curve in curves], dtype=float)
+            for name in PARAMETERS
+        ),
+        highest,
+        lowest,
+        limit / 100,
+    )
+    # Curves that never reach the limit have no icXX.
+    crosses = np.isfinite(icXX)
+    # Only titers above the highest dilution of the usual titer series are
+    # interpolated.
+    standard = highestDilutions(highest) > 0
+    aboveBounds = titerBounds(highest, above=True)
+    belowBounds = titerBounds(lowest, above=False)
+
+    titers = []
+    kinds = []
+    for i in range(len(curves)):
+        if inRange[i]:
+            titers.append(f"{1 / icXX[i]:.2f}")
+            kinds.append("in range")
+        elif above[i]:
+            if interpolate and standard[i]:
+                # Interpolated titers are not capped. The cap that was meant
+                # to stop them going too far out of range never applied. A
+                # curve that never reaches the limit has a 'nan' titer, to be
+                # replaced by a fixed titer.
+                titers.append(f"{1 / icXX[i]:.2f}")
+                kinds.append("interpolated" if crosses[i] else "not reached")
             else:
-                # This is a <?? non-detectable titer, but the upper bound isn't
-                # in the list above.
-                print("unknown upper bound", curve.icXX_str(limit))
-                prnt = f">{int(1/float(curve.icXX_str(limit)[1:]))}"
-        elif curve.icXX_str(limit).startswith(">"):
-            # This is a < non-detectable titer.
-            prnt = f"<{int(1/float(curve.icXX_str(limit)[1:]))}"
+                titers.append(f">{aboveBounds[i]}")
+                kinds.append("bound")
+        else:
+            titers.append(f"<{belowBounds[i]}")
+            kinds.append("bound")
+
+    if readouts is not None:
+        readouts.extend(kinds)
+
+    return titers
+
+
+def getContinuousTiter(curve, limit=50, interpolate=False):
+    """
+    Read out the titer at a level of sensitivity from a fitted neutralisation
+    curve.
+
+    @param curve: a C{neutcurve.HillCurve}.
+    @param limit: the C{int} level of sensitivity. Usually 50 or 90.
+    @param interpolate: If C{True} interpolate titers that are out of bounds of
+        the dilutions tested.
+    @return: the C{str} titer.
+    """
+    return getContinuousTiters([curve], limit=limit, interpolate=interpolate)[0]
+
+
+def getPRNTContinuous(
+    data, limit=50, fixtop=True, fixbottom=True, interpolate=False, fitCache=None
+):
+    """
+    Get continuous PRNT titers. This uses the neutcurve package by the Bloom
+    lab.
+
+    @param limit: the C{int} level of sensitivity. Usually 0.5 or 0.9.
+    @param fixtop: Fix the top of the neutralisation curve at 1.
+    @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+    @param interpolate: If C{True} interpolate titers that are out of bounds of
+        the dilutions tested. IF USING THIS, MAKE SURE TO CHECK THE
+        INTERPOLATED TITER AGAINST THE NEUTRALISATION CURVE TO MAKE SURE THE
+        TITER STILL MAKES SENSE!!
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    """
+    # If no titrations have ben done, return *
+    if data.shape[0] == 0:
+        return "*", "*"
+
+    curve = fitContinuousCurve(
+        data, fixtop=fixtop, fixbottom=fixbottom, fitCache=fitCache
+    )
+
+    return getContinuousTiter(curve, limit=limit, interpolate=interpolate), curve
+
+
+def _getPRNTContinuousChunk(
+    datasets, limits, fixtop, fixbottom, interpolate, fitter, fitCache, stats=False
+):
+    """
+    Get the continuous titers of a chunk of serum/virus pairs. This is the
+    unit of work run in each process by C{getPRNTContinuousLimits}.
+
+    @param datasets: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair.
+    @param limits: a C{list} of C{int} levels of sensitivity.
+    @param stats: if C{True}, also describe the fit of each pair.
+    @return: a C{list} with a C{list} of titers (one per limit) for each
+        pair. If C{stats} is C{True}, a C{tuple} of that C{list} and a
+        C{list} with a C{dict} for each pair, as made by C{_fitStats} and
+        with a 'titer' and 'readout' entry for each limit (e.g. 'titer50').
+    """
+    pairStats = [] if stats else None
+    curves = fitContinuousCurves(
+        datasets,
+        fixtop=fixtop,
+        fixbottom=fixbottom,
+        fitter=fitter,
+        fitCache=fitCache,
+        stats=pairStats,
+    )
+    fitted = [curve for curve in curves if curve is not None]
+    fittedIndices = [i for i, curve in enumerate(curves) if curve is not None]
+    titers = [["*"] * len(limits) for _ in curves]
+    for limitIndex, limit in enumerate(limits):
+        readouts = []
+        limitTiters = getContinuousTiters(
+            fitted, limit=limit, interpolate=interpolate, readouts=readouts
+        )
+        for i, titer, readout in zip(fittedIndices, limitTiters, readouts):
+            titers[i][limitIndex] = titer
+            if stats:
+                pairStats[i][f"titer{limit}"] = titer
+                pairStats[i][f"readout{limit}"] = readout
+
+    return (titers, pairStats) if stats else titers
+
+
+def getPRNTContinuousLimits(
+    datasets,
+    limits,
+    fixtop=True,
+    fixbottom=True,
+    interpolate=False,
+    jobs=1,
+    chunkSize=None,
+    fitter="neutcurve",
+    fitCache=None,
+    fitStats=None,
+):
+    """
+    Get the continuous titers of many serum/virus pairs at several levels of
+    sensitivity, optionally fitting the curves in a pool of processes. The
+    curve of each pair is only fitted once, whatever the number of limits.
+    The titers are the same, and in the same order, as when calling
+    C{getPRNTContinuous} for each pair and limit.
+
+    @param datasets: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair.
+    @param limits: a C{list} of C{int} levels of sensitivity, e.g. [50, 90].
+    @param fixtop: Fix the top of the neutralisation curve at 1.
+    @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+    @param interpolate: If C{True} interpolate titers that are out of bounds of
+        the dilutions tested.
+    @param jobs: the C{int} number of processes to fit curves in. If 1, all
+        curves are fitted in this process.
+    @param chunkSize: the C{int} number of pairs to send to a process at a
+        time. Defaults to splitting the pairs into four chunks per process.
+    @param fitter: the C{str} name of the fitter to use, one of C{FITTERS}.
+        The titers are only guaranteed to be the same as those of
+        C{getPRNTContinuous} with 'neutcurve'.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param fitStats: a C{list} to append a C{dict} describing the fit of
+        each pair to, or C{None}. Each has the 'fitter', 'seconds',
+        'iterations', 'converged', 'ssr' (residual sum of squares),
+        'midpoint', 'slope', 'bottom' and 'top' of the fit, and the titer
+        and how it was read out (see C{getContinuousTiters}) for each limit,
+        e.g. 'titer50' and 'readout50'. The C{dict}s of pairs without data
+        are empty.
+    @return: a C{dict} mapping each limit to a C{list} of titers, one per
+        pair.
+    """
+    datasets = list(datasets)
+    limits = list(limits)
+    options = dict(
+        limits=limits,
+        fixtop=fixtop,
+        fixbottom=fixbottom,
+        interpolate=interpolate,
+        fitter=fitter,
+        fitCache=fitCache,
+        stats=fitStats is not None,
+    )
 
-    return prnt, curve
+    if jobs == 1 or len(datasets) < 2:
+        results = [_getPRNTContinuousChunk(datasets, **options)]
+    else:
+        chunkSize = chunkSize or max(1, -(-len(datasets) // (4 * jobs)))
+        chunks = [
+            datasets[start : start + chunkSize]
+            for start in range(0, len(datasets), chunkSize)
+        ]
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(_getPRNTContinuousChunk, chunk, **options)
+                for chunk in chunks
+            ]
+            # Collect the results in the order the chunks were submitted, so
+            # the output doesn't depend on which process finishes first.
+            results = [future.result() for future in futures]
+
+    titers = []
+    for result in results:
+        if fitStats is None:
+            titers.extend(result)
+        else:
+            titers.extend(result[0])
+            fitStats.extend(result[1])
+
+    return {
+        limit: [pairTiters[i] for pairTiters in titers]
+        for i, limit in enumerate(limits)
+    }
+
+
+def getPRNTContinuousBatch(
+    datasets,
+    limit=50,
+    fixtop=True,
+    fixbottom=True,
+    interpolate=False,
+    jobs=1,
+    chunkSize=None,
+    fitter="neutcurve",
+    fitCache=None,
+):
+    """
+    Get the continuous titers of many serum/virus pairs, optionally fitting
+    the curves in a pool of processes. The titers are the same, and in the
+    same order, as when calling C{getPRNTContinuous} for each pair.
+
+    @param datasets: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair.
+    @param limit: the C{int} level of sensitivity. Usually 50 or 90.
+    @param fixtop: Fix the top of the neutralisation curve at 1.
+    @param fixbottom: Fix the bottom of the neutralisation curve at 0.
+    @param interpolate: If C{True} interpolate titers that are out of bounds of
+        the dilutions tested.
+    @param jobs: the C{int} number of processes to fit curves in. If 1, all
+        curves are fitted in this process.
+    @param chunkSize: the C{int} number of pairs to send to a process at a
+        time. Defaults to splitting the pairs into four chunks per process.
+    @param fitter: the C{str} name of the fitter to use, one of C{FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @return: a C{list} of titers, one per pair.
+    """
+    return getPRNTContinuousLimits(
+        datasets,
+        [limit],
+        fixtop=fixtop,
+        fixbottom=fixbottom,
+        interpolate=interpolate,
+        jobs=jobs,
+        chunkSize=chunkSize,
+        fitter=fitter,
+        fitCache=fitCache,
+    )[limit]
 
 
 def interpolateContinuous(curve, limit):
@@ -555,8 +1182,191 @@ def interpolateContinuous(curve, limit):
         )
 
 
+class AllTiters:
+    """
+    The discrete and continuous titers of a serum/virus pair. The data is
+    copied and converted for fitting when the instance is made, but the
+    discrete titer, each curve and each titer are only computed when they
+    are first used, so callers only pay for the titers they need. The
+    instance acts as the C{tuple} C{getAllTiters} used to return: iterating
+    over, indexing, unpacking, comparing or hashing it gives the discrete
+    titer and the titers of the 'continuous-fixtop-fixbottom',
+    'continuous-fixtop', 'continuous-fixbottom' and 'continuous' methods,
+    computing all of them.
+
+    @param data: the C{pandas.dataframe} returned by {parseTiterExcel} and
+        subsetted to the viruses and sera to get the titers for.
+    @param interpolate: If C{True} interpolate titers that are out of bounds of
+        the dilutions tested.
+    @param limit: the C{int} level of sensitivity.
+    @param customTiterSteps: a C{list} of C{str} titer steps, or C{None} to
+        use C{common.titerSteps}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param methods: the C{str} continuous methods (see C{CONTINUOUS_METHODS})
+        to give titers for, or C{None} for all of them. The titers of the
+        other methods are C{None}.
+    @param fitter: the C{str} name of the fitter to use, one of C{FITTERS}.
+        With 'batch', the curves with a free top or bottom are started from
+        the more constrained curves (see C{WARM_STARTS}), which are fitted
+        too.
+    @raise ValueError: if a method is unknown.
+    """
+
+    def __init__(
+        self,
+        data,
+        interpolate=False,
+        limit=50,
+        customTiterSteps=None,
+        fitCache=None,
+        methods=None,
+        fitter="neutcurve",
+    ):
+        self.methods = list(CONTINUOUS_METHODS) if methods is None else list(methods)
+        for method in self.methods:
+            if method not in CONTINUOUS_METHODS:
+                raise ValueError(f"Unknown method {method!r}.")
+
+        # Copy the data, so changes to the caller's frame don't change
+        # titers that haven't been computed yet.
+        self.data = data.copy()
+        self.interpolate = interpolate
+        self.limit = limit
+        self.customTiterSteps = customTiterSteps or titerSteps
+        self.fitCache = fitCache
+        self.fitter = fitter
+        self.continuousData = convertRawCountsToNeutcurveDf(
+            self.data, customTiterSteps=self.customTiterSteps
+        )
+        self._curves = {}
+        self._titers = {}
+
+    def _tuple(self):
+        """
+        Get all the titers, computing those that haven't been yet.
+
+        @return: a C{tuple} of the discrete titer and the titers of the
+            methods in C{CONTINUOUS_METHODS}.
+        """
+        return (self.discrete,) + tuple(
+            self.titer(method) for method in CONTINUOUS_METHODS
+        )
+
+    def __len__(self):
+        return 1 + len(CONTINUOUS_METHODS)
+
+    def __iter__(self):
+        return iter(self._tuple())
+
+    def __getitem__(self, index):
+        return self._tuple()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (AllTiters, tuple)):
+            return self._tuple() == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._tuple())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self._tuple()!r}"
+
+    @cached_property
+    def discrete(self):
+        """
+        The discrete titer.
+
+        @return: the C{str} titer, or '*' if no titrations were done.
+        """
+        if self.continuousData.shape[0] == 0:
+            return "*"
+
+        discreteData = convertRawCountsToDiscreteDf(
+            self.data, customTiterSteps=self.customTiterSteps
+        )
+        assert discreteData.shape[0] == 1, "Subset the dataframe given"
+        row = discreteData.iloc[0]
+
+        return getPRNTDiscrete(
+            {titerStep: row[titerStep] for titerStep in self.customTiterSteps},
+            limit=self.limit,
+            steps=self.customTiterSteps,
+            nd="<20",
+        )
+
+    def curve(self, method):
+        """
+        Get the curve fitted with a continuous method, fitting it on first
+        use. With the 'batch' fitter, the curves with a free top or bottom
+        are started from the more constrained curves (see C{WARM_STARTS}).
+
+        @param method: the C{str} continuous method.
+        @raise ValueError: if C{method} is unknown.
+        @return: a C{neutcurve.HillCurve}, or C{None} if no titrations were
+            done.
+        """
+        if method not in CONTINUOUS_METHODS:
+            raise ValueError(f"Unknown method {method!r}.")
+
+        if self.continuousData.shape[0] == 0:
+            return None
+
+        if method not in self._curves:
+            start = WARM_STARTS.get(method)
+            fixtop, fixbottom = CONTINUOUS_METHODS[method]
+            (self._curves[method],) = fitContinuousCurves(
+                [self.continuousData],
+                fixtop=fixtop,
+                fixbottom=fixbottom,
+                fitter=self.fitter,
+                fitCache=self.fitCache,
+                initialCurves=(
+                    [self.curve(start)] if start and self.fitter == "batch" else None
+                ),
+            )
+
+        return self._curves[method]
+
+    def titer(self, method):
+        """
+        Get the titer of a continuous method, fitting its curve on first use.
+
+        @param method: the C{str} continuous method.
+        @raise ValueError: if C{method} is unknown.
+        @return: the C{str} titer, '*' if no titrations were done or C{None}
+            if C{method} is not one of C{self.methods}.
+        """
+        if method not in CONTINUOUS_METHODS:
+            raise ValueError(f"Unknown method {method!r}.")
+
+        if method not in self.methods:
+            return None
+
+        if method not in self._titers:
+            curve = self.curve(method)
+            self._titers[method] = (
+                "*"
+                if curve is None
+                else getContinuousTiter(
+                    curve, limit=self.limit, interpolate=self.interpolate
+                )
+            )
+
+        return self._titers[method]
+
+
 def getAllTiters(
-    data, plot=False, ax=False, interpolate=False, limit=50, customTiterSteps=None
+    data,
+    plot=False,
+    ax=False,
+    interpolate=False,
+    limit=50,
+    customTiterSteps=None,
+    fitCache=None,
+    methods=None,
+    fitter="neutcurve",
 ):
     """
     Return discrete and continuous titers. If requested, plot the titer curve.
@@ -569,70 +1379,48 @@ def getAllTiters(
         the dilutions tested. IF USING THIS, MAKE SURE TO CHECK THE
         INTERPOLATED TITER AGAINST THE NEUTRALISATION CURVE TO MAKE SURE THE
         TITER STILL MAKES SENSE!!
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param methods: the C{str} continuous methods (see C{CONTINUOUS_METHODS})
+        to get titers for, or C{None} for all of them. The titers of the
+        other methods are returned as C{None}.
+    @param fitter: the C{str} name of the fitter to use, one of C{FITTERS}.
+        With 'batch', the curves with a free top or bottom are started from
+        the more constrained curves (see C{WARM_STARTS}).
+    @raise ValueError: if a method is unknown.
+    @return: an C{AllTiters}, which acts as a C{tuple} of the discrete titer
+        and the titers of the 'continuous-fixtop-fixbottom',
+        'continuous-fixtop', 'continuous-fixbottom' and 'continuous' methods.
     """
-    customTiterSteps = customTiterSteps or titerSteps
-    titerStepsNumbers = [int(step[2:]) for step in customTiterSteps]
-    finalDilution = titerStepsNumbers[-1] * 2
-
     if ax and not plot:
         raise "Plotting not specified but axes object is given."
 
-    continuousData = convertRawCountsToNeutcurveDf(
-        data, customTiterSteps=customTiterSteps
-    )
-    discreteData = convertRawCountsToDiscreteDf(data, customTiterSteps=customTiterSteps)
-    if continuousData.shape[0] == 0:
-        return ("*", "*", "*", "*", "*")
-    assert discreteData.shape[0] == 1, "Subset the dataframe given"
-
-    prnt50ContFixtopFixbottom, curveFixtopFixbottom = getPRNTContinuous(
-        continuousData,
-        fixtop=True,
-        fixbottom=True,
-        interpolate=interpolate,
-        limit=limit,
-    )
-
-    prnt50ContFixtop, curveFixTop = getPRNTContinuous(
-        continuousData,
-        fixtop=True,
-        fixbottom=False,
-        interpolate=interpolate,
-        limit=limit,
-    )
-
-    prnt50ContFixbottom, curveFixbottom = getPRNTContinuous(
-        continuousData,
-        fixtop=False,
-        fixbottom=True,
+    titers = AllTiters(
+        data,
         interpolate=interpolate,
         limit=limit,
+        customTiterSteps=customTiterSteps,
+        fitCache=fitCache,
+        methods=methods,
+        fitter=fitter,
     )
 
-    prnt50Cont, curve = getPRNTContinuous(
-        continuousData,
-        fixtop=False,
-        fixbottom=False,
-        interpolate=interpolate,
-        limit=limit,
-    )
-
-    for i, row in discreteData.iterrows():
-        d = {titerStep: row[titerStep] for titerStep in customTiterSteps}
-
-        prnt50discrete = getPRNTDiscrete(
-            d, limit=limit, steps=customTiterSteps, nd="<20"
-        )
+    customTiterSteps = titers.customTiterSteps
+    titerStepsNumbers = [int(step[2:]) for step in customTiterSteps]
+    finalDilution = titerStepsNumbers[-1] * 2
 
-    if not plot:
-        return (
+    if not plot or titers.continuousData.shape[0] == 0:
+        return titers
+    else:
+        (
             prnt50discrete,
             prnt50ContFixtopFixbottom,
             prnt50ContFixtop,
             prnt50ContFixbottom,
             prnt50Cont,
-        )
-    else:
+        ) = titers
+        continuousData = titers.continuousData
+
         if not ax:
             fig, ax = plt.subplots()
 
@@ -652,36 +1440,15 @@ def getAllTiters(
             alpha=0.5,
         )
 
-        fittedFixtopFixbottom = curveFixtopFixbottom.dataframe()
-        ax.plot(
-            fittedFixtopFixbottom["concentration"],
-            fittedFixtopFixbottom["fit"],
-            "-",
-            color="black",
-        )
-
-        fittedFixTop = curveFixTop.dataframe()
-        ax.plot(
-            fittedFixTop["concentration"],
-            fittedFixTop["fit"],
-            "-",
-            color="red",
-            linewidth=0.5,
-        )
-
-        fittedFixbottom = curveFixbottom.dataframe()
-        ax.plot(
-            fittedFixbottom["concentration"],
-            fittedFixbottom["fit"],
-            "-",
-            color="blue",
-            linewidth=0.5,
-        )
-
-        fitted = curve.dataframe()
-        ax.plot(
-            fitted["concentration"], fitted["fit"], "-", color="grey", linewidth=0.5
-        )
+        for method, style in (
+            ("continuous-fixtop-fixbottom", dict(color="black")),
+            ("continuous-fixtop", dict(color="red", linewidth=0.5)),
+            ("continuous-fixbottom", dict(color="blue", linewidth=0.5)),
+            ("continuous", dict(color="grey", linewidth=0.5)),
+        ):
+            if method in titers.methods:
+                fitted = titers.curve(method).dataframe()
+                ax.plot(fitted["concentration"], fitted["fit"], "-", **style)
 
         for y in (0.5, 0.1, 0.9):
             ax.hlines(
@@ -752,13 +1519,7 @@ def getAllTiters(
         ax.set_ylim(-0.5, 1.5)
         ax.set_xlim(1 / 5120, 1 / 20)
 
-        return (
-            prnt50discrete,
-            prnt50ContFixtopFixbottom,
-            prnt50ContFixtop,
-            prnt50ContFixbottom,
-            prnt50Cont,
-        )
+        return titers
 
 
 def plotTiterCurves(rawCounts, steps=None, ax=None, limit=50, title="", color="black"):
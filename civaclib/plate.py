@@ -0,0 +1,383 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from .registry import SERUM_REGISTRY, VIRUS_REGISTRY
+
+# Flags describing the plaque count in a well.
+COUNTED = 0
+# No titration was carried out ('nd').
+NOT_DONE = 1
+# There were too many plaques to count, i.e. more than the seeding dose
+# ('>50'). The count holds the number after the '>'.
+ABOVE_SEEDING = 2
+# The number of plaques corresponds to the seeding dose ('e').
+EQUAL_SEEDING = 3
+
+INFO_COLUMNS = [
+    "sample ID",
+    "Infektion Hamster",
+    "Antigen",
+    "Viruskontrolle",
+    "Replicate",
+]
+
+
+def categoricalColumns(df):
+    """
+    Make the serum, virus and replicate columns of a frame returned by
+    C{parseTiterExcel} categorical. Sera and viruses get the codes of
+    C{registry.SERUM_REGISTRY} and C{registry.VIRUS_REGISTRY}, so aliases of
+    viruses are replaced by their names. Columns that are already
+    categorical (e.g. in the rows of a pair taken from a C{Plate}) are left
+    as they are.
+
+    @param df: a C{pandas.DataFrame} returned by C{parseTiterExcel}.
+    @return: a C{pandas.DataFrame}, C{df} itself if no column was changed.
+    """
+    columns = {}
+    for column, registry in (
+        ("sample ID", SERUM_REGISTRY),
+        ("Antigen", VIRUS_REGISTRY),
+        ("Replicate", None),
+    ):
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            columns[column] = (
+                df[column].astype("category")
+                if registry is None
+                else registry.categorical(df[column])
+            )
+    return df.assign(**columns) if columns else df
+
+
+def encodePlaqueCounts(values):
+    """
+    Convert plaque counts as they appear in the raw data (numbers, 'nd',
+    '>50', 'e') into a float array and an array of flags.
+
+    @param values: an array-like of plaque counts, of any shape.
+    @raise ValueError: if a value cannot be interpreted as a plaque count.
+    @return: a C{tuple} of a C{numpy.ndarray} of C{float} counts and a
+        C{numpy.ndarray} of C{numpy.int8} flags, both with the shape of
+        C{values}. Counts are C{nan} for 'nd' and 'e' wells.
+    """
+    values = np.asarray(values, dtype=object)
+    text = pd.Series(values.ravel(), dtype=object).astype(str)
+
+    flags = np.full(len(text), COUNTED, dtype=np.int8)
+    flags[(text == "nd").to_numpy()] = NOT_DONE
+    flags[(text == "e").to_numpy()] = EQUAL_SEEDING
+    above = text.str.startswith(">").to_numpy()
+    flags[above] = ABOVE_SEEDING
+
+    text[above] = text[above].str[1:]
+    text[(flags == NOT_DONE) | (flags == EQUAL_SEEDING)] = "nan"
+    counts = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float)
+
+    unknown = (
+        np.isnan(counts) & ((flags == COUNTED) | above) & (text != "nan").to_numpy()
+    )
+    if unknown.any():
+        raise ValueError(
+            f"Could not interpret plaque count {values.ravel()[unknown][0]!r}."
+        )
+
+    return counts.reshape(values.shape), flags.reshape(values.shape)
+
+
+def decodePlaqueCounts(counts, flags):
+    """
+    Convert plaque counts and flags back into the values used in the raw
+    data.
+
+    @param counts: a C{numpy.ndarray} of C{float} counts.
+    @param flags: a C{numpy.ndarray} of flags with the shape of C{counts}.
+    @return: a C{numpy.ndarray} of C{object}s with the shape of C{counts}.
+    """
+    values = np.array(list(counts.ravel()), dtype=object).reshape(counts.shape)
+    values[flags == NOT_DONE] = "nd"
+    values[flags == EQUAL_SEEDING] = "e"
+    above = flags == ABOVE_SEEDING
+    values[above] = [f">{count:g}" for count in counts[above]]
+    return values
+
+
+def averageReplicates(counts, flags, vk, groups):
+    """
+    Average the plaque counts of groups of replicates. This is the array
+    version of C{parseTiters.averagePlaqueCounts}, applied to all groups at
+    once: wells that weren't titrated are ignored, '>' and 'e' wells count as
+    the Viruskontrolle. A group is 'nd' if no well was titrated and '>50' if
+    all titrated wells were '>50'.
+
+    @param counts: a C{numpy.ndarray} of C{float} counts, one row per
+        replicate.
+    @param flags: a C{numpy.ndarray} of flags with the shape of C{counts}.
+    @param vk: a C{numpy.ndarray} with the number of plaques without sera
+        (control) for each group.
+    @param groups: a C{numpy.ndarray} of C{int}s with the index of the group
+        of each row. Every group index up to the largest one must occur.
+    @return: a C{tuple} of a C{numpy.ndarray} of C{float} average counts and a
+        C{numpy.ndarray} of C{numpy.int8} flags, with one row per group.
+    """
+    vk = np.asarray(vk, dtype=float)
+    groups = np.asarray(groups)
+
+    nGroups = groups.max() + 1 if len(groups) else 0
+
+    done = flags != NOT_DONE
+    aboveOrEqual = (flags == ABOVE_SEEDING) | (flags == EQUAL_SEEDING)
+    values = np.where(aboveOrEqual, vk[groups][:, np.newaxis], counts)
+    values[~done] = 0.0
+
+    # np.add.at adds the rows of each group one after the other, in the
+    # same order as numpy.mean does in averagePlaqueCounts.
+    sums = np.zeros((nGroups, counts.shape[1]))
+    np.add.at(sums, groups, values)
+    nDone = np.zeros(sums.shape, dtype=int)
+    np.add.at(nDone, groups, done)
+    nAbove50 = np.zeros(sums.shape, dtype=int)
+    np.add.at(nAbove50, groups, (flags == ABOVE_SEEDING) & (counts == 50))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = sums / nDone
+    averageFlags = np.full(averages.shape, COUNTED, dtype=np.int8)
+
+    notDone = nDone == 0
+    averages[notDone] = np.nan
+    averageFlags[notDone] = NOT_DONE
+
+    above = ~notDone & (nAbove50 == nDone)
+    averages[above] = 50.0
+    averageFlags[above] = ABOVE_SEEDING
+
+    return averages, averageFlags
+
+
+def fractionInfectivity(counts, flags, vk):
+    """
+    Calculate the infectivity remaining after neutralisation for whole arrays
+    of plaque counts. This is the array version of
+    C{parseTiters.calculateFractionInfectivity}.
+
+    @param counts: a C{numpy.ndarray} of C{float} counts, one row per
+        replicate.
+    @param flags: a C{numpy.ndarray} of flags with the shape of C{counts}.
+    @param vk: a C{numpy.ndarray} with the number of plaques without sera
+        (control) for each row.
+    @return: a C{numpy.ndarray} of C{float}s, C{nan} where no titration was
+        done.
+    """
+    vk = np.asarray(vk, dtype=float).reshape(-1, *([1] * (counts.ndim - 1)))
+    result = counts / vk
+    # '>' and 'e' indicate that there was no neutralisation.
+    result[(flags == ABOVE_SEEDING) | (flags == EQUAL_SEEDING)] = 1.0
+    result[flags == NOT_DONE] = np.nan
+    return result
+
+
+def neutralisationPercent(counts, flags, vk):
+    """
+    Calculate the percentage of plaques that were neutralised for whole
+    arrays of plaque counts. This is the array version of
+    C{parseTiters.calculateFractionInfectivity} with
+    C{neutralisationPercent=True}.
+
+    @param counts: a C{numpy.ndarray} of C{float} counts, one row per
+        replicate.
+    @param flags: a C{numpy.ndarray} of flags with the shape of C{counts}.
+    @param vk: a C{numpy.ndarray} with the number of plaques without sera
+        (control) for each row.
+    @return: a C{numpy.ndarray} of C{float}s, C{nan} where no titration was
+        done.
+    """
+    vk = np.asarray(vk, dtype=float).reshape(-1, *([1] * (counts.ndim - 1)))
+    result = 100 - (counts / vk) * 100
+    # '>' and 'e' indicate that there was no neutralisation.
+    result[(flags == ABOVE_SEEDING) | (flags == EQUAL_SEEDING)] = 0.0
+    result[flags == NOT_DONE] = np.nan
+    return result
+
+
+class Plate:
+    """
+    The plaque counts of a plate returned by C{parseTiterExcel}, held as a
+    C{float} array of counts and a compact C{numpy.int8} array of flags
+    instead of columns of mixed Python objects. The serum, virus and
+    replicate columns are categorical (see C{categoricalColumns}), and the
+    rows of a serum/virus pair are looked up by their C{int} codes, without
+    scanning the whole plate.
+
+    @param df: a C{pandas.DataFrame} returned by C{parseTiterExcel}.
+    @param titerSteps: a C{list} of the names of the columns with plaque
+        counts. Defaults to all columns after the C{INFO_COLUMNS}.
+    """
+
+    def __init__(self, df, titerSteps=None):
+        df = categoricalColumns(df)
+        self.df = df
+        self.titerSteps = list(titerSteps or df.columns[len(INFO_COLUMNS) :])
+        self.info = df[INFO_COLUMNS[:3] + INFO_COLUMNS[4:]].reset_index(drop=True)
+        self.vk = df["Viruskontrolle"].to_numpy(dtype=float)
+        self.counts, self.flags = encodePlaqueCounts(df[self.titerSteps].to_numpy())
+
+    def __len__(self):
+        return len(self.vk)
+
+    def _groupRows(self, columns):
+        """
+        Map each combination of the values of categorical columns of C{info}
+        to the offsets of its rows, using the codes of the columns.
+
+        @param columns: a C{list} of C{str} column names.
+        @return: a C{dict} mapping C{tuple}s of values to C{numpy.ndarray}s
+            of C{int} row offsets, in the order the combinations first
+            appear. Rows with a missing value are left out.
+        """
+        keys = np.zeros(len(self), dtype=np.int64)
+        present = np.ones(len(self), dtype=bool)
+        for column in columns:
+            values = self.info[column].cat
+            codes = values.codes.to_numpy()
+            keys = keys * len(values.categories) + codes
+            present &= codes >= 0
+
+        rows = np.flatnonzero(present)
+        _, first, inverse = np.unique(
+            keys[rows], return_index=True, return_inverse=True
+        )
+        groups = np.split(
+            rows[np.argsort(inverse, kind="stable")],
+            np.cumsum(np.bincount(inverse))[:-1],
+        )
+        values = [self.info[column].to_numpy() for column in columns]
+        return {
+            tuple(value[rows[first[group]]] for value in values): groups[group]
+            for group in np.argsort(first)
+        }
+
+    @cached_property
+    def _pairRows(self):
+        """
+        Map each (serum, virus) pair to the offsets of its rows.
+        """
+        return self._groupRows(["sample ID", "Antigen"])
+
+    @cached_property
+    def _replicateRows(self):
+        """
+        Map each (serum, virus, replicate) triple to the offsets of its rows.
+        """
+        return self._groupRows(["sample ID", "Antigen", "Replicate"])
+
+    @property
+    def sera(self):
+        """
+        Get the names of the sera on the plate, in the order they appear.
+
+        @return: a C{list} of C{str} serum names.
+        """
+        return list(dict.fromkeys(serum for serum, _ in self._pairRows))
+
+    @property
+    def viruses(self):
+        """
+        Get the names of the viruses on the plate, in the order they appear.
+
+        @return: a C{list} of C{str} virus names.
+        """
+        return list(dict.fromkeys(virus for _, virus in self._pairRows))
+
+    def pairRows(self, serum, virus):
+        """
+        Get the offsets of the rows of a serum/virus pair.
+
+        @param serum: the name of the serum. Numbers (e.g. 1.1) are converted
+            to C{str}.
+        @param virus: the C{str} name or alias of the virus.
+        @return: a C{numpy.ndarray} of C{int} row offsets, empty if the pair
+            isn't on the plate.
+        """
+        return self._pairRows.get(
+            (SERUM_REGISTRY.canonical(serum), VIRUS_REGISTRY.canonical(virus)),
+            np.empty(0, dtype=int),
+        )
+
+    def pair(self, serum, virus):
+        """
+        Get all rows (replicates and average) of a serum/virus pair.
+
+        @param serum: the name of the serum. Numbers (e.g. 1.1) are converted
+            to C{str}.
+        @param virus: the C{str} name or alias of the virus.
+        @return: a C{pandas.DataFrame} with the rows of C{df} for the pair.
+        """
+        return self.df.iloc[self.pairRows(serum, virus)]
+
+    def replicateRows(self, serum, virus, replicate):
+        """
+        Get the offsets of the row(s) of one replicate of a serum/virus pair.
+
+        @param serum: the name of the serum. Numbers (e.g. 1.1) are converted
+            to C{str}.
+        @param virus: the C{str} name or alias of the virus.
+        @param replicate: the C{str} name of the replicate, e.g.
+            'PFU Ansatz 1' or 'Average'.
+        @return: a C{numpy.ndarray} of C{int} row offsets, empty if the
+            replicate isn't on the plate.
+        """
+        return self._replicateRows.get(
+            (
+                SERUM_REGISTRY.canonical(serum),
+                VIRUS_REGISTRY.canonical(virus),
+                replicate,
+            ),
+            np.empty(0, dtype=int),
+        )
+
+    def replicate(self, serum, virus, replicate):
+        """
+        Get the row(s) of one replicate of a serum/virus pair.
+
+        @param serum: the name of the serum. Numbers (e.g. 1.1) are converted
+            to C{str}.
+        @param virus: the C{str} name or alias of the virus.
+        @param replicate: the C{str} name of the replicate, e.g.
+            'PFU Ansatz 1' or 'Average'.
+        @return: a C{pandas.DataFrame} with the rows of C{df} for the
+            replicate.
+        """
+        return self.df.iloc[self.replicateRows(serum, virus, replicate)]
+
+    def fractionInfectivity(self):
+        """
+        Get the infectivity remaining after neutralisation in all wells.
+
+        @return: a C{numpy.ndarray} of C{float}s with one row per replicate,
+            C{nan} where no titration was done.
+        """
+        return fractionInfectivity(self.counts, self.flags, self.vk)
+
+    def neutralisationPercent(self):
+        """
+        Get the percentage of plaques that were neutralised in all wells.
+
+        @return: a C{numpy.ndarray} of C{float}s with one row per replicate,
+            C{nan} where no titration was done.
+        """
+        return neutralisationPercent(self.counts, self.flags, self.vk)
+
+    def toDataFrame(self):
+        """
+        Convert the plate back into the format returned by
+        C{parseTiterExcel}. Plaque counts are given as C{float}s.
+
+        @return: a C{pandas.DataFrame}.
+        """
+        df = self.info.copy()
+        df.insert(3, "Viruskontrolle", self.vk)
+        values = decodePlaqueCounts(self.counts, self.flags)
+        for i, titerStep in enumerate(self.titerSteps):
+            df[titerStep] = values[:, i]
+        return df
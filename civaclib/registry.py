@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from .common import SERA, VIRUSES
+
+
+class Registry:
+    """
+    An ordered set of names (e.g. of viruses or sera) with stable C{int}
+    codes and aliases. The code of a name is its position, so names must only
+    be added at the end, and pandas categoricals made with C{categorical}
+    have the same codes in every frame.
+
+    @param names: an iterable of the C{str} names, in the order of their
+        codes.
+    @param aliases: a C{dict} mapping other C{str} names (e.g. headers in raw
+        data files) to names, or C{None}.
+    @param kind: the C{str} kind of the names, used in error messages.
+    @raise ValueError: if a name is given more than once, an alias is also a
+        name or an alias is for an unknown name.
+    """
+
+    def __init__(self, names, aliases=None, kind="name"):
+        self.names = tuple(names)
+        self.aliases = dict(aliases or {})
+        self.kind = kind
+        self._codes = {name: code for code, name in enumerate(self.names)}
+
+        if len(self._codes) != len(self.names):
+            raise ValueError(f"A {kind} is given more than once.")
+        for alias, name in self.aliases.items():
+            if alias in self._codes:
+                raise ValueError(f"The alias {alias!r} is also a {kind}.")
+            if name not in self._codes:
+                raise ValueError(f"The alias {alias!r} is for an unknown {kind}.")
+
+        self.dtype = pd.CategoricalDtype(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return self.canonical(name) in self._codes
+
+    def canonical(self, name):
+        """
+        Get the name for a name or alias.
+
+        @param name: a name or alias. Numbers (e.g. 1.1) are converted to
+            C{str}.
+        @return: the C{str} name. Unknown names are returned as C{str}.
+        """
+        name = str(name)
+        return self.aliases.get(name, name)
+
+    def code(self, name):
+        """
+        Get the code of a name.
+
+        @param name: a name or alias. Numbers (e.g. 1.1) are converted to
+            C{str}.
+        @raise KeyError: if the name is unknown.
+        @return: the C{int} code.
+        """
+        try:
+            return self._codes[self.canonical(name)]
+        except KeyError:
+            raise KeyError(f"Unknown {self.kind} {name!r}.") from None
+
+    def categorical(self, values):
+        """
+        Convert names to a categorical with the codes of the registry. Names
+        that are not in the registry are given codes after those of the
+        registry, in the order they first appear, so they only have the
+        same code in frames made from the same names.
+
+        @param values: an iterable of names or aliases. Numbers (e.g. 1.1)
+            are converted to C{str}.
+        @return: a C{pandas.Categorical}. Missing values stay missing.
+        """
+        names = pd.Series(list(values), dtype=object).map(
+            self.canonical, na_action="ignore"
+        )
+        unknown = [name for name in names.dropna().unique() if name not in self._codes]
+        return pd.Categorical(names, categories=self.names + tuple(unknown))
+
+    def codes(self, values):
+        """
+        Get the codes of names (see C{categorical}).
+
+        @param values: an iterable of names or aliases.
+        @return: a C{numpy.ndarray} of C{int} codes.
+        """
+        return np.asarray(self.categorical(values).codes)
+
+
+# The viruses. The headers of the raw data files use Greek letters for some
+# of them. BA.2.86 was titrated after the 240123 data (see common.VIRUSES).
+VIRUS_REGISTRY = Registry(
+    VIRUSES + ("BA.2.86 (V139)",),
+    aliases={
+        "SARS-CoV-2_α (21528)": "SARS-CoV-2_Alpha (21528)",
+        "SARS-CoV-2_β (22131)": "SARS-CoV-2_Beta (22131)",
+        "SARS-CoV-2_δ (25853_23)": "SARS-CoV-2_Delta (25853_23)",
+    },
+    kind="virus",
+)
+
+# The sera.
+SERUM_REGISTRY = Registry(SERA, kind="serum")
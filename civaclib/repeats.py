@@ -0,0 +1,148 @@
+import pandas as pd
+
+from .parseTiters import CONTINUOUS_METHODS, getPRNTContinuousLimits
+from .titerTable import METHODS, getDiscreteTiters, getNeutcurveData
+from .titers import getLogTiters
+
+# The names of the two repeats of each titration in the raw data.
+REPLICATES = ("PFU Ansatz 1", "PFU Ansatz 2")
+
+
+def getReplicateTiters(
+    plate,
+    pairs,
+    tables,
+    replicates=REPLICATES,
+    interpolate=False,
+    nd="<20",
+    jobs=1,
+    fitter="neutcurve",
+    fitCache=None,
+):
+    """
+    Get the titers of each replicate of serum/virus pairs, for any number of
+    methods and limits. The curves of all replicates of all pairs are fitted
+    together, once per continuous method (in C{jobs} processes), and the
+    titers at all limits are read from them.
+
+    @param plate: a C{plate.Plate}.
+    @param pairs: a C{list} of pairs returned by C{titerTable.getPairs}.
+    @param tables: a C{list} of (method, limit) C{tuple}s. The method is one
+        of C{titerTable.METHODS} and the limit an C{int}.
+    @param replicates: the C{str} names of the replicates.
+    @param interpolate: If C{True} interpolate continuous titers that are out
+        of bounds of the dilutions tested.
+    @param nd: the lowest discrete titer level.
+    @param jobs: the C{int} number of processes to fit curves in.
+    @param fitter: the C{str} name of the fitter to use, one of
+        C{parseTiters.FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @raise ValueError: if a method is unknown.
+    @return: a C{dict} mapping each (method, limit) C{tuple} to a C{dict}
+        mapping each replicate to a C{list} of C{str} titers, one per pair.
+        Pairs without the replicate have '*' titers.
+    """
+    titers = {}
+    continuousLimits = {}
+    for method, limit in tables:
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}.")
+        if method == "discrete":
+            titers[method, limit] = {
+                replicate: getDiscreteTiters(
+                    plate, pairs, limit, nd=nd, replicate=replicate
+                )
+                for replicate in replicates
+            }
+        else:
+            continuousLimits.setdefault(method, [])
+            if limit not in continuousLimits[method]:
+                continuousLimits[method].append(limit)
+
+    if continuousLimits:
+        data = [
+            dataset
+            for replicate in replicates
+            for dataset in getNeutcurveData(plate, pairs, replicate=replicate)
+        ]
+        for method, limits in continuousLimits.items():
+            fixtop, fixbottom = CONTINUOUS_METHODS[method]
+            for limit, prnts in getPRNTContinuousLimits(
+                data,
+                limits,
+                fixtop=fixtop,
+                fixbottom=fixbottom,
+                interpolate=interpolate,
+                jobs=jobs,
+                fitter=fitter,
+                fitCache=fitCache,
+            ).items():
+                titers[method, limit] = {
+                    replicate: prnts[i * len(pairs) : (i + 1) * len(pairs)]
+                    for i, replicate in enumerate(replicates)
+                }
+
+    return titers
+
+
+def repeatVariation(
+    plate,
+    pairs,
+    tables,
+    replicates=REPLICATES,
+    fixedTiters=None,
+    dilutionStepSize=1,
+    **kwargs,
+):
+    """
+    Get the differences between the log2 titers of two replicates of
+    serum/virus pairs.
+
+    @param plate: a C{plate.Plate}.
+    @param pairs: a C{list} of pairs returned by C{titerTable.getPairs}.
+    @param tables: a C{list} of (method, limit) C{tuple}s (see
+        C{getReplicateTiters}).
+    @param replicates: the C{str} names of the two replicates to compare.
+    @param fixedTiters: a C{dict} mapping (method, limit) C{tuple}s to
+        C{dict}s returned by C{titerTable.fixedTiterLookup}, or C{None}. The
+        fixed titer of a pair is used for both replicates.
+    @param dilutionStepSize: the C{float} number of log2 steps to add to
+        titers above and subtract from titers below the dilutions tested
+        (see C{titers.getLogTiter}).
+    @param kwargs: passed to C{getReplicateTiters}.
+    @raise ValueError: if there are not two replicates or a method is
+        unknown.
+    @return: a C{pandas.DataFrame} with one row per pair and 'serum' and
+        'virus' columns and a column named '<method>-<limit>' for each table,
+        with the log2 titer of the first replicate minus that of the second
+        (C{nan} if a titer is '*').
+    """
+    if len(replicates) != 2:
+        raise ValueError(f"Two replicates must be given, not {len(replicates)}.")
+
+    fixedTiters = fixedTiters or {}
+    titers = getReplicateTiters(plate, pairs, tables, replicates=replicates, **kwargs)
+
+    columns = {
+        "serum": [serum for serum, _, _ in pairs],
+        "virus": [virus for _, virus, _ in pairs],
+    }
+    for method, limit in tables:
+        fixed = fixedTiters.get((method, limit), {})
+        logTiters = []
+        for replicate in replicates:
+            logTiters.append(
+                getLogTiters(
+                    [
+                        fixed.get((str(serum), virus), titer)
+                        for (serum, virus, _), titer in zip(
+                            pairs, titers[method, limit][replicate]
+                        )
+                    ],
+                    dilutionStepSize=dilutionStepSize,
+                )
+            )
+        columns[f"{method}-{limit}"] = logTiters[0] - logTiters[1]
+
+    return pd.DataFrame(columns)
@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor
+from os.path import splitext
+
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from .parseTiters import getAllTiters
+
+# The size in inches of the panel of one serum/virus pair, as in the single
+# 80x120 inch figure of 29 sera and 17 viruses the curves were first drawn in.
+PANEL_SIZE = (80 / 17, 120 / 29)
+
+
+def drawTiterCurves(axes, plate, sera, viruses, **kwargs):
+    """
+    Draw the titer curves of serum/virus pairs into a grid of axes, with
+    C{parseTiters.getAllTiters}.
+
+    @param axes: a 2-dimensional array of C{matplotlib.axes.Axes}, with one
+        row per serum and one column per virus.
+    @param plate: a C{plate.Plate}.
+    @param sera: a C{list} of serum names.
+    @param viruses: a C{list} of C{str} virus names.
+    @param kwargs: passed to C{getAllTiters}, e.g. 'interpolate', 'limit' and
+        'fitCache'.
+    """
+    for rowAxes, serum in zip(axes, sera):
+        for ax, virus in zip(rowAxes, viruses):
+            getAllTiters(plate.pair(serum, virus), plot=True, ax=ax, **kwargs)
+
+
+def titerCurvePage(plate, sera, viruses, **kwargs):
+    """
+    Make a figure with the titer curves of serum/virus pairs. The figure is
+    not managed by C{matplotlib.pyplot}, so it is freed when it is not used
+    anymore and it doesn't depend on the backend of C{pyplot}.
+
+    @param plate: a C{plate.Plate}.
+    @param sera: a C{list} of serum names, one per row.
+    @param viruses: a C{list} of C{str} virus names, one per column.
+    @param kwargs: passed to C{getAllTiters} (see C{drawTiterCurves}).
+    @return: a C{matplotlib.figure.Figure}.
+    """
+    fig = Figure(figsize=(PANEL_SIZE[0] * len(viruses), PANEL_SIZE[1] * len(sera)))
+    axes = fig.subplots(nrows=len(sera), ncols=len(viruses), squeeze=False)
+    drawTiterCurves(axes, plate, sera, viruses, **kwargs)
+    fig.tight_layout()
+    return fig
+
+
+def pageFileName(fileName, sera, pages):
+    """
+    Get the name of the file of one page of titer curves.
+
+    @param fileName: the C{str} name of the file of all pages, e.g.
+        'titercurves.png'.
+    @param sera: the C{list} of serum names on the page.
+    @param pages: the C{int} number of pages.
+    @return: the C{str} file name, C{fileName} itself if there is one page,
+        else with the serum (one serum per page) or the first and last sera
+        of the page added before the extension, e.g. 'titercurves-1.1.png'.
+    """
+    if pages == 1:
+        return fileName
+    base, extension = splitext(fileName)
+    suffix = sera[0] if len(sera) == 1 else f"{sera[0]}-{sera[-1]}"
+    return f"{base}-{suffix}{extension}"
+
+
+def _renderPage(plate, sera, viruses, fileName, returnFigure, kwargs):
+    """
+    Draw and save one page of titer curves. This is the unit of work run in
+    each process by C{renderTiterCurves}.
+
+    @param fileName: the C{str} name of the file to save the page to, or
+        C{None}.
+    @param returnFigure: if C{True} return the figure.
+    @return: the C{matplotlib.figure.Figure} of the page, or C{None}.
+    """
+    fig = titerCurvePage(plate, sera, viruses, **kwargs)
+    if fileName:
+        fig.savefig(fileName)
+    return fig if returnFigure else None
+
+
+def renderTiterCurves(
+    plate,
+    sera,
+    viruses,
+    fileName=None,
+    rowsPerPage=None,
+    only=None,
+    pdf=None,
+    jobs=1,
+    **kwargs,
+):
+    """
+    Draw the titer curves of serum/virus pairs on pages of a few sera each,
+    one page per process, and save them as images and/or as the pages of a
+    PDF file.
+
+    @param plate: a C{plate.Plate}.
+    @param sera: a C{list} of serum names, in the order of the rows.
+    @param viruses: a C{list} of C{str} virus names, in the order of the
+        columns.
+    @param fileName: the C{str} name of the image file to save the curves
+        to (see C{pageFileName} for the names of the pages), or C{None}.
+    @param rowsPerPage: the C{int} number of sera on each page, or C{None}
+        to put all sera on one page.
+    @param only: a C{list} of serum names, or C{None}. If given, only the
+        image files of the pages with these sera are made again.
+    @param pdf: the C{str} name of a PDF file to save all pages to, or
+        C{None}.
+    @param jobs: the C{int} number of processes to draw pages in.
+    @param kwargs: passed to C{getAllTiters} (see C{drawTiterCurves}).
+    @raise ValueError: if C{only} is used together with C{pdf}.
+    @return: a C{list} of the C{str} names of the image files saved.
+    """
+    if only is not None and pdf:
+        raise ValueError("All pages must be drawn to make a PDF file.")
+
+    sera = list(sera)
+    rowsPerPage = rowsPerPage or len(sera)
+    pages = [sera[i : i + rowsPerPage] for i in range(0, len(sera), rowsPerPage)]
+    nPages = len(pages)
+    if only is not None:
+        only = {str(serum) for serum in only}
+        pages = [
+            pageSera for pageSera in pages if only & {str(serum) for serum in pageSera}
+        ]
+    fileNames = [
+        pageFileName(fileName, pageSera, nPages) if fileName else None
+        for pageSera in pages
+    ]
+    args = [
+        (plate, pageSera, viruses, pageName, bool(pdf), kwargs)
+        for pageSera, pageName in zip(pages, fileNames)
+    ]
+
+    if jobs == 1 or len(pages) < 2:
+        figures = [_renderPage(*pageArgs) for pageArgs in args]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_renderPage, *pageArgs) for pageArgs in args]
+            figures = [future.result() for future in futures]
+
+    if pdf:
+        with PdfPages(pdf) as pdfPages:
+            for fig in figures:
+                pdfPages.savefig(fig)
+
+    return [name for name in fileNames if name]
@@ -0,0 +1,994 @@
+import csv
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .bootstrap import bootstrapTiters
+from .cache import (
+    blockHashes,
+    longTitersKey,
+    readLongTitersKey,
+    readTableState,
+    tableKey,
+    writeLongTitersKey,
+    writeTableState,
+)
+from .common import titerSteps
+from .parseTiters import (
+    CONTINUOUS_METHODS,
+    convertRawCountsToNeutcurveDf,
+    getPRNTContinuousLimits,
+    getPRNTDiscreteBatch,
+)
+from .plate import NOT_DONE
+
+METHODS = ("discrete",) + tuple(CONTINUOUS_METHODS)
+
+# The alternative titer steps of particular serum/virus pairs.
+TITER_STEP_ADAPTATIONS_FILE = Path(__file__).parent / "titer-step-adaptations.csv"
+
+# The columns of long-format titer files (see streamTiterTables).
+LONG_COLUMNS = ["serum", "virus", "method", "limit", "titer", "flags"]
+
+
+def loadTiterStepAdaptations(fileName=TITER_STEP_ADAPTATIONS_FILE):
+    """
+    Read the alternative titer steps used for particular serum/virus pairs.
+    The file is a CSV file with 'adaptation', 'serum', 'virus' and 'steps'
+    columns, with one row per pair whose titer steps differ from
+    C{common.titerSteps}. The name of an adaptation identifies a set of
+    titrations, so a new batch of irregular dilutions gets a new name
+    instead of changing an existing one. The steps are separated by spaces.
+
+    The file is only read once, and pairs with the same steps share one
+    C{list}, which must not be changed.
+
+    @param fileName: the C{str} or C{Path} name of the file.
+    @raise ValueError: if a pair is given more than once for an adaptation or
+        its steps don't match the plaque count columns.
+    @return: a C{dict} mapping the C{str} name of each adaptation to a
+        C{dict} mapping (serum, virus) C{tuple}s to C{list}s of C{str} titer
+        steps.
+    """
+    return _loadTiterStepAdaptations(str(fileName))
+
+
+@lru_cache(maxsize=None)
+def _loadTiterStepAdaptations(fileName):
+    """
+    Read the alternative titer steps (see C{loadTiterStepAdaptations}).
+    """
+    adaptations = {}
+    shared = {}
+    with open(fileName, newline="") as fp:
+        # Line 1 is the header.
+        for lineNumber, row in enumerate(csv.DictReader(fp), start=2):
+            steps = tuple(row["steps"].split())
+            if len(steps) != len(titerSteps) or not all(
+                step.startswith("1:") and step[2:].isdigit() for step in steps
+            ):
+                raise ValueError(
+                    f"{fileName!r} line {lineNumber}: expected "
+                    f"{len(titerSteps)} titer steps like '1:20', got "
+                    f"{row['steps']!r}."
+                )
+            pairs = adaptations.setdefault(row["adaptation"], {})
+            pair = (row["serum"], row["virus"])
+            if pair in pairs:
+                raise ValueError(
+                    f"{fileName!r} line {lineNumber}: serum {pair[0]!r} and "
+                    f"virus {pair[1]!r} are given more than once for "
+                    f"{row['adaptation']!r}."
+                )
+            pairs[pair] = shared.setdefault(steps, list(steps))
+    return adaptations
+
+
+_titerStepAdaptations = loadTiterStepAdaptations()
+
+# The names of the sets of alternative titer steps (see getTiterSteps).
+TITER_STEP_ADAPTATIONS = tuple(_titerStepAdaptations)
+
+
+def getTiterSteps(serum, virus, adaptTiterSteps=False):
+    """
+    Get the titer steps that were used for a serum/virus pair.
+
+    @param serum: the name of the serum. Numbers (e.g. 1.1) are converted
+        to C{str}.
+    @param virus: the C{str} name of the virus.
+    @param adaptTiterSteps: the C{str} name of a set of alternative titer
+        steps for particular serum/virus pairs (see
+        C{loadTiterStepAdaptations}), or C{False} to use
+        C{common.titerSteps} for all pairs.
+    @raise ValueError: if C{adaptTiterSteps} is unknown.
+    @return: a C{list} of C{str} titer steps. It is shared with other pairs
+        and must not be changed.
+    """
+    if adaptTiterSteps:
+        pairs = _titerStepAdaptations.get(adaptTiterSteps)
+        if pairs is None:
+            raise ValueError(f"Unknown titer step adaptation {adaptTiterSteps!r}.")
+        return pairs.get((str(serum), virus), titerSteps)
+
+    return titerSteps
+
+
+def getPairs(plate, viruses, adaptTiterSteps=False):
+    """
+    Get all serum/virus pairs of a plate, with their titer steps.
+
+    @param plate: a C{plate.Plate}.
+    @param viruses: a C{list} of C{str} virus names.
+    @param adaptTiterSteps: the C{str} name of a set of alternative titer
+        steps (see C{getTiterSteps}) or C{False}.
+    @return: a C{list} of (serum, virus, titer steps) C{tuple}s, ordered by
+        virus and then by serum.
+    """
+    return [
+        (serum, virus, getTiterSteps(serum, virus, adaptTiterSteps))
+        for virus in viruses
+        for serum in plate.sera
+    ]
+
+
+def getDiscreteTiters(plate, pairs, limit, nd="<20", replicate="Average"):
+    """
+    Get the discrete titers of serum/virus pairs from their average plaque
+    counts.
+
+    @param plate: a C{plate.Plate}.
+    @param pairs: a C{list} of pairs returned by C{getPairs}.
+    @param limit: the C{int} level of sensitivity.
+    @param nd: the lowest titer level.
+    @param replicate: the C{str} name of the replicate to get the titers of,
+        e.g. 'PFU Ansatz 1' instead of the average of the replicates.
+    @return: a C{list} of C{str} titers, one per pair, '*' for pairs without
+        the replicate.
+    """
+    found = []
+    rows = []
+    for i, (serum, virus, _) in enumerate(pairs):
+        pairRows = plate.replicateRows(serum, virus, replicate)
+        if len(pairRows):
+            found.append(i)
+            rows.append(pairRows[0])
+
+    titers = ["*"] * len(pairs)
+    if found:
+        for i, prnt in zip(
+            found,
+            getPRNTDiscreteBatch(
+                plate.neutralisationPercent()[rows],
+                plate.flags[rows] == NOT_DONE,
+                limit=limit,
+                steps=[pairs[i][2] for i in found],
+                nd=nd,
+            ),
+        ):
+            titers[i] = prnt
+    return titers
+
+
+def getNeutcurveData(plate, pairs, replicate=None):
+    """
+    Get the data to fit the neutralisation curves of serum/virus pairs.
+
+    @param plate: a C{plate.Plate}.
+    @param pairs: a C{list} of pairs returned by C{getPairs}.
+    @param replicate: the C{str} name of the replicate to fit the curves to,
+        e.g. 'PFU Ansatz 1', or C{None} to fit them to all replicates.
+    @return: a C{list} of C{pandas.DataFrame}s returned by
+        C{convertRawCountsToNeutcurveDf}, one per pair.
+    """
+    datasets = []
+    for serum, virus, ts in pairs:
+        if replicate is None:
+            rawSubset = plate.pair(serum, virus)
+        else:
+            rawSubset = plate.replicate(serum, virus, replicate)
+
+        rawSubset.columns = [
+            "sample ID",
+            "Infektion Hamster",
+            "Antigen",
+            "Viruskontrolle",
+            "Replicate",
+        ] + ts
+
+        datasets.append(convertRawCountsToNeutcurveDf(rawSubset, customTiterSteps=ts))
+
+    return datasets
+
+
+def _serumNames(sera):
+    """
+    Get the names of sera as they are in titer tables.
+
+    @param sera: a C{pandas.Series} of serum names. Numbers (e.g. 1.1, as
+        read by C{pandas.read_csv}) are converted to C{str}.
+    @return: a C{pandas.Series} of C{str} serum names.
+    """
+    return sera.map(str)
+
+
+def _titerText(titers):
+    """
+    Get titers in a form in which they can be compared. Numbers (whether
+    given as numbers or as C{str}) are formatted with two decimals, so 80,
+    '80' and '80.00' are the same, and other titers (e.g. '<160') are
+    compared as they are.
+
+    @param titers: a C{pandas.Series} of titers.
+    @return: a C{pandas.Series} of C{str} titers.
+    """
+    text = titers.astype(str)
+    numbers = pd.to_numeric(titers, errors="coerce")
+    isNumber = numbers.notna().to_numpy()
+    formatted = text.to_numpy(dtype=object)
+    formatted[isNumber] = np.char.mod("%.2f", numbers.to_numpy()[isNumber])
+    return pd.Series(formatted, index=titers.index, dtype=object)
+
+
+def readFixedTiters(fileName):
+    """
+    Read a fixed titer file.
+
+    @param fileName: the C{str} name of a CSV file with 'serum', 'virus',
+        'prnt' and 'prntOrig' columns.
+    @return: a C{pandas.DataFrame} with the rows of the file. The sera are
+        C{str} (see C{_serumNames}) and the titers as read by
+        C{pandas.read_csv}.
+    """
+    fixedTiters = pd.read_csv(fileName)
+    return fixedTiters.assign(serum=_serumNames(fixedTiters["serum"]))
+
+
+def fixedTiterLookup(fixedTiters):
+    """
+    Get the fixed titers of serum/virus pairs, to use them instead of
+    calculated titers without checking the original titers.
+
+    @param fixedTiters: a C{str} fixed titer file name or a
+        C{pandas.DataFrame} returned by C{readFixedTiters}.
+    @return: a C{dict} mapping (serum, virus) C{tuple}s of C{str}s to fixed
+        titers. Look sera up with C{str}, e.g. C{str(1.1)}.
+    """
+    if isinstance(fixedTiters, (str, os.PathLike)):
+        fixedTiters = readFixedTiters(fixedTiters)
+    return dict(
+        zip(
+            zip(_serumNames(fixedTiters["serum"]), fixedTiters["virus"]),
+            fixedTiters["prnt"].to_numpy(dtype=object),
+        )
+    )
+
+
+def _matchFixedTiters(titersLong, fixedTiters):
+    """
+    Join fixed titers to the calculated titers of the same pairs.
+
+    @param titersLong: a C{pandas.DataFrame} with 'serum', 'virus' and 'prnt'
+        columns.
+    @param fixedTiters: a C{pandas.DataFrame} with 'serum', 'virus', 'prnt'
+        and 'prntOrig' columns.
+    @return: a C{tuple} with a C{pandas.DataFrame} with the rows of
+        C{fixedTiters}, their calculated titer ('calculated') and the
+        position of their pair in C{titersLong} ('row', C{NaN} if the pair
+        is not there), and a C{pandas.Series} with the C{str} reason each
+        fixed titer can't be applied ('' if it can).
+    """
+    calculated = pd.DataFrame(
+        {
+            "serum": titersLong["serum"].to_numpy(),
+            "virus": titersLong["virus"].to_numpy(),
+            "calculated": titersLong["prnt"].to_numpy(),
+            "row": np.arange(len(titersLong)),
+        }
+    )
+    merged = fixedTiters.assign(serum=_serumNames(fixedTiters["serum"])).merge(
+        calculated, how="left", on=["serum", "virus"], validate="many_to_one"
+    )
+
+    missing = merged["row"].isna()
+    duplicated = merged.duplicated(["serum", "virus"], keep=False)
+    differ = ~missing & (
+        _titerText(merged["calculated"]) != _titerText(merged["prntOrig"])
+    )
+
+    reasons = pd.Series("", index=merged.index, dtype=object)
+    reasons[differ] = [
+        f"the original titers differ ({calculated} vs {original})"
+        for calculated, original in zip(
+            merged.loc[differ, "calculated"], merged.loc[differ, "prntOrig"]
+        )
+    ]
+    reasons[duplicated] = "the pair is given more than once"
+    reasons[missing] = "the pair is not in the table"
+
+    return merged, reasons
+
+
+def fixedTiterConflicts(titersLong, fixedTiters):
+    """
+    Find the fixed titers that can't be applied to a table of titers.
+
+    @param titersLong: a C{pandas.DataFrame} with 'serum', 'virus' and 'prnt'
+        columns.
+    @param fixedTiters: a C{pandas.DataFrame} with 'serum', 'virus', 'prnt'
+        and 'prntOrig' columns.
+    @return: a C{pandas.DataFrame} with one row per conflict and 'serum',
+        'virus', 'prnt' (the fixed titer), 'prntOrig', 'calculated' and
+        'reason' columns. It is empty if all fixed titers can be applied.
+    """
+    merged, reasons = _matchFixedTiters(titersLong, fixedTiters)
+    conflicts = merged[reasons != ""].assign(reason=reasons[reasons != ""])
+    return conflicts[
+        ["serum", "virus", "prnt", "prntOrig", "calculated", "reason"]
+    ].reset_index(drop=True)
+
+
+def applyFixedTiters(titersLong, fixedTiters):
+    """
+    Replace titers by the titers given in a fixed titer file. The fixed
+    titers are joined to the calculated titers on their serum and virus, and
+    the original titer of each pair in the file must be the one that was
+    calculated (see C{_titerText} for how they are compared). If any fixed
+    titer can't be applied, nothing is replaced.
+
+    @param titersLong: a C{pandas.DataFrame} with 'serum', 'virus' and 'prnt'
+        columns. It is modified in place.
+    @param fixedTiters: a C{pandas.DataFrame} with 'serum', 'virus', 'prnt'
+        and 'prntOrig' columns.
+    @raise ValueError: if an original titer in C{fixedTiters} differs from the
+        calculated titer, or a pair is not in C{titersLong} or is given more
+        than once. The message lists all conflicts (see
+        C{fixedTiterConflicts}).
+    @return: C{titersLong}.
+    """
+    merged, reasons = _matchFixedTiters(titersLong, fixedTiters)
+
+    if (reasons != "").any():
+        raise ValueError(
+            "\n".join(
+                f"For {serum} vs {virus}, {reason}."
+                for serum, virus, reason in zip(
+                    merged["serum"], merged["virus"], reasons
+                )
+                if reason
+            )
+        )
+
+    titersLong.iloc[
+        merged["row"].to_numpy(dtype=int), titersLong.columns.get_loc("prnt")
+    ] = merged["prnt"].to_numpy(dtype=object)
+
+    return titersLong
+
+
+def getTiters(
+    plate,
+    pairs,
+    tables,
+    interpolate=False,
+    nd="<20",
+    jobs=1,
+    fitter="neutcurve",
+    fitCache=None,
+    fitStats=None,
+    reuse=None,
+    flags=None,
+):
+    """
+    Get the titers of serum/virus pairs for any number of methods and limits.
+    The curve of each pair is fitted only once per continuous method, and
+    the titers at all limits are read from it.
+
+    @param plate: a C{plate.Plate}.
+    @param pairs: a C{list} of pairs returned by C{getPairs}.
+    @param tables: a C{list} of (method, limit) C{tuple}s. The method is one
+        of C{METHODS} and the limit an C{int}.
+    @param interpolate: If C{True} interpolate continuous titers that are out
+        of bounds of the dilutions tested.
+    @param nd: the lowest discrete titer level.
+    @param jobs: the C{int} number of processes to fit curves in.
+    @param fitter: the C{str} name of the fitter to use, one of
+        C{parseTiters.FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param fitStats: a C{list} to append a C{dict} describing each
+        continuous fit to (see C{parseTiters.getPRNTContinuousLimits}), with
+        the 'serum', 'virus' and 'method' of the fit, or C{None}.
+    @param reuse: a C{dict} mapping (method, limit) C{tuple}s to C{dict}s
+        mapping (serum, virus) C{tuple}s to previously calculated titers, or
+        C{None}. The titers of these pairs are not calculated again.
+    @param flags: a C{dict} to store flags saying how each titer was found
+        in, or C{None}. It maps each (method, limit) C{tuple} to a C{list}
+        with one C{str} per pair (C{None} for reused titers): 'no data',
+        'in range' or 'bound', or for continuous titers how they were read
+        out (see C{parseTiters.getContinuousTiters}), followed by
+        ';not converged' if the batch fit of the curve didn't converge.
+    @raise ValueError: if a method is unknown.
+    @return: a C{dict} mapping each (method, limit) C{tuple} to a C{list} of
+        C{str} titers, one per pair.
+    """
+    reuse = reuse or {}
+
+    titers = {}
+    # The offsets of the pairs whose titers must be calculated.
+    missing = {}
+    continuousLimits = {}
+    for method, limit in tables:
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}.")
+        if (method, limit) in titers:
+            continue
+        previous = reuse.get((method, limit), {})
+        titers[method, limit] = [
+            previous.get((serum, virus)) for serum, virus, _ in pairs
+        ]
+        missing[method, limit] = [
+            i
+            for i, (serum, virus, _) in enumerate(pairs)
+            if (serum, virus) not in previous
+        ]
+        if method == "discrete":
+            indices = missing[method, limit]
+            if indices:
+                for i, prnt in zip(
+                    indices,
+                    getDiscreteTiters(plate, [pairs[i] for i in indices], limit, nd=nd),
+                ):
+                    titers[method, limit][i] = prnt
+            if flags is not None:
+                calculated = set(indices)
+                flags[method, limit] = [
+                    _discreteFlag(prnt) if i in calculated else None
+                    for i, prnt in enumerate(titers[method, limit])
+                ]
+        else:
+            continuousLimits.setdefault(method, []).append(limit)
+
+    # The offsets of the pairs to fit the curves of, for each method.
+    fitted = {
+        method: sorted(set().union(*(missing[method, limit] for limit in limits)))
+        for method, limits in continuousLimits.items()
+    }
+    toFit = sorted(set().union(*fitted.values()))
+    if toFit:
+        data = dict(zip(toFit, getNeutcurveData(plate, [pairs[i] for i in toFit])))
+        # Fit the more constrained methods first, so the batch fitter can
+        # start the others from their (cached) curves.
+        for method in CONTINUOUS_METHODS:
+            indices = fitted.get(method)
+            if not indices:
+                continue
+            fixtop, fixbottom = CONTINUOUS_METHODS[method]
+            methodStats = None if fitStats is None and flags is None else []
+            for limit, prnts in getPRNTContinuousLimits(
+                [data[i] for i in indices],
+                continuousLimits[method],
+                fixtop=fixtop,
+                fixbottom=fixbottom,
+                interpolate=interpolate,
+                jobs=jobs,
+                fitter=fitter,
+                fitCache=fitCache,
+                fitStats=methodStats,
+            ).items():
+                for i, prnt in zip(indices, prnts):
+                    titers[method, limit][i] = prnt
+            if flags is not None:
+                for limit in continuousLimits[method]:
+                    limitFlags = flags.setdefault((method, limit), [None] * len(pairs))
+                    for i, stats in zip(indices, methodStats):
+                        limitFlags[i] = _continuousFlag(stats, limit)
+            if fitStats is not None:
+                for i, stats in zip(indices, methodStats):
+                    if stats:
+                        serum, virus, _ = pairs[i]
+                        fitStats.append(
+                            dict(serum=serum, virus=virus, method=method, **stats)
+                        )
+
+    return titers
+
+
+def _discreteFlag(titer):
+    """
+    Get the flag of a discrete titer (see C{getTiters}).
+
+    @param titer: a C{str} discrete titer.
+    @return: a C{str} flag.
+    """
+    if titer == "*":
+        return "no data"
+    elif titer[0] in "<>":
+        return "bound"
+    else:
+        return "in range"
+
+
+def _continuousFlag(stats, limit):
+    """
+    Get the flag of a continuous titer (see C{getTiters}).
+
+    @param stats: the C{dict} describing the fit of the curve (see
+        C{parseTiters.getPRNTContinuousLimits}).
+    @param limit: the C{int} limit the titer was read out at.
+    @return: a C{str} flag.
+    """
+    if not stats:
+        return "no data"
+    elif stats["converged"]:
+        return stats[f"readout{limit}"]
+    else:
+        return f"{stats[f'readout{limit}']};not converged"
+
+
+def makeWideTable(titersLong, fixedTiterFile=None):
+    """
+    Make a wide titer table from the titers of serum/virus pairs.
+
+    @param titersLong: a C{pandas.DataFrame} with 'serum', 'virus' and 'prnt'
+        columns.
+    @param fixedTiterFile: the C{str} name of a CSV file of titers to replace
+        (see C{applyFixedTiters}), or C{None}.
+    @raise ValueError: if a fixed titer doesn't match its original titer.
+    @return: a wide C{pandas.DataFrame} (viruses as rows, sera as columns).
+    """
+    # Replace the previously specified fixed titers
+    if fixedTiterFile:
+        applyFixedTiters(titersLong, readFixedTiters(fixedTiterFile))
+
+    # Convert from long to wide format
+    return pd.pivot(titersLong, index="virus", columns="serum", values="prnt")
+
+
+def makeTiterTables(
+    plate,
+    viruses,
+    tables,
+    adaptTiterSteps=False,
+    interpolate=False,
+    nd="<20",
+    jobs=1,
+    fitter="neutcurve",
+    fitCache=None,
+    fitStats=None,
+    reuse=None,
+    rawTiters=None,
+):
+    """
+    Make titer tables for any number of methods and limits. The curve of each
+    serum/virus pair is fitted only once per continuous method, and the
+    titers at all limits are read from it.
+
+    @param plate: a C{plate.Plate}.
+    @param viruses: a C{list} of C{str} virus names.
+    @param tables: a C{list} of (method, limit, fixedTiterFile) C{tuple}s, one
+        per table to make. The method is one of C{METHODS}, the limit an
+        C{int} and the fixed titer file the C{str} name of a CSV file of
+        titers to replace (or C{None}).
+    @param adaptTiterSteps: the C{str} name of a set of alternative titer
+        steps (see C{getTiterSteps}) or C{False}.
+    @param interpolate: If C{True} interpolate continuous titers that are out
+        of bounds of the dilutions tested.
+    @param nd: the lowest discrete titer level.
+    @param jobs: the C{int} number of processes to fit curves in.
+    @param fitter: the C{str} name of the fitter to use, one of
+        C{parseTiters.FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param fitStats: a C{list} to append a C{dict} describing each
+        continuous fit to (see C{parseTiters.getPRNTContinuousLimits}), with
+        the 'serum', 'virus' and 'method' of the fit, or C{None}.
+    @param reuse: a C{dict} mapping (method, limit) C{tuple}s to C{dict}s
+        mapping (serum, virus) C{tuple}s to previously calculated titers
+        (before fixed titers were applied), or C{None}. The titers of these
+        pairs are not calculated again.
+    @param rawTiters: a C{dict} to store the titers of each (method, limit)
+        C{tuple} in, before fixed titers are applied, as a C{dict} mapping
+        (serum, virus) C{tuple}s to C{str} titers, or C{None}.
+    @raise ValueError: if a method is unknown or a fixed titer doesn't match
+        its original titer.
+    @return: a C{list} of wide C{pandas.DataFrame}s (viruses as rows, sera as
+        columns), one per table.
+    """
+    pairs = getPairs(plate, viruses, adaptTiterSteps)
+    titers = getTiters(
+        plate,
+        pairs,
+        [(method, limit) for method, limit, _ in tables],
+        interpolate=interpolate,
+        nd=nd,
+        jobs=jobs,
+        fitter=fitter,
+        fitCache=fitCache,
+        fitStats=fitStats,
+        reuse=reuse,
+    )
+
+    if rawTiters is not None:
+        for (method, limit), prnts in titers.items():
+            rawTiters[method, limit] = {
+                (serum, virus): prnt for (serum, virus, _), prnt in zip(pairs, prnts)
+            }
+
+    return [
+        makeWideTable(
+            pd.DataFrame(
+                [
+                    (serum, virus, prnt)
+                    for (serum, virus, _), prnt in zip(pairs, titers[method, limit])
+                ],
+                columns=["serum", "virus", "prnt"],
+            ),
+            fixedTiterFile,
+        )
+        for method, limit, fixedTiterFile in tables
+    ]
+
+
+def makeTiterTableFiles(
+    plate,
+    viruses,
+    tables,
+    adaptTiterSteps=False,
+    interpolate=False,
+    nd="<20",
+    jobs=1,
+    fitter="neutcurve",
+    fitCache=None,
+    fitStats=None,
+    incremental=False,
+):
+    """
+    Make titer tables (see C{makeTiterTables}) and write them to CSV files.
+
+    If C{incremental} is C{True}, the hashes of the plaque counts of each
+    (serum, virus, replicate) block and the titers calculated from them are
+    stored next to each table (see C{cache.tableStateFile}). When a table is
+    made again, only the titers of the pairs whose blocks changed are
+    calculated, and tables whose contents didn't change are not written.
+    Fixed titers are always applied again.
+
+    @param plate: a C{plate.Plate}.
+    @param viruses: a C{list} of C{str} virus names.
+    @param tables: a C{list} of (method, limit, fixedTiterFile, outputFile)
+        C{tuple}s, one per table to make.
+    @param adaptTiterSteps: the C{str} name of a set of alternative titer
+        steps (see C{getTiterSteps}) or C{False}.
+    @param interpolate: If C{True} interpolate continuous titers that are out
+        of bounds of the dilutions tested.
+    @param nd: the lowest discrete titer level.
+    @param jobs: the C{int} number of processes to fit curves in.
+    @param fitter: the C{str} name of the fitter to use, one of
+        C{parseTiters.FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param fitStats: a C{list} to append a C{dict} describing each
+        continuous fit to, or C{None}. Only curves that are fitted are
+        described.
+    @param incremental: If C{True} only calculate the titers of pairs whose
+        plaque counts changed since the tables were last made.
+    @raise ValueError: if a method is unknown or a fixed titer doesn't match
+        its original titer.
+    @return: a C{list} of the C{int} numbers of titers calculated, one per
+        table.
+    """
+    reuse = {}
+    if incremental:
+        hashes = blockHashes(plate, getPairs(plate, viruses, adaptTiterSteps))
+        for method, limit, _, outputFile in tables:
+            previous = readTableState(
+                outputFile, tableKey(method, limit, interpolate, nd, fitter), hashes
+            )
+            if (method, limit) in reuse:
+                # Only reuse titers that are valid for all tables with the
+                # same method and limit.
+                previous = {
+                    pair: titer
+                    for pair, titer in previous.items()
+                    if reuse[method, limit].get(pair) == titer
+                }
+            reuse[method, limit] = previous
+
+    rawTiters = {}
+    titersWide = makeTiterTables(
+        plate,
+        viruses,
+        [
+            (method, limit, fixedTiterFile)
+            for method, limit, fixedTiterFile, _ in tables
+        ],
+        adaptTiterSteps=adaptTiterSteps,
+        interpolate=interpolate,
+        nd=nd,
+        jobs=jobs,
+        fitter=fitter,
+        fitCache=fitCache,
+        fitStats=fitStats,
+        reuse=reuse,
+        rawTiters=rawTiters,
+    )
+
+    calculated = []
+    for (method, limit, _, outputFile), table in zip(tables, titersWide):
+        calculated.append(
+            len(rawTiters[method, limit]) - len(reuse.get((method, limit), ()))
+        )
+        csv = table.to_csv()
+        if incremental:
+            if os.path.exists(outputFile):
+                with open(outputFile) as fp:
+                    unchanged = fp.read() == csv
+            else:
+                unchanged = False
+            if not unchanged:
+                with open(outputFile, "w") as fp:
+                    fp.write(csv)
+            writeTableState(
+                outputFile,
+                tableKey(method, limit, interpolate, nd, fitter),
+                hashes,
+                rawTiters[method, limit],
+            )
+        else:
+            with open(outputFile, "w") as fp:
+                fp.write(csv)
+
+    return calculated
+
+
+def _resumeLongTiters(fileName, key):
+    """
+    Prepare a long-format titer file to be appended to. A missing or empty
+    file gets a header, and an incomplete last line (left by an interrupted
+    run) is removed. If the file was written from other plaque counts or
+    with other options, its titers are removed so it is started over.
+
+    @param fileName: the C{str} name of the file.
+    @param key: the C{str} key returned by C{cache.longTitersKey} for the
+        titers to write.
+    @raise ValueError: if the file doesn't have the C{LONG_COLUMNS} header.
+    """
+    header = ",".join(LONG_COLUMNS) + "\n"
+    with open(fileName, "ab+") as fp:
+        fp.seek(0)
+        text = fp.read()
+        complete = text[: text.rfind(b"\n") + 1]
+        if complete and not complete.startswith(header.encode()):
+            raise ValueError(f"{fileName!r} is not a long-format titer file.")
+        if readLongTitersKey(fileName) != key:
+            complete = b""
+        if len(complete) < len(text):
+            fp.truncate(len(complete))
+        if not complete:
+            fp.write(header.encode())
+
+    # The key is only stored once stale titers are gone, so an interrupted
+    # start over is started over again.
+    writeLongTitersKey(fileName, key)
+
+
+def readLongTiters(fileName):
+    """
+    Read a long-format titer file written by C{streamTiterTables}.
+
+    @param fileName: the C{str} name of the file.
+    @return: a C{dict} mapping (serum, virus, method, limit) C{tuple}s to
+        (titer, flags) C{tuple}s. The limit is an C{int}, the other values
+        are C{str}s. If a titer is in the file more than once, the last one
+        is used.
+    """
+    with open(fileName, newline="") as fp:
+        reader = csv.reader(fp)
+        next(reader)
+        return {
+            (serum, virus, method, int(limit)): (titer, flags)
+            for serum, virus, method, limit, titer, flags in reader
+        }
+
+
+def streamTiterTables(
+    plate,
+    viruses,
+    tables,
+    fileName,
+    adaptTiterSteps=False,
+    interpolate=False,
+    nd="<20",
+    jobs=1,
+    fitter="neutcurve",
+    fitCache=None,
+    fitStats=None,
+    chunkSize=None,
+):
+    """
+    Make titer tables like C{makeTiterTables}, writing the titers of each
+    chunk of serum/virus pairs to a long-format CSV file as soon as they are
+    calculated. The file has C{LONG_COLUMNS} ('flags' says how the titer was
+    found, see C{getTiters}) and is flushed after each chunk. If it already
+    exists, e.g. because a previous run was interrupted, the pairs it has
+    all titers of are not calculated again. This is only done if the file
+    was written from the same plaque counts, titer steps, tables and
+    options, as recorded in a key file next to it (see
+    C{cache.longTitersKey}). Otherwise the file is started over. The tables
+    are made from the file at the end.
+
+    @param plate: a C{plate.Plate}.
+    @param viruses: a C{list} of C{str} virus names.
+    @param tables: a C{list} of (method, limit, fixedTiterFile) C{tuple}s, one
+        per table to make (see C{makeTiterTables}).
+    @param fileName: the C{str} name of the long-format file.
+    @param adaptTiterSteps: the C{str} name of a set of alternative titer
+        steps (see C{getTiterSteps}) or C{False}.
+    @param interpolate: If C{True} interpolate continuous titers that are out
+        of bounds of the dilutions tested.
+    @param nd: the lowest discrete titer level.
+    @param jobs: the C{int} number of processes to fit curves in.
+    @param fitter: the C{str} name of the fitter to use, one of
+        C{parseTiters.FITTERS}.
+    @param fitCache: a C{cache.FitCache} to reuse previous fits from, or
+        C{None}.
+    @param fitStats: a C{list} to append a C{dict} describing each
+        continuous fit to, or C{None}. Only curves that are fitted are
+        described.
+    @param chunkSize: the C{int} number of pairs to calculate the titers of
+        at a time. Defaults to 32 per process.
+    @raise ValueError: if a method is unknown, the file is not a long-format
+        titer file or a fixed titer doesn't match its original titer.
+    @return: a C{list} of wide C{pandas.DataFrame}s (viruses as rows, sera as
+        columns), one per table.
+    """
+    pairs = getPairs(plate, viruses, adaptTiterSteps)
+    limits = list(dict.fromkeys((method, limit) for method, limit, _ in tables))
+    for method, _ in limits:
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}.")
+    chunkSize = chunkSize or 32 * jobs
+
+    _resumeLongTiters(
+        fileName,
+        longTitersKey(
+            blockHashes(plate, pairs),
+            limits,
+            interpolate=interpolate,
+            nd=nd,
+            fitter=fitter,
+        ),
+    )
+    done = readLongTiters(fileName)
+    pending = [
+        pair
+        for pair in pairs
+        if any(
+            (pair[0], pair[1], method, limit) not in done for method, limit in limits
+        )
+    ]
+
+    with open(fileName, "a", newline="") as fp:
+        writer = csv.writer(fp)
+        for start in range(0, len(pending), chunkSize):
+            chunk = pending[start : start + chunkSize]
+            flags = {}
+            titers = getTiters(
+                plate,
+                chunk,
+                limits,
+                interpolate=interpolate,
+                nd=nd,
+                jobs=jobs,
+                fitter=fitter,
+                fitCache=fitCache,
+                fitStats=fitStats,
+                flags=flags,
+            )
+            writer.writerows(
+                (
+                    serum,
+                    virus,
+                    method,
+                    limit,
+                    titers[method, limit][i],
+                    flags[method, limit][i],
+                )
+                for i, (serum, virus, _) in enumerate(chunk)
+                for method, limit in limits
+            )
+            fp.flush()
+
+    done = readLongTiters(fileName)
+    return [
+        makeWideTable(
+            pd.DataFrame(
+                [
+                    (serum, virus, done[serum, virus, method, limit][0])
+                    for serum, virus, _ in pairs
+                ],
+                columns=["serum", "virus", "prnt"],
+            ),
+            fixedTiterFile,
+        )
+        for method, limit, fixedTiterFile in tables
+    ]
+
+
+def makeConfidenceIntervals(
+    plate,
+    viruses,
+    tables,
+    adaptTiterSteps=False,
+    resamples=1000,
+    confidence=0.95,
+    seed=0,
+    jobs=1,
+):
+    """
+    Make bootstrap confidence intervals of the continuous titers of all
+    serum/virus pairs (see C{bootstrap.bootstrapTiters}).
+
+    @param plate: a C{plate.Plate}.
+    @param viruses: a C{list} of C{str} virus names.
+    @param tables: a C{list} of (method, limit) C{tuple}s. Discrete methods
+        are ignored.
+    @param adaptTiterSteps: the C{str} name of a set of alternative titer
+        steps (see C{getTiterSteps}) or C{False}.
+    @param resamples: the C{int} number of resamples.
+    @param confidence: the C{float} confidence level of the intervals.
+    @param seed: the C{int} seed of the random streams.
+    @param jobs: the C{int} number of processes to fit the resamples in.
+    @raise ValueError: if a method is unknown.
+    @return: a C{pandas.DataFrame} with 'serum', 'virus', 'method', 'limit',
+        'lower', 'upper' and 'resamples' columns and one row per pair, method
+        and limit.
+    """
+    pairs = getPairs(plate, viruses, adaptTiterSteps)
+
+    continuousLimits = {}
+    for method, limit in tables:
+        if method in CONTINUOUS_METHODS:
+            limits = continuousLimits.setdefault(method, [])
+            if limit not in limits:
+                limits.append(limit)
+        elif method != "discrete":
+            raise ValueError(f"Unknown method {method!r}.")
+
+    rows = []
+    if continuousLimits:
+        datasets = getNeutcurveData(plate, pairs)
+        for method, limits in continuousLimits.items():
+            fixtop, fixbottom = CONTINUOUS_METHODS[method]
+            intervals = bootstrapTiters(
+                datasets,
+                limits,
+                fixtop=fixtop,
+                fixbottom=fixbottom,
+                resamples=resamples,
+                confidence=confidence,
+                seed=seed,
+                jobs=jobs,
+            )
+            for limit in limits:
+                limitIntervals = intervals[limit]
+                for i, (serum, virus, _) in enumerate(pairs):
+                    rows.append(
+                        (
+                            serum,
+                            virus,
+                            method,
+                            limit,
+                            limitIntervals["lower"][i],
+                            limitIntervals["upper"][i],
+                            limitIntervals["resamples"][i],
+                        )
+                    )
+
+    return pd.DataFrame(
+        rows,
+        columns=["serum", "virus", "method", "limit", "lower", "upper", "resamples"],
+    )
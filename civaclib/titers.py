@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 
 
 def logTiterToTiter(logTiter):
@@ -25,3 +26,21 @@ def getLogTiter(titer, dilutionStepSize=0):
     elif titer.startswith(">"):
         return np.log2(int(titer[1:]) / 10) + dilutionStepSize
     return np.log2(float(titer) / 10)
+
+
+def getLogTiters(titers, dilutionStepSize=0):
+    """
+    Convert many titers to log titers at once (see C{getLogTiter}).
+
+    @param titers: an iterable of C{str} titers. Numbers are also accepted.
+    @param dilutionStepSize: either 1, if discrete titers are used, or 0 if titers
+        are continuous.
+    @return: a C{numpy.ndarray} of C{float} log titers, C{nan} for '*'.
+    """
+    text = pd.Series(list(titers), dtype=object).astype(str)
+    below = text.str.startswith("<").to_numpy()
+    above = text.str.startswith(">").to_numpy()
+    values = pd.to_numeric(
+        text.str.lstrip("<>").where(text != "*"), errors="raise"
+    ).to_numpy(dtype=float)
+    return np.log2(values / 10) - dilutionStepSize * below + dilutionStepSize * above
@@ -0,0 +1,109 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from civaclib.bootstrap import _replicateGroups, bootstrapTiters, resampleReplicates
+from civaclib.common import TESTDATA, VIRUSES
+from civaclib.hill import _padData
+from civaclib.parseTiters import (
+    convertRawCountsToNeutcurveDf,
+    fitContinuousCurve,
+    getContinuousTiter,
+    parseTiterExcel,
+)
+from civaclib.plate import Plate
+
+
+def getDatasets():
+    """
+    Get the neutcurve data of the pairs of one serum.
+    """
+    plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+    return [
+        convertRawCountsToNeutcurveDf(plate.pair("1.3", virus))
+        for virus in plate.viruses
+    ]
+
+
+class TestResampleReplicates(TestCase):
+    """
+    Tests for the resampleReplicates function.
+    """
+
+    def testSameDilution(self):
+        """
+        Each resampled point must be one of the replicates of its dilution.
+        """
+        data = pd.DataFrame(
+            {
+                "concentration": [0.05, 0.025, 0.05, 0.025, 0.0125],
+                "fraction infectivity": [0.1, 0.5, 0.2, 0.6, 0.9],
+            }
+        )
+        cs, fs, mask = _padData([data])
+        starts, sizes = _replicateGroups(cs, mask)
+        resampled = resampleReplicates(fs, starts, sizes, 100, np.random.default_rng(0))
+        self.assertEqual((100, 1, 5), resampled.shape)
+        for c, f in zip(cs[0], resampled[:, 0].T):
+            expected = set(data["fraction infectivity"][data["concentration"] == c])
+            self.assertTrue(set(f) <= expected)
+        # Both replicates of the 1:40 dilution must be drawn.
+        self.assertEqual({0.5, 0.6}, set(resampled[:, 0, 1]))
+
+
+class TestBootstrapTiters(TestCase):
+    """
+    Tests for the bootstrapTiters function.
+    """
+
+    def testContainsTiter(self):
+        """
+        The intervals must contain the titer of the data.
+        """
+        datasets = getDatasets()
+        intervals = bootstrapTiters(datasets, resamples=50)[50]
+        for data, lower, upper in zip(datasets, intervals["lower"], intervals["upper"]):
+            if data.shape[0] == 0:
+                self.assertEqual(("*", "*"), (lower, upper))
+                continue
+            titer = getContinuousTiter(fitContinuousCurve(data))
+            if titer[0] not in "<>" and lower[0] not in "<>" and upper[0] not in "<>":
+                self.assertLessEqual(float(lower), float(titer) * 1.001)
+                self.assertGreaterEqual(float(upper), float(titer) * 0.999)
+
+    def testIdenticalReplicates(self):
+        """
+        If all replicates are the same, the interval must be a single titer.
+        """
+        cs = 1 / np.repeat([20, 40, 80, 160, 320, 640, 1280, 2560], 2)
+        data = pd.DataFrame(
+            {"concentration": cs, "fraction infectivity": 1 / (1 + (cs / 0.005) ** 2)}
+        )
+        intervals = bootstrapTiters([data], resamples=20)[50]
+        self.assertEqual(["200.00"], intervals["lower"])
+        self.assertEqual(["200.00"], intervals["upper"])
+        self.assertEqual([20], intervals["resamples"])
+
+    def testSeed(self):
+        """
+        The intervals must only depend on the seed, not on the number of
+        processes.
+        """
+        datasets = getDatasets()
+        options = dict(limits=[50, 90], resamples=20, chunkSize=5)
+        intervals = bootstrapTiters(datasets, seed=1, **options)
+        self.assertEqual(intervals, bootstrapTiters(datasets, seed=1, **options))
+        self.assertEqual(
+            intervals, bootstrapTiters(datasets, seed=1, jobs=2, **options)
+        )
+        self.assertNotEqual(intervals, bootstrapTiters(datasets, seed=2, **options))
+
+    def testNoData(self):
+        """
+        Pairs without data must have '*' intervals.
+        """
+        intervals = bootstrapTiters([getDatasets()[0].iloc[:0]], resamples=5)
+        self.assertEqual(
+            {50: {"lower": ["*"], "upper": ["*"], "resamples": [0]}}, intervals
+        )
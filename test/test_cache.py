@@ -0,0 +1,269 @@
+import os
+from os import listdir
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from civaclib.common import TESTDATA, VIRUSES
+from civaclib.cache import (
+    CACHE_VERSION,
+    FIT_CACHE_VERSION,
+    FitCache,
+    blockHashes,
+    fitKey,
+    loadParsedTiters,
+    longTitersKey,
+    parsedTitersKey,
+    tableKey,
+)
+from civaclib.parseTiters import (
+    convertRawCountsToNeutcurveDf,
+    fitContinuousCurve,
+    getContinuousTiter,
+    parseTiterExcel,
+)
+from civaclib.plate import Plate
+from civaclib.titerTable import getPairs
+
+
+class TestLoadParsedTiters(TestCase):
+    """
+    Tests for the loadParsedTiters function.
+    """
+
+    def testSameAsParsing(self):
+        """
+        The cached result must be identical to the result of parsing the
+        file, both when it's first written and when it's read back.
+        """
+        expected = parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True)
+
+        with TemporaryDirectory() as cacheDir:
+            written = loadParsedTiters(TESTDATA, 10, 3, VIRUSES, cacheDir=cacheDir)
+            read = loadParsedTiters(TESTDATA, 10, 3, VIRUSES, cacheDir=cacheDir)
+
+        pd.testing.assert_frame_equal(expected, written)
+        pd.testing.assert_frame_equal(expected, read)
+        self.assertEqual(
+            [type(value) for value in expected["1:160"]],
+            [type(value) for value in read["1:160"]],
+        )
+
+    def testFileIsOnlyParsedOnce(self):
+        """
+        The file must not be parsed again if it's in the cache.
+        """
+        with TemporaryDirectory() as cacheDir:
+            loadParsedTiters(TESTDATA, 10, 3, VIRUSES, cacheDir=cacheDir)
+            with patch("civaclib.cache.parseTiterExcel") as parse:
+                loadParsedTiters(TESTDATA, 10, 3, VIRUSES, cacheDir=cacheDir)
+            parse.assert_not_called()
+            self.assertEqual(1, len(listdir(f"{cacheDir}/parsed-titers")))
+
+    def testKeyDependsOnParameters(self):
+        """
+        The cache key must change if the parse parameters change.
+        """
+        ts = [
+            "1:20",
+            "1:40",
+            "1:54",
+            "1:108",
+            "1:216",
+            "1:432",
+            "1:864",
+            "1:1728",
+            "1:5120",
+        ]
+        self.assertNotEqual(
+            parsedTitersKey(TESTDATA, 10, 3, VIRUSES),
+            parsedTitersKey(TESTDATA, 10, 3, VIRUSES, serumColumnsNames=ts),
+        )
+        self.assertNotEqual(
+            parsedTitersKey(TESTDATA, 10, 3, VIRUSES),
+            parsedTitersKey(TESTDATA, 10, 3, VIRUSES[:-1]),
+        )
+
+
+class TestFitCache(TestCase):
+    """
+    Tests for the FitCache class.
+    """
+
+    def setUp(self):
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        self.datasets = [
+            convertRawCountsToNeutcurveDf(plate.pair(serum, "SARS-CoV-2_WT (984)"))
+            for serum in ("1.3", "2.1", "8.1")
+        ]
+
+    def testSameCurve(self):
+        """
+        A cached curve must be the same as a newly fitted curve, both when it
+        is held in memory and when it is read from disk.
+        """
+        data = self.datasets[0]
+        with TemporaryDirectory() as cacheDir:
+            expected = fitContinuousCurve(
+                data, fixtop=False, fitCache=FitCache(cacheDir)
+            )
+            for fitCache in FitCache(cacheDir), FitCache(cacheDir, maxEntries=0):
+                curve = fitCache.get(data, fixtop=False)
+                for name in "midpoint", "slope", "bottom", "top", "r2", "rmsd":
+                    self.assertEqual(getattr(expected, name), getattr(curve, name))
+                self.assertEqual(expected.params_stdev, curve.params_stdev)
+                for limit in 50, 90, 99:
+                    self.assertEqual(
+                        getContinuousTiter(expected, limit, interpolate=True),
+                        getContinuousTiter(curve, limit, interpolate=True),
+                    )
+                pd.testing.assert_frame_equal(expected.dataframe(), curve.dataframe())
+
+    def testCurveIsOnlyFittedOnce(self):
+        """
+        A curve must not be fitted again if it's in the cache.
+        """
+        data = self.datasets[0]
+        with TemporaryDirectory() as cacheDir:
+            fitContinuousCurve(data, fitCache=FitCache(cacheDir))
+            with patch("neutcurve.HillCurve.__init__") as init:
+                fitContinuousCurve(data, fitCache=FitCache(cacheDir))
+            init.assert_not_called()
+
+    def testKeyDependsOnOptionsAndData(self):
+        """
+        The cache key must change if the fit options, the fitter or the
+        data change.
+        """
+        data = self.datasets[0]
+        self.assertNotEqual(fitKey(data), fitKey(data, fixtop=False))
+        self.assertNotEqual(fitKey(data), fitKey(data, fixbottom=False))
+        self.assertNotEqual(fitKey(data), fitKey(data, fitter="batch"))
+        self.assertNotEqual(fitKey(data), fitKey(self.datasets[1]))
+
+    def testKeyVersion(self):
+        """
+        The cache key must change with the fit cache version, not with the
+        version of the cached parsed files.
+        """
+        data = self.datasets[0]
+        key = fitKey(data)
+        with patch("civaclib.cache.CACHE_VERSION", CACHE_VERSION + 1):
+            self.assertEqual(key, fitKey(data))
+        with patch("civaclib.cache.FIT_CACHE_VERSION", FIT_CACHE_VERSION + 1):
+            self.assertNotEqual(key, fitKey(data))
+
+    def testMemoryLimit(self):
+        """
+        Only the most recently used fits must be held in memory.
+        """
+        with TemporaryDirectory() as cacheDir:
+            fitCache = FitCache(cacheDir, maxEntries=2)
+            for data in self.datasets:
+                fitContinuousCurve(data, fitCache=fitCache)
+            self.assertEqual(
+                [fitKey(data) for data in self.datasets[1:]],
+                list(fitCache._memory),
+            )
+
+    def testEviction(self):
+        """
+        The least recently used files must be removed when the cache gets too
+        large.
+        """
+        with TemporaryDirectory() as cacheDir:
+            fitCache = FitCache(cacheDir)
+            fitContinuousCurve(self.datasets[0], fitCache=fitCache)
+            size = fitCache.diskBytes()
+
+            fitCache = FitCache(cacheDir, maxBytes=int(2.5 * size))
+            fitContinuousCurve(self.datasets[1], fitCache=fitCache)
+            # Make the second fit the least recently used one.
+            oldest = f"{cacheDir}/fits/{fitKey(self.datasets[1])}.json"
+            os.utime(oldest, (0, 0))
+            fitContinuousCurve(self.datasets[2], fitCache=fitCache)
+
+            self.assertEqual(
+                sorted(f"{fitKey(data)}.json" for data in self.datasets[::2]),
+                sorted(listdir(f"{cacheDir}/fits")),
+            )
+
+
+class TestBlockHashes(TestCase):
+    """
+    Tests for the blockHashes function.
+    """
+
+    def testChangedBlock(self):
+        """
+        Only the hash of the replicate whose plaque counts changed must
+        change.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        pairs = getPairs(plate, ["SARS-CoV-2_WT (984)"])
+        before = blockHashes(plate, pairs)
+        row = plate.replicateRows("1.3", "SARS-CoV-2_WT (984)", "PFU Ansatz 1")[0]
+        plate.counts[row, 3] += 1
+        after = blockHashes(plate, pairs)
+
+        self.assertEqual(before.keys(), after.keys())
+        for pair in before:
+            for replicate in before[pair]:
+                if pair == ("1.3", "SARS-CoV-2_WT (984)") and (
+                    replicate == "PFU Ansatz 1"
+                ):
+                    self.assertNotEqual(before[pair][replicate], after[pair][replicate])
+                else:
+                    self.assertEqual(before[pair][replicate], after[pair][replicate])
+
+    def testTiterSteps(self):
+        """
+        The hashes must change if the titer steps of a pair change.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        pairs = getPairs(plate, ["XBB.2"])
+        self.assertNotEqual(
+            blockHashes(plate, pairs)["1.1", "XBB.2"],
+            blockHashes(plate, getPairs(plate, ["XBB.2"], "230219-xbb2-bn131"))[
+                "1.1", "XBB.2"
+            ],
+        )
+
+    def testTableKey(self):
+        """
+        The table key must depend on the options that change the titers of
+        the table's method only.
+        """
+        self.assertNotEqual(tableKey("discrete", 50), tableKey("discrete", 90))
+        self.assertNotEqual(
+            tableKey("discrete", 50), tableKey("discrete", 50, nd="<10")
+        )
+        self.assertEqual(
+            tableKey("discrete", 50), tableKey("discrete", 50, interpolate=True)
+        )
+        self.assertNotEqual(
+            tableKey("continuous", 50), tableKey("continuous", 50, interpolate=True)
+        )
+        self.assertNotEqual(
+            tableKey("continuous", 50), tableKey("continuous", 50, fitter="batch")
+        )
+
+    def testLongTitersKey(self):
+        """
+        The key of a long-format titer file must depend on the plaque counts,
+        the tables and the options, but not on the order of the tables.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        pairs = getPairs(plate, ["SARS-CoV-2_WT (984)"])
+        limits = [("discrete", 50), ("continuous", 90)]
+        key = longTitersKey(blockHashes(plate, pairs), limits)
+        self.assertEqual(key, longTitersKey(blockHashes(plate, pairs), limits[::-1]))
+        self.assertNotEqual(key, longTitersKey(blockHashes(plate, pairs), limits[:1]))
+        self.assertNotEqual(
+            key,
+            longTitersKey(blockHashes(plate, pairs), limits, interpolate=True),
+        )
+        plate.counts[0, 3] += 1
+        self.assertNotEqual(key, longTitersKey(blockHashes(plate, pairs), limits))
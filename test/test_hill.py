@@ -0,0 +1,229 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from civaclib.common import TESTDATA, VIRUSES
+from civaclib.hill import (
+    fitHillCurves,
+    highestDilutions,
+    makeHillCurve,
+    makeHillCurves,
+    roundSignificant,
+    titerBounds,
+)
+from civaclib.parseTiters import (
+    convertRawCountsToNeutcurveDf,
+    fitContinuousCurve,
+    getContinuousTiter,
+    parseTiterExcel,
+)
+from civaclib.plate import Plate
+from civaclib.titerTable import CONTINUOUS_METHODS
+
+
+def makeData(concentrations, midpoint, slope, bottom=0.0, top=1.0, replicates=2):
+    """
+    Make neutcurve data that lies exactly on a Hill curve.
+    """
+    cs = np.repeat(concentrations, replicates)
+    return pd.DataFrame(
+        {
+            "concentration": cs,
+            "fraction infectivity": bottom
+            + (top - bottom) / (1 + (cs / midpoint) ** slope),
+        }
+    )
+
+
+def squaredError(curve):
+    """
+    Get the sum of squared residuals of a fitted curve.
+    """
+    return ((curve.fracinfectivity(curve.cs) - curve.fs) ** 2).sum()
+
+
+class TestFitHillCurves(TestCase):
+    """
+    Tests for the fitHillCurves function.
+    """
+
+    def testKnownParameters(self):
+        """
+        The parameters of curves the data lies on must be found, also if the
+        pairs have different numbers of data points.
+        """
+        concentrations = 1 / np.array([20, 40, 80, 160, 320, 640, 1280, 2560])
+        datasets = [
+            makeData(concentrations, 0.005, 2.0),
+            makeData(concentrations[:6], 0.02, 1.2, replicates=1),
+        ]
+        fits = fitHillCurves(datasets)
+        self.assertTrue(fits["converged"].all())
+        self.assertTrue(np.allclose([0.005, 0.02], fits["midpoint"]))
+        self.assertTrue(np.allclose([2.0, 1.2], fits["slope"]))
+
+    def testFreeTopAndBottom(self):
+        """
+        The top and bottom must be fitted if they aren't fixed.
+        """
+        concentrations = 1 / np.array([20, 40, 80, 160, 320, 640, 1280, 2560])
+        fits = fitHillCurves(
+            [makeData(concentrations, 0.005, 2.0, bottom=0.1, top=0.9)],
+            fixtop=False,
+            fixbottom=False,
+        )
+        self.assertTrue(fits["converged"][0])
+        self.assertAlmostEqual(0.1, fits["bottom"][0])
+        self.assertAlmostEqual(0.9, fits["top"][0])
+
+    def testWarmStart(self):
+        """
+        A fit started from the curve of a more constrained fit must find the
+        same parameters in fewer iterations.
+        """
+        concentrations = 1 / np.array([20, 40, 80, 160, 320, 640, 1280, 2560])
+        datasets = [makeData(concentrations, 0.005, 2.0, bottom=0.1, top=0.9)]
+        cold = fitHillCurves(datasets, fixtop=False, fixbottom=False)
+        warm = fitHillCurves(
+            datasets,
+            fixtop=False,
+            fixbottom=False,
+            initial=fitHillCurves(datasets, fixtop=True, fixbottom=False),
+        )
+        self.assertTrue(warm["converged"][0])
+        self.assertLess(warm["iterations"][0], cold["iterations"][0])
+        for name in "midpoint", "slope", "bottom", "top":
+            self.assertAlmostEqual(cold[name][0], warm[name][0])
+
+    def testFixedParameters(self):
+        """
+        Fixed tops and bottoms must stay at 1 and 0.
+        """
+        concentrations = 1 / np.array([20, 40, 80, 160, 320, 640, 1280, 2560])
+        data = makeData(concentrations, 0.005, 2.0, bottom=0.1, top=0.9)
+        fits = fitHillCurves([data], fixtop=True, fixbottom=False)
+        self.assertEqual(1.0, fits["top"][0])
+        self.assertEqual(0.0, fits["top_stdev"][0])
+        fits = fitHillCurves([data], fixtop=False, fixbottom=True)
+        self.assertEqual(0.0, fits["bottom"][0])
+        self.assertEqual(0.0, fits["bottom_stdev"][0])
+
+    def testSameAsNeutcurve(self):
+        """
+        The curves of the pairs of the test plate that converge must fit the
+        data at least as well as those of neutcurve, and the titers of the
+        curves with a fixed top and bottom must be the same.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        datasets = [
+            convertRawCountsToNeutcurveDf(plate.pair(serum, virus))
+            for serum in ("1.3", "5.1", "8.3")
+            for virus in plate.viruses
+        ]
+        datasets = [data for data in datasets if len(data)]
+
+        for fixtop, fixbottom in CONTINUOUS_METHODS.values():
+            fits = fitHillCurves(datasets, fixtop=fixtop, fixbottom=fixbottom)
+            self.assertGreater(fits["converged"].mean(), 0.75)
+            for data, curve, converged in zip(
+                datasets, makeHillCurves(datasets, fits), fits["converged"]
+            ):
+                if not converged:
+                    continue
+                expected = fitContinuousCurve(data, fixtop=fixtop, fixbottom=fixbottom)
+                self.assertLessEqual(
+                    squaredError(curve), squaredError(expected) * (1 + 1e-4) + 1e-10
+                )
+                if fixtop and fixbottom:
+                    titer = getContinuousTiter(curve)
+                    expectedTiter = getContinuousTiter(expected)
+                    if expectedTiter[0] in "<>":
+                        self.assertEqual(expectedTiter, titer)
+                    else:
+                        self.assertAlmostEqual(
+                            1.0, float(titer) / float(expectedTiter), places=2
+                        )
+
+
+class TestMakeHillCurve(TestCase):
+    """
+    Tests for the makeHillCurve function.
+    """
+
+    def testSameAsNeutcurve(self):
+        """
+        A curve made from the parameters of a neutcurve fit must be the same
+        as the fitted curve.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        data = convertRawCountsToNeutcurveDf(plate.pair("1.3", "SARS-CoV-2_WT (984)"))
+        expected = fitContinuousCurve(data)
+        curve = makeHillCurve(
+            data,
+            {
+                "midpoint": expected.midpoint,
+                "slope": expected.slope,
+                "bottom": expected.bottom,
+                "top": expected.top,
+            },
+        )
+        self.assertEqual(list(expected.cs), list(curve.cs))
+        self.assertEqual(expected.midpoint_bound, curve.midpoint_bound)
+        self.assertEqual(expected.midpoint_bound_type, curve.midpoint_bound_type)
+        self.assertAlmostEqual(expected.r2, curve.r2)
+        self.assertAlmostEqual(expected.rmsd, curve.rmsd)
+        for limit in 0.5, 0.9:
+            self.assertEqual(expected.icXX_str(limit), curve.icXX_str(limit))
+
+
+class TestTiterBounds(TestCase):
+    """
+    Tests for the roundSignificant, highestDilutions and titerBounds
+    functions.
+    """
+
+    def testRoundSignificant(self):
+        """
+        Concentrations must be rounded to three significant digits the way
+        they are printed, including 1 / 320, which rounds up.
+        """
+        self.assertEqual(
+            [0.00313, 0.000195, 0.05],
+            list(roundSignificant(np.array([1 / 320, 1 / 5120, 1 / 20]))),
+        )
+
+    def testHighestDilutions(self):
+        """
+        Concentrations that are the highest dilutions of the usual titer
+        series must be matched to them, and others to 0.
+        """
+        self.assertEqual(
+            [5120, 0, 320, 0],
+            list(highestDilutions(1 / np.array([5120, 1037, 320, 20]))),
+        )
+
+    def testAbove(self):
+        """
+        A bound above one of the highest dilutions of the usual titer series
+        must be the dilution. Other bounds must be as neutcurve gives them.
+        """
+        self.assertEqual(
+            [5120, 107, 1037, 320],
+            list(titerBounds(1 / np.array([5120, 108, 1037, 320]), above=True)),
+        )
+
+    def testBelow(self):
+        """
+        A bound below the lowest dilution must be as neutcurve gives it.
+        """
+        self.assertEqual(
+            [5128, 20, 64, 319],
+            list(titerBounds(1 / np.array([5120, 20, 65, 320]), above=False)),
+        )
+
+    def testEmpty(self):
+        """
+        There are no bounds for no concentrations.
+        """
+        self.assertEqual([], list(titerBounds(np.array([]), above=True)))
@@ -0,0 +1,200 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import pandas as pd
+
+from civaclib.cache import loadParsedTiters
+from civaclib.common import TESTDATA, VIRUSES
+from civaclib.manifest import buildManifest, groupManifest, readManifest
+from civaclib.plate import Plate
+from civaclib.titerTable import makeTiterTables
+
+VIRUS = "SARS-CoV-2_WT (984)"
+
+HEADER = "rawTiters,method,limit,fixedTiterFile,adaptTiterSteps,interpolate,output\n"
+
+
+def writeManifest(dirname, text, header=HEADER):
+    """
+    Write a manifest file.
+    """
+    fileName = os.path.join(dirname, "manifest.csv")
+    with open(fileName, "w") as fp:
+        fp.write(header + text)
+    return fileName
+
+
+class TestReadManifest(TestCase):
+    """
+    Tests for the readManifest function.
+    """
+
+    def testEntries(self):
+        """
+        File names must be relative to the manifest, and the values must be
+        converted.
+        """
+        with TemporaryDirectory() as dirname:
+            entries = readManifest(
+                writeManifest(
+                    dirname,
+                    "raw.csv,discrete,50,fixed.csv,,false,titers.csv\n"
+                    f"{TESTDATA},continuous,90,,230219-xbb2-bn131,true,"
+                    "out/titers.csv\n",
+                )
+            )
+        self.assertEqual(
+            {
+                "rawTiters": os.path.join(dirname, "raw.csv"),
+                "method": "discrete",
+                "limit": 50,
+                "fixedTiterFile": os.path.join(dirname, "fixed.csv"),
+                "adaptTiterSteps": False,
+                "interpolate": False,
+                "output": os.path.join(dirname, "titers.csv"),
+                "sheet": None,
+                "cellRange": None,
+                "rowTiterStart": 10,
+                "serumColumnsStart": 3,
+                "nd": "<20",
+            },
+            entries[0],
+        )
+        self.assertEqual(str(TESTDATA), entries[1]["rawTiters"])
+        self.assertIsNone(entries[1]["fixedTiterFile"])
+        self.assertEqual("230219-xbb2-bn131", entries[1]["adaptTiterSteps"])
+        self.assertTrue(entries[1]["interpolate"])
+
+    def testOptionalColumns(self):
+        """
+        Optional columns must be read if they're given.
+        """
+        with TemporaryDirectory() as dirname:
+            (entry,) = readManifest(
+                writeManifest(
+                    dirname,
+                    "raw.xlsx,discrete,50,,,false,titers.csv,Sheet1,12,<10\n",
+                    header=HEADER.strip() + ",sheet,rowTiterStart,nd\n",
+                )
+            )
+        self.assertEqual("Sheet1", entry["sheet"])
+        self.assertEqual(12, entry["rowTiterStart"])
+        self.assertEqual(3, entry["serumColumnsStart"])
+        self.assertEqual("<10", entry["nd"])
+
+    def testErrors(self):
+        """
+        A ValueError must be raised for missing columns and invalid values.
+        """
+        for header, text, error in (
+            ("method,limit\n", "", r"has no adaptTiterSteps, fixedTiterFile"),
+            (HEADER, "raw.csv,other,50,,,false,t.csv\n", r"^Line 2: unknown method"),
+            (HEADER, "raw.csv,discrete,x,,,false,t.csv\n", r"^Line 2: invalid limit"),
+            (HEADER, "raw.csv,discrete,50,,,maybe,t.csv\n", r"^Line 2: invalid true"),
+            (
+                HEADER,
+                "raw.csv,discrete,50,,other,no,t.csv\n",
+                r"^Line 2: unknown titer",
+            ),
+            (
+                HEADER,
+                "raw.csv,discrete,50,,,no,t.csv\nraw.csv,discrete,90,,,no,t.csv\n",
+                r"has an output more than once\.$",
+            ),
+        ):
+            with TemporaryDirectory() as dirname:
+                fileName = writeManifest(dirname, text, header=header)
+                self.assertRaisesRegex(ValueError, error, readManifest, fileName)
+
+
+class TestBuildManifest(TestCase):
+    """
+    Tests for the buildManifest function.
+    """
+
+    def testGroups(self):
+        """
+        Discrete tables must be grouped with the tables that don't
+        interpolate.
+        """
+        with TemporaryDirectory() as dirname:
+            entries = readManifest(
+                writeManifest(
+                    dirname,
+                    "raw.csv,discrete,50,,,true,d.csv\n"
+                    "raw.csv,continuous,50,,,false,c.csv\n"
+                    "raw.csv,continuous,90,,,true,ci.csv\n",
+                )
+            )
+        self.assertEqual(
+            [["d.csv", "c.csv"], ["ci.csv"]],
+            [
+                [os.path.basename(entry["output"]) for entry in group]
+                for group in groupManifest(entries).values()
+            ],
+        )
+
+    def testTables(self):
+        """
+        The tables must be the same as those made by makeTiterTables.
+        """
+        with TemporaryDirectory() as dirname:
+            entries = readManifest(
+                writeManifest(
+                    dirname,
+                    f"{TESTDATA},discrete,50,,,false,d.csv\n"
+                    f"{TESTDATA},continuous-fixtop-fixbottom,50,,,false,c.csv\n"
+                    f"{TESTDATA},continuous-fixtop-fixbottom,90,,,true,ci.csv\n",
+                )
+            )
+            calculated = buildManifest(entries, viruses=[VIRUS])
+            tables = [
+                pd.read_csv(os.path.join(dirname, name), index_col=0, dtype=str)
+                for name in ("d.csv", "c.csv", "ci.csv")
+            ]
+
+        plate = Plate(loadParsedTiters(TESTDATA, 10, 3, VIRUSES))
+        expected = makeTiterTables(
+            plate,
+            [VIRUS],
+            [("discrete", 50, None), ("continuous-fixtop-fixbottom", 50, None)],
+        ) + makeTiterTables(
+            plate,
+            [VIRUS],
+            [("continuous-fixtop-fixbottom", 90, None)],
+            interpolate=True,
+        )
+        for table, expectedTable in zip(tables, expected):
+            self.assertEqual(
+                expectedTable.to_dict(), table.rename_axis(columns="serum").to_dict()
+            )
+        self.assertEqual(
+            {entry["output"]: len(plate.sera) for entry in entries}, calculated
+        )
+
+    def testJobs(self):
+        """
+        The tables must be the same when the groups are made concurrently.
+        """
+        text = (
+            f"{TESTDATA},discrete,50,,,false,d.csv\n"
+            f"{TESTDATA},continuous-fixtop-fixbottom,50,,,false,c.csv\n"
+            f"{TESTDATA},continuous-fixtop-fixbottom,90,,,true,ci.csv\n"
+        )
+        contents = []
+        for jobs in 1, 2:
+            with TemporaryDirectory() as dirname:
+                fitStats = []
+                buildManifest(
+                    readManifest(writeManifest(dirname, text)),
+                    viruses=[VIRUS],
+                    jobs=jobs,
+                    fitStats=fitStats,
+                )
+                tables = []
+                for name in "d.csv", "c.csv", "ci.csv":
+                    with open(os.path.join(dirname, name)) as fp:
+                        tables.append(fp.read())
+                contents.append((tables, len(fitStats)))
+        self.assertEqual(contents[0], contents[1])
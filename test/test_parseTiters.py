@@ -1,15 +1,33 @@
+import csv
+from tempfile import TemporaryDirectory
 from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
 
 from civaclib.common import TESTDATA, titerSteps, VIRUSES, SERA, LIMIT
+from civaclib.hill import fitHillCurves, makeHillCurve
 from civaclib.parseTiters import (
+    FITTERS,
+    AllTiters,
+    fitContinuousCurve,
+    fitContinuousCurves,
+    getAllTiters,
+    getContinuousTiter,
+    getContinuousTiters,
     getPRNTDiscrete,
+    getPRNTDiscreteBatch,
     parseTiterExcel,
     averagePlaqueCounts,
     calculateFractionInfectivity,
     convertRawCountsToNeutcurveDf,
     convertRawCountsToDiscreteDf,
     getPRNTContinuous,
+    getPRNTContinuousBatch,
+    stepConcentrations,
 )
+from civaclib.plate import Plate, NOT_DONE
 
 
 class TestGetPRNTDiscrete(TestCase):
@@ -207,6 +225,107 @@ class TestGetPRNTDiscrete(TestCase):
         self.assertEqual("5120", prnt502)
 
 
+class TestGetPRNTDiscreteBatch(TestCase):
+    """
+    Tests for the getPRNTDiscreteBatch function.
+    """
+
+    def assertSameAsGetPRNTDiscrete(self, percent, notDone, limit, steps):
+        """
+        Check that the batched titers are the same as those of
+        getPRNTDiscrete.
+        """
+        expected = [
+            getPRNTDiscrete(
+                {
+                    step: "nd" if nd else value
+                    for step, value, nd in zip(steps, row, ndRow)
+                },
+                limit=limit,
+                steps=steps,
+                nd="<20",
+            )
+            for row, ndRow in zip(percent, notDone)
+        ]
+        self.assertEqual(
+            expected,
+            getPRNTDiscreteBatch(percent, notDone, limit=limit, steps=steps),
+        )
+
+    def testPlate(self):
+        """
+        The titers of all pairs of the test data must be the same as those of
+        getPRNTDiscrete, for all limits.
+        """
+        data = parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True)
+        plate = Plate(data.loc[data["Replicate"] == "Average"])
+        for limit in 50, 75, 90, 99:
+            self.assertSameAsGetPRNTDiscrete(
+                plate.neutralisationPercent(),
+                plate.flags == NOT_DONE,
+                limit,
+                titerSteps,
+            )
+
+    def testRandom(self):
+        """
+        The titers of random data must be the same as those of
+        getPRNTDiscrete, including values right at the limit and the 5%
+        cut-offs.
+        """
+        rng = np.random.default_rng(0)
+        percent = rng.uniform(-50, 100, (2000, 9))
+        special = rng.random(percent.shape) < 0.2
+        percent[special] = rng.choice([0, 45, 50, 55, 85, 90, 95], special.sum())
+        # Leading dilutions are not done for some pairs.
+        notDone = np.arange(9) < rng.integers(0, 10, (2000, 1))
+        for limit in 50, 90:
+            self.assertSameAsGetPRNTDiscrete(percent, notDone, limit, titerSteps)
+
+    def testNotDone(self):
+        """
+        If no titrations have been done, the titer must be '*'.
+        """
+        self.assertEqual(
+            ["*", "1280"],
+            getPRNTDiscreteBatch(
+                [[0] * 9, [100, 100, 100, 100, 100, 90, 40, 0, 0]],
+                [[True] * 9, [False] * 9],
+                limit=50,
+            ),
+        )
+
+    def testStepsPerPair(self):
+        """
+        Each pair can have its own dilution steps.
+        """
+        steps = [
+            titerSteps,
+            ["1:20", "1:32", "1:65", "1:130", "1:259", "1:518", "1:1037"]
+            + ["1:2560", "1:5120"],
+        ]
+        percent = [[100, 100, 100, 100, 100, 90, 40, 0, 0]] * 2
+        self.assertEqual(
+            ["1280", "1037"],
+            getPRNTDiscreteBatch(percent, np.zeros((2, 9), bool), steps=steps),
+        )
+
+    def testWrongSteps(self):
+        """
+        A ValueError must be raised if the number of dilution steps doesn't
+        match the data.
+        """
+        error = r"^Data dilutions do not match given dilutions\.$"
+        self.assertRaisesRegex(
+            ValueError,
+            error,
+            getPRNTDiscreteBatch,
+            [[100] * 9],
+            [[False] * 9],
+            steps=titerSteps[:-1],
+        )
+
+
 class TestParseTiterExcel(TestCase):
     """
     Test for the parseTiterExcel function.
@@ -310,6 +429,148 @@ class TestParseTiterExcel(TestCase):
             list(data.loc[610]),
         )
 
+    def testMissingVirusColumns(self):
+        """
+        If more viruses are given than there are blocks of titer columns in
+        the file, a ValueError must be raised.
+        """
+        error = r"^No titer columns found for these viruses: \['extra'\]$"
+        self.assertRaisesRegex(
+            ValueError,
+            error,
+            parseTiterExcel,
+            TESTDATA,
+            10,
+            3,
+            list(VIRUSES) + ["extra"],
+        )
+
+    def testWorkbook(self):
+        """
+        Parsing a sheet of a workbook must give the same result as parsing a
+        CSV export of it, also if the data is only in a range of the cells.
+        """
+        from openpyxl import Workbook
+
+        def cellValue(text):
+            for convert in int, float:
+                try:
+                    return convert(text)
+                except ValueError:
+                    pass
+            return text or None
+
+        workbook = Workbook()
+        workbook.active.title = "notes"
+        worksheet = workbook.create_sheet("counts")
+        worksheet["A1"] = "not part of the data"
+        with open(TESTDATA, encoding="utf-8-sig") as fp:
+            for rowIndex, row in enumerate(csv.reader(fp), start=3):
+                for colIndex, text in enumerate(row, start=2):
+                    worksheet.cell(rowIndex, colIndex, cellValue(text))
+
+        with TemporaryDirectory() as tmpDir:
+            fileName = f"{tmpDir}/counts.xlsx"
+            workbook.save(fileName)
+            lastCell = worksheet.cell(worksheet.max_row, worksheet.max_column)
+            data = parseTiterExcel(
+                fileName,
+                10,
+                3,
+                VIRUSES,
+                addAverage=True,
+                sheet="counts",
+                cellRange=f"B3:{lastCell.coordinate}",
+            )
+
+        pd.testing.assert_frame_equal(
+            parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True), data
+        )
+
+
+class TestFitContinuousCurves(TestCase):
+    """
+    Tests for the fitContinuousCurves function.
+    """
+
+    def getDatasets(self):
+        """
+        Get the neutcurve data of the pairs of one serum.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        return [
+            convertRawCountsToNeutcurveDf(plate.pair("1.3", virus))
+            for virus in plate.viruses
+        ]
+
+    def testBatch(self):
+        """
+        The batch fitter must give about the same titers as neutcurve, and
+        C{None} for pairs without data.
+        """
+        datasets = self.getDatasets()
+        datasets.append(datasets[0].iloc[:0])
+        curves = fitContinuousCurves(datasets, fitter="batch")
+        self.assertIsNone(curves[-1])
+        for data, curve in zip(datasets[:-1], curves):
+            self.assertAlmostEqual(
+                fitContinuousCurve(data).icXX(0.5), curve.icXX(0.5), places=6
+            )
+
+    def testNotConverged(self):
+        """
+        Pairs whose batch fit doesn't converge must be fitted by neutcurve.
+        """
+
+        def notConverged(*args, **kwargs):
+            fits = fitHillCurves(*args, **kwargs)
+            fits["converged"][:] = False
+            return fits
+
+        datasets = self.getDatasets()
+        with patch(
+            "civaclib.parseTiters.fitHillCurves", side_effect=notConverged
+        ), patch(
+            "civaclib.parseTiters.fitContinuousCurve", side_effect=fitContinuousCurve
+        ) as fit:
+            fitContinuousCurves(datasets, fitter="batch")
+        self.assertEqual(len(datasets), fit.call_count)
+
+    def testStats(self):
+        """
+        If asked for, the fit of each pair must be described, with an empty
+        C{dict} for pairs without data.
+        """
+        datasets = self.getDatasets()
+        datasets.append(datasets[0].iloc[:0])
+        for fitter in FITTERS:
+            stats = []
+            curves = fitContinuousCurves(datasets, fitter=fitter, stats=stats)
+            self.assertEqual(len(datasets), len(stats))
+            self.assertEqual({}, stats[-1])
+            for curve, pairStats in zip(curves[:-1], stats):
+                self.assertIn(pairStats["fitter"], {fitter, "batch+neutcurve"})
+                self.assertGreaterEqual(pairStats["seconds"], 0.0)
+                self.assertEqual(curve.midpoint, pairStats["midpoint"])
+                self.assertAlmostEqual(
+                    ((curve.fracinfectivity(curve.cs) - curve.fs) ** 2).sum(),
+                    pairStats["ssr"],
+                )
+                if fitter == "neutcurve":
+                    self.assertIsNone(pairStats["iterations"])
+                    self.assertTrue(pairStats["converged"])
+                else:
+                    self.assertGreater(pairStats["iterations"], 0)
+
+    def testUnknownFitter(self):
+        """
+        A ValueError must be raised if the fitter is unknown.
+        """
+        error = r"^Unknown fitter 'scipy'\.$"
+        self.assertRaisesRegex(
+            ValueError, error, fitContinuousCurves, self.getDatasets(), fitter="scipy"
+        )
+
 
 class TestAveragePlaqueCounts(TestCase):
     """
@@ -510,6 +771,26 @@ class TestConvertRawCountsToNeutcurveDf(TestCase):
         )
 
 
+class TestStepConcentrations(TestCase):
+    """
+    Tests for the stepConcentrations function.
+    """
+
+    def testConcentrations(self):
+        """
+        The concentrations must be the inverses of the dilutions.
+        """
+        self.assertEqual([1 / 20, 1 / 54], list(stepConcentrations(["1:20", "1:54"])))
+
+    def testShared(self):
+        """
+        The same steps must give the same read-only array.
+        """
+        concentrations = stepConcentrations(titerSteps)
+        self.assertIs(concentrations, stepConcentrations(tuple(titerSteps)))
+        self.assertFalse(concentrations.flags.writeable)
+
+
 class TestConvertRawCountsToDiscreteDf(TestCase):
     """
     Tests for the convertRawCountsToDiscreteDf function.
@@ -679,6 +960,114 @@ class TestConvertRawCountsToDiscreteDf(TestCase):
         )
 
 
+def makeCurve(steps, midpoint, slope=2.0, bottom=0.0, top=1.0):
+    """
+    Make a curve with known parameters fitted to the dilutions of a titer
+    series.
+    """
+    cs = np.array([1 / int(step.split(":")[1]) for step in steps])
+    return makeHillCurve(
+        pd.DataFrame({"concentration": cs, "fraction infectivity": 0.5}),
+        {"midpoint": midpoint, "slope": slope, "bottom": bottom, "top": top},
+    )
+
+
+class TestGetContinuousTiters(TestCase):
+    """
+    Tests for the getContinuousTiters function.
+    """
+
+    def testInRange(self):
+        """
+        A titer within the dilutions must be read from the curve.
+        """
+        curve = makeCurve(titerSteps, 1 / 100)
+        self.assertEqual(["100.00"], getContinuousTiters([curve]))
+        self.assertEqual(f"{1 / curve.icXX(0.9):.2f}", getContinuousTiter(curve, 90))
+
+    def testBounds(self):
+        """
+        Titers out of the range of the dilutions must be bounds on the
+        dilutions of each curve, also for adapted dilution series, as
+        neutcurve gives them.
+        """
+        adapted = ["1:20", "1:32", "1:65", "1:130", "1:259", "1:518", "1:1037"]
+        curves = [
+            makeCurve(titerSteps, 1 / 10),
+            makeCurve(titerSteps, 1 / 20000),
+            makeCurve(adapted[2:], 1 / 10),
+            makeCurve(adapted, 1 / 20000),
+            makeCurve(titerSteps[2:7], 1 / 10),
+        ]
+        self.assertEqual(
+            ["<20", ">5120", "<64", ">1037", "<80"], getContinuousTiters(curves)
+        )
+
+    def testInterpolate(self):
+        """
+        Titers above the highest dilution of the usual titer series must be
+        interpolated if asked for, however far out of range they are.
+        """
+        curves = [makeCurve(titerSteps, 1 / 8000), makeCurve(titerSteps, 1 / 20000)]
+        self.assertEqual(
+            ["8000.00", "20000.00"], getContinuousTiters(curves, interpolate=True)
+        )
+
+    def testInterpolateAdapted(self):
+        """
+        Titers above the highest dilution of an adapted dilution series must
+        not be interpolated.
+        """
+        adapted = ["1:20", "1:32", "1:65", "1:130", "1:259", "1:518", "1:1037"]
+        self.assertEqual(
+            [">1037"],
+            getContinuousTiters([makeCurve(adapted, 1 / 2000)], interpolate=True),
+        )
+
+    def testLimitNotReached(self):
+        """
+        If a curve doesn't reach the level of sensitivity at any
+        concentration, its titer must be a bound, or 'nan' if it is above the
+        highest dilution and is interpolated.
+        """
+        curves = [
+            makeCurve(titerSteps, 1 / 100, bottom=0.0, top=0.4),
+            makeCurve(titerSteps, 1 / 100, bottom=0.6, top=1.0),
+        ]
+        self.assertEqual([">5120", "<20"], getContinuousTiters(curves))
+        readouts = []
+        self.assertEqual(
+            ["nan", "<20"],
+            getContinuousTiters(curves, interpolate=True, readouts=readouts),
+        )
+        self.assertEqual(["not reached", "bound"], readouts)
+
+    def testReadouts(self):
+        """
+        If asked for, how each titer was read out must be given.
+        """
+        curves = [
+            makeCurve(titerSteps, 1 / 100),
+            makeCurve(titerSteps, 1 / 8000),
+            makeCurve(titerSteps, 1 / 20000),
+            makeCurve(titerSteps, 1 / 10),
+        ]
+        readouts = []
+        getContinuousTiters(curves, interpolate=True, readouts=readouts)
+        self.assertEqual(
+            ["in range", "interpolated", "interpolated", "bound"], readouts
+        )
+        readouts = []
+        getContinuousTiters(curves, readouts=readouts)
+        self.assertEqual(["in range", "bound", "bound", "bound"], readouts)
+
+    def testNoCurves(self):
+        """
+        Reading out no curves must give no titers.
+        """
+        self.assertEqual([], getContinuousTiters([]))
+
+
 class TestGetPRNTContinuous(TestCase):
     """
     Tests for the getPRNTContinuous function
@@ -741,6 +1130,218 @@ class TestGetPRNTContinuous(TestCase):
         )
 
 
+class TestGetPRNTContinuousBatch(TestCase):
+    """
+    Tests for the getPRNTContinuousBatch function.
+    """
+
+    def getDatasets(self):
+        """
+        Get the neutcurve data of the pairs of one serum.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        return [
+            convertRawCountsToNeutcurveDf(plate.pair("1.3", virus))
+            for virus in plate.viruses
+        ]
+
+    def testSameAsGetPRNTContinuous(self):
+        """
+        The titers must be the same as those of getPRNTContinuous, in the
+        order of the pairs.
+        """
+        datasets = self.getDatasets()
+        for fixtop, fixbottom in (True, True), (False, False):
+            self.assertEqual(
+                [
+                    getPRNTContinuous(data, fixtop=fixtop, fixbottom=fixbottom)[0]
+                    for data in datasets
+                ],
+                getPRNTContinuousBatch(datasets, fixtop=fixtop, fixbottom=fixbottom),
+            )
+
+    def testJobs(self):
+        """
+        Fitting the curves in several processes must give the same titers as
+        fitting them in this process, whatever the chunk size.
+        """
+        datasets = self.getDatasets()
+        expected = getPRNTContinuousBatch(datasets, limit=90, interpolate=True)
+        for chunkSize in None, 1, 5:
+            self.assertEqual(
+                expected,
+                getPRNTContinuousBatch(
+                    datasets,
+                    limit=90,
+                    interpolate=True,
+                    jobs=2,
+                    chunkSize=chunkSize,
+                ),
+            )
+
+
+class TestAllTiters(TestCase):
+    """
+    Tests for the AllTiters class.
+    """
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        self.data = self.plate.replicate("1.3", "SARS-CoV-2_WT (984)", "PFU Ansatz 1")
+
+    def testLazy(self):
+        """
+        No curve must be fitted before a titer is used, and then only the
+        curve of that titer.
+        """
+        with patch(
+            "civaclib.parseTiters.fitContinuousCurve", side_effect=fitContinuousCurve
+        ) as fit:
+            titers = AllTiters(self.data)
+            self.assertEqual(0, fit.call_count)
+            titers.titer("continuous-fixbottom")
+            self.assertEqual(
+                [(False, True)],
+                [
+                    (call.kwargs["fixtop"], call.kwargs["fixbottom"])
+                    for call in fit.call_args_list
+                ],
+            )
+
+    def testDataCopied(self):
+        """
+        Changing the data after an instance is made must not change its
+        titers.
+        """
+        expected = tuple(AllTiters(self.data))
+        data = self.data.copy()
+        titers = AllTiters(data)
+        data["Viruskontrolle"] = 1
+        self.assertEqual(expected, titers)
+
+    def testCached(self):
+        """
+        A curve must only be fitted once, however often its titer is used.
+        """
+        with patch(
+            "civaclib.parseTiters.fitContinuousCurve", side_effect=fitContinuousCurve
+        ) as fit:
+            titers = AllTiters(self.data)
+            tuple(titers)
+            tuple(titers)
+            titers.curve("continuous")
+        self.assertEqual(4, fit.call_count)
+
+    def testTuple(self):
+        """
+        An instance must unpack, index and slice like the tuple of the
+        discrete titer and the titers of the four continuous methods.
+        """
+        titers = AllTiters(self.data)
+        discrete, fixtopFixbottom, fixtop, fixbottom, free = titers
+        self.assertEqual(5, len(titers))
+        self.assertEqual(discrete, titers[0])
+        self.assertEqual(discrete, titers.discrete)
+        self.assertEqual(free, titers[-1])
+        self.assertEqual(fixtop, titers.titer("continuous-fixtop"))
+        self.assertEqual((fixtop, fixbottom), titers[2:4])
+        self.assertEqual(
+            (discrete, fixtopFixbottom, fixtop, fixbottom, free), AllTiters(self.data)
+        )
+
+    def testHashable(self):
+        """
+        An instance must hash and compare like the tuple of its titers, e.g.
+        to be stored in a set or used as a dict key.
+        """
+        titers = AllTiters(self.data)
+        self.assertEqual(hash(tuple(titers)), hash(titers))
+        self.assertIn(tuple(titers), {titers})
+
+    def testNoTitrations(self):
+        """
+        If no titrations were done, all titers must be '*' and there must be
+        no curves.
+        """
+        titers = AllTiters(self.plate.replicate("2.1", "BQ.1.18", "PFU Ansatz 1"))
+        self.assertEqual(("*", "*", "*", "*", "*"), titers)
+        self.assertIsNone(titers.curve("continuous"))
+
+    def testUnknownMethod(self):
+        """
+        A ValueError must be raised if a method is unknown.
+        """
+        error = r"^Unknown method 'continuous-fixnothing'\.$"
+        titers = AllTiters(self.data)
+        self.assertRaisesRegex(ValueError, error, titers.titer, "continuous-fixnothing")
+        self.assertRaisesRegex(ValueError, error, titers.curve, "continuous-fixnothing")
+
+
+class TestGetAllTiters(TestCase):
+    """
+    Tests for the getAllTiters function.
+    """
+
+    def setUp(self):
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        self.data = plate.replicate("1.3", "SARS-CoV-2_WT (984)", "PFU Ansatz 1")
+
+    def testMethods(self):
+        """
+        Only the titers of the requested methods must be returned, and they
+        must be the same as when all titers are requested.
+        """
+        discrete, fixtopFixbottom, fixtop, fixbottom, free = getAllTiters(self.data)
+        self.assertEqual(
+            (discrete, None, None, fixbottom, None),
+            getAllTiters(self.data, methods=["continuous-fixbottom"]),
+        )
+
+    def testOnlyRequestedCurvesAreFitted(self):
+        """
+        Only the curves of the requested methods must be fitted.
+        """
+        with patch(
+            "civaclib.parseTiters.fitContinuousCurve", side_effect=fitContinuousCurve
+        ) as fit:
+            tuple(getAllTiters(self.data, methods=["continuous-fixtop", "continuous"]))
+        self.assertEqual(
+            [(True, False), (False, False)],
+            [
+                (call.kwargs["fixtop"], call.kwargs["fixbottom"])
+                for call in fit.call_args_list
+            ],
+        )
+
+    def testWarmStart(self):
+        """
+        With the batch fitter, the curves with a free top or bottom must be
+        started from the more constrained curves.
+        """
+        with patch(
+            "civaclib.parseTiters.fitHillCurves", side_effect=fitHillCurves
+        ) as fit:
+            tuple(getAllTiters(self.data, fitter="batch"))
+        initials = [call.kwargs["initial"] for call in fit.call_args_list]
+        self.assertEqual(4, len(initials))
+        self.assertIsNone(initials[0])
+        for initial in initials[1:]:
+            self.assertEqual({"midpoint", "slope", "bottom", "top"}, set(initial))
+
+    def testUnknownMethod(self):
+        """
+        A ValueError must be raised if a method is unknown.
+        """
+        error = r"^Unknown method 'continuous-fixnothing'\.$"
+        self.assertRaisesRegex(
+            ValueError,
+            error,
+            getAllTiters,
+            self.data,
+            methods=["continuous-fixnothing"],
+        )
+
+
 class TestAveragePlaqueCounts(TestCase):
     """
     Tests for the averagePlaqueCounts function.
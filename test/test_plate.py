@@ -0,0 +1,261 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from civaclib.common import TESTDATA, VIRUSES
+from civaclib.parseTiters import (
+    parseTiterExcel,
+    averagePlaqueCounts,
+    calculateFractionInfectivity,
+)
+from civaclib.plate import (
+    COUNTED,
+    NOT_DONE,
+    ABOVE_SEEDING,
+    EQUAL_SEEDING,
+    encodePlaqueCounts,
+    decodePlaqueCounts,
+    averageReplicates,
+    fractionInfectivity,
+    neutralisationPercent,
+    categoricalColumns,
+    Plate,
+)
+from civaclib.registry import SERUM_REGISTRY, VIRUS_REGISTRY
+
+
+class TestEncodePlaqueCounts(TestCase):
+    """
+    Tests for the encodePlaqueCounts and decodePlaqueCounts functions.
+    """
+
+    def testEncode(self):
+        """
+        All kinds of plaque counts must be encoded correctly.
+        """
+        counts, flags = encodePlaqueCounts([["36", 12, 4.5, "nd", ">50", "e"]])
+        np.testing.assert_equal(
+            [[36.0, 12.0, 4.5, np.nan, 50.0, np.nan]],
+            counts,
+        )
+        self.assertEqual(
+            [
+                [
+                    COUNTED,
+                    COUNTED,
+                    COUNTED,
+                    NOT_DONE,
+                    ABOVE_SEEDING,
+                    EQUAL_SEEDING,
+                ]
+            ],
+            flags.tolist(),
+        )
+        self.assertEqual(np.int8, flags.dtype)
+
+    def testUnknown(self):
+        """
+        A ValueError must be raised if a value isn't a plaque count.
+        """
+        error = r"^Could not interpret plaque count '#DIV/0!'\.$"
+        self.assertRaisesRegex(ValueError, error, encodePlaqueCounts, ["3", "#DIV/0!"])
+
+    def testRoundTrip(self):
+        """
+        Decoding encoded plaque counts must give the original values.
+        """
+        values = ["36", "nd", ">50", "e"]
+        self.assertEqual(
+            [36.0, "nd", ">50", "e"],
+            list(decodePlaqueCounts(*encodePlaqueCounts(values))),
+        )
+
+
+class TestAverageReplicates(TestCase):
+    """
+    Tests for the averageReplicates function.
+    """
+
+    def testSameAsAveragePlaqueCounts(self):
+        """
+        The averages of all groups must be the same as calculated by
+        averagePlaqueCounts.
+        """
+        replicates = [
+            [["nd", "nd", "20", ">50"], ["nd", ">50", "30", ">50"]],
+            [
+                ["nd", ">50", "e", "13"],
+                ["nd", "nd", "10", "17"],
+                ["nd", ">50", "0", "e"],
+            ],
+            [["nd", ">50", "20", "30"]],
+        ]
+        vk = [53.0, 41.3, 12.0]
+        # Interleave the rows of the groups.
+        rows = [
+            (group, row)
+            for i in range(3)
+            for group, groupRows in enumerate(replicates)
+            for row in groupRows[i : i + 1]
+        ]
+
+        averages, flags = averageReplicates(
+            *encodePlaqueCounts([row for _, row in rows]),
+            vk,
+            [group for group, _ in rows],
+        )
+
+        result = decodePlaqueCounts(averages, flags)
+        for groupRows, groupVk, groupResult in zip(replicates, vk, result):
+            self.assertEqual(
+                [averagePlaqueCounts(counts, groupVk) for counts in zip(*groupRows)],
+                list(groupResult),
+            )
+
+
+class TestFractionInfectivity(TestCase):
+    """
+    Tests for the fractionInfectivity and neutralisationPercent functions.
+    """
+
+    values = [["nd", ">50", "e", "26", "13"], ["nd", "nd", "10", "40", "0"]]
+    vk = [52, 40]
+
+    def testFractionInfectivity(self):
+        """
+        The fraction infectivity must be the same as calculated by
+        calculateFractionInfectivity.
+        """
+        result = fractionInfectivity(*encodePlaqueCounts(self.values), self.vk)
+        for row, vk, resultRow in zip(self.values, self.vk, result):
+            for value, fraction in zip(row, resultRow):
+                expected = calculateFractionInfectivity(value, vk)
+                if expected == "nd":
+                    self.assertTrue(np.isnan(fraction))
+                else:
+                    self.assertEqual(expected, fraction)
+
+    def testNeutralisationPercent(self):
+        """
+        The neutralisation percentage must be the same as calculated by
+        calculateFractionInfectivity.
+        """
+        result = neutralisationPercent(*encodePlaqueCounts(self.values), self.vk)
+        for row, vk, resultRow in zip(self.values, self.vk, result):
+            for value, percent in zip(row, resultRow):
+                expected = calculateFractionInfectivity(
+                    value, vk, neutralisationPercent=True
+                )
+                if expected == "nd":
+                    self.assertTrue(np.isnan(percent))
+                else:
+                    self.assertEqual(expected, percent)
+
+
+class TestPlate(TestCase):
+    """
+    Tests for the Plate class.
+    """
+
+    def testPlate(self):
+        """
+        A parsed plate must be held as typed arrays.
+        """
+        data = parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True)
+        plate = Plate(data)
+
+        self.assertEqual(len(data), len(plate))
+        self.assertEqual(list(data.columns[5:]), plate.titerSteps)
+        self.assertEqual((len(data), 9), plate.counts.shape)
+        self.assertEqual(np.float64, plate.counts.dtype)
+        self.assertEqual(np.int8, plate.flags.dtype)
+
+        # The first row is ['nd', 'nd', 'nd', '36', '>50', ...].
+        self.assertEqual(
+            [NOT_DONE] * 3 + [COUNTED] + [ABOVE_SEEDING] * 5,
+            plate.flags[0].tolist(),
+        )
+        self.assertEqual(36.0, plate.counts[0, 3])
+        self.assertEqual(
+            ["nd", "nd", "nd", 36.0] + [">50"] * 5,
+            list(plate.toDataFrame().loc[0])[5:],
+        )
+
+    def testPairs(self):
+        """
+        The rows of a serum/virus pair and of single replicates must be the
+        same as found by scanning the whole plate.
+        """
+        data = parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True)
+        plate = Plate(data)
+        data = categoricalColumns(data)
+        virus = "SARS-CoV-2_WT (984)"
+
+        self.assertEqual(list(dict.fromkeys(data["sample ID"])), plate.sera)
+        self.assertEqual(list(dict.fromkeys(data["Antigen"])), plate.viruses)
+
+        # Numeric serum names are converted to str.
+        pd.testing.assert_frame_equal(
+            data.loc[(data["sample ID"] == "1.1") & (data["Antigen"] == virus)],
+            plate.pair(1.1, virus),
+        )
+        pd.testing.assert_frame_equal(
+            data.loc[
+                (data["sample ID"] == "1.1")
+                & (data["Antigen"] == virus)
+                & (data["Replicate"] == "PFU Ansatz 2")
+            ],
+            plate.replicate(1.1, virus, "PFU Ansatz 2"),
+        )
+
+    def testCategorical(self):
+        """
+        The serum and virus columns must be categorical, with the codes of
+        the registries.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        for column, registry in (
+            ("sample ID", SERUM_REGISTRY),
+            ("Antigen", VIRUS_REGISTRY),
+        ):
+            self.assertEqual(registry.dtype, plate.info[column].dtype)
+            self.assertEqual(registry.dtype, plate.df[column].dtype)
+            self.assertEqual(
+                [registry.code(name) for name in plate.info[column]],
+                list(plate.info[column].cat.codes),
+            )
+
+    def testUnknownNames(self):
+        """
+        Sera and viruses that are not in the registries must be given codes
+        after those of the registries.
+        """
+        data = parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True)
+        data["sample ID"] = data["sample ID"].replace("1.1", "13.1")
+        plate = Plate(data)
+        self.assertEqual(
+            len(SERUM_REGISTRY), plate.info["sample ID"].cat.categories.get_loc("13.1")
+        )
+        self.assertEqual("13.1", plate.sera[0])
+        self.assertEqual(3, len(plate.pair("13.1", VIRUSES[0])))
+        self.assertEqual(0, len(plate.pair("1.1", VIRUSES[0])))
+
+    def testVirusAlias(self):
+        """
+        Pairs must also be found with the aliases of their virus.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        pd.testing.assert_frame_equal(
+            plate.pair("1.1", "SARS-CoV-2_Alpha (21528)"),
+            plate.pair("1.1", "SARS-CoV-2_α (21528)"),
+        )
+        self.assertEqual(3, len(plate.pair("1.1", "SARS-CoV-2_α (21528)")))
+
+    def testMissingPair(self):
+        """
+        A pair that isn't on the plate must give an empty C{DataFrame}.
+        """
+        plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        self.assertEqual(0, len(plate.pair("1.1", "XBB.1.5")))
+        self.assertEqual(0, len(plate.replicate("1.1", "XBB.2", "PFU Ansatz 3")))
@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+import numpy as np
+
+from civaclib.common import SERA, VIRUSES
+from civaclib.registry import SERUM_REGISTRY, VIRUS_REGISTRY, Registry
+
+
+class TestRegistry(TestCase):
+    """
+    Tests for the Registry class.
+    """
+
+    def setUp(self):
+        self.registry = Registry(["a", "b", "c"], aliases={"α": "a"}, kind="letter")
+
+    def testCodes(self):
+        """
+        The code of a name must be its position, and aliases and numbers
+        must be looked up as names.
+        """
+        self.assertEqual([0, 1, 2], [self.registry.code(name) for name in "abc"])
+        self.assertEqual(0, self.registry.code("α"))
+        self.assertEqual(1, Registry(["1.1", "1.2"]).code(1.2))
+        self.assertIn("α", self.registry)
+        self.assertNotIn("d", self.registry)
+
+    def testUnknownName(self):
+        """
+        A KeyError must be raised for the code of an unknown name.
+        """
+        self.assertRaisesRegex(
+            KeyError, r"Unknown letter 'd'\.", self.registry.code, "d"
+        )
+
+    def testCategorical(self):
+        """
+        Categoricals must have the codes of the registry, with unknown names
+        after them and missing values kept missing.
+        """
+        categorical = self.registry.categorical(["c", "α", "e", None, "d", "e"])
+        self.assertEqual(("a", "b", "c", "e", "d"), tuple(categorical.categories))
+        np.testing.assert_equal([2, 0, 3, -1, 4, 3], categorical.codes)
+        np.testing.assert_equal([1, 2], self.registry.codes(["b", "c"]))
+
+    def testInvalid(self):
+        """
+        A ValueError must be raised for repeated names and invalid aliases.
+        """
+        self.assertRaisesRegex(
+            ValueError, r"^A name is given more than once\.$", Registry, ["a", "a"]
+        )
+        self.assertRaisesRegex(
+            ValueError,
+            r"^The alias 'b' is also a name\.$",
+            Registry,
+            ["a", "b"],
+            {"b": "a"},
+        )
+        self.assertRaisesRegex(
+            ValueError,
+            r"^The alias 'x' is for an unknown name\.$",
+            Registry,
+            ["a"],
+            {"x": "b"},
+        )
+
+    def testRegistries(self):
+        """
+        The viruses and sera of the data must have the first codes, in
+        order, and the Greek headers must be aliases.
+        """
+        self.assertEqual(VIRUSES, VIRUS_REGISTRY.names[: len(VIRUSES)])
+        self.assertEqual(tuple(SERA), SERUM_REGISTRY.names)
+        self.assertEqual(
+            "SARS-CoV-2_Delta (25853_23)",
+            VIRUS_REGISTRY.canonical("SARS-CoV-2_δ (25853_23)"),
+        )
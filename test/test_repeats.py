@@ -0,0 +1,144 @@
+from unittest import TestCase
+
+import numpy as np
+
+from civaclib.common import TESTDATA, VIRUSES, titerSteps
+from civaclib.parseTiters import getAllTiters, parseTiterExcel
+from civaclib.plate import Plate
+from civaclib.repeats import REPLICATES, getReplicateTiters, repeatVariation
+from civaclib.titers import getLogTiter
+
+VIRUS = "SARS-CoV-2_WT (984)"
+
+
+class TestGetReplicateTiters(TestCase):
+    """
+    Tests for the getReplicateTiters function.
+    """
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        self.pairs = [(serum, VIRUS, titerSteps) for serum in self.plate.sera[:6]]
+
+    def testSameAsGetAllTiters(self):
+        """
+        The titers of each replicate must be the same as those of
+        getAllTiters for the replicate, for all methods and limits.
+        """
+        tables = [
+            ("discrete", 50),
+            ("discrete", 90),
+            ("continuous-fixbottom", 50),
+            ("continuous-fixbottom", 90),
+        ]
+        titers = getReplicateTiters(self.plate, self.pairs, tables, interpolate=True)
+
+        for method, limit in tables:
+            for replicate in REPLICATES:
+                expected = []
+                for serum, virus, _ in self.pairs:
+                    allTiters = getAllTiters(
+                        self.plate.replicate(serum, virus, replicate),
+                        interpolate=True,
+                        limit=limit,
+                    )
+                    expected.append(
+                        allTiters.discrete
+                        if method == "discrete"
+                        else allTiters.titer(method)
+                    )
+                self.assertEqual(expected, titers[method, limit][replicate])
+
+    def testMissingReplicate(self):
+        """
+        Pairs without a replicate must have '*' titers.
+        """
+        titers = getReplicateTiters(
+            self.plate,
+            self.pairs[:2],
+            [("discrete", 50), ("continuous-fixtop", 50)],
+            replicates=("PFU Ansatz 1", "PFU Ansatz 3"),
+        )
+        self.assertEqual(["*", "*"], titers["discrete", 50]["PFU Ansatz 3"])
+        self.assertEqual(["*", "*"], titers["continuous-fixtop", 50]["PFU Ansatz 3"])
+        self.assertNotIn("*", titers["discrete", 50]["PFU Ansatz 1"])
+
+    def testUnknownMethod(self):
+        """
+        A ValueError must be raised if a method is unknown.
+        """
+        self.assertRaisesRegex(
+            ValueError,
+            r"^Unknown method 'continuous-fixnothing'\.$",
+            getReplicateTiters,
+            self.plate,
+            self.pairs,
+            [("continuous-fixnothing", 50)],
+        )
+
+
+class TestRepeatVariation(TestCase):
+    """
+    Tests for the repeatVariation function.
+    """
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        self.pairs = [(serum, VIRUS, titerSteps) for serum in self.plate.sera[:6]]
+        self.tables = [("discrete", 90), ("continuous-fixtop", 90)]
+
+    def testDifferences(self):
+        """
+        The differences must be those of the log2 titers of the replicates.
+        """
+        variation = repeatVariation(self.plate, self.pairs, self.tables)
+        titers = getReplicateTiters(self.plate, self.pairs, self.tables)
+        self.assertEqual(
+            ["serum", "virus", "discrete-90", "continuous-fixtop-90"],
+            list(variation.columns),
+        )
+        self.assertEqual(self.plate.sera[:6], list(variation["serum"]))
+        for method, limit in self.tables:
+            expected = [
+                getLogTiter(titer1, 1) - getLogTiter(titer2, 1)
+                for titer1, titer2 in zip(*titers[method, limit].values())
+            ]
+            np.testing.assert_equal(expected, variation[f"{method}-{limit}"].to_numpy())
+
+    def testFixedTiters(self):
+        """
+        A fixed titer must be used for both replicates.
+        """
+        serum = self.pairs[0][0]
+        variation = repeatVariation(
+            self.plate,
+            self.pairs,
+            self.tables,
+            fixedTiters={("discrete", 90): {(serum, VIRUS): "<20"}},
+        )
+        self.assertEqual(0.0, variation["discrete-90"][0])
+
+    def testJobs(self):
+        """
+        The differences must not depend on the number of processes.
+        """
+        variation = repeatVariation(self.plate, self.pairs, self.tables)
+        self.assertTrue(
+            variation.equals(
+                repeatVariation(self.plate, self.pairs, self.tables, jobs=2)
+            )
+        )
+
+    def testReplicates(self):
+        """
+        A ValueError must be raised if there are not two replicates.
+        """
+        self.assertRaisesRegex(
+            ValueError,
+            r"^Two replicates must be given, not 1\.$",
+            repeatVariation,
+            self.plate,
+            self.pairs,
+            self.tables,
+            replicates=("PFU Ansatz 1",),
+        )
@@ -0,0 +1,116 @@
+import os
+import re
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from civaclib.common import TESTDATA, VIRUSES
+from civaclib.parseTiters import parseTiterExcel
+from civaclib.plate import Plate
+from civaclib.titerCurves import (
+    PANEL_SIZE,
+    pageFileName,
+    renderTiterCurves,
+    titerCurvePage,
+)
+
+SERA = ["1.1", "1.2", "1.3"]
+
+
+class TestPageFileName(TestCase):
+    """
+    Tests for the pageFileName function.
+    """
+
+    def testOnePage(self):
+        """
+        With one page, the file name must not be changed.
+        """
+        self.assertEqual("curves.png", pageFileName("curves.png", SERA, 1))
+
+    def testPages(self):
+        """
+        Pages must be named after their sera.
+        """
+        self.assertEqual("curves-1.1.png", pageFileName("curves.png", ["1.1"], 3))
+        self.assertEqual("curves-1.1-1.3.png", pageFileName("curves.png", SERA, 2))
+
+
+class TestRenderTiterCurves(TestCase):
+    """
+    Tests for the titerCurvePage and renderTiterCurves functions.
+    """
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+        self.viruses = VIRUSES[:2]
+
+    def testPage(self):
+        """
+        A page must have one panel per pair, of the same size as in the
+        single figure of all pairs.
+        """
+        fig = titerCurvePage(self.plate, SERA[:2], self.viruses, limit=90)
+        self.assertEqual(4, len(fig.axes))
+        self.assertEqual(
+            (PANEL_SIZE[0] * 2, PANEL_SIZE[1] * 2), tuple(fig.get_size_inches())
+        )
+        self.assertTrue(fig.axes[1].get_title().startswith("1.1 (BA.2-2) vs "))
+
+    def testPages(self):
+        """
+        Each page must be saved to its own image and all pages to the PDF
+        file, with the same images with any number of processes.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "curves.png")
+            pdf = os.path.join(dirname, "curves.pdf")
+            fileNames = renderTiterCurves(
+                self.plate, SERA, self.viruses, fileName, rowsPerPage=2, pdf=pdf
+            )
+            self.assertEqual(
+                [
+                    os.path.join(dirname, "curves-1.1-1.2.png"),
+                    os.path.join(dirname, "curves-1.3.png"),
+                ],
+                fileNames,
+            )
+            with open(pdf, "rb") as fp:
+                self.assertEqual(2, len(re.findall(rb"/Type\s*/Page\b", fp.read())))
+
+            images = []
+            for name in fileNames:
+                with open(name, "rb") as fp:
+                    images.append(fp.read())
+            renderTiterCurves(
+                self.plate, SERA, self.viruses, fileName, rowsPerPage=2, jobs=2
+            )
+            for name, image in zip(fileNames, images):
+                with open(name, "rb") as fp:
+                    self.assertEqual(image, fp.read())
+
+    def testOnly(self):
+        """
+        Only the pages with the given sera must be drawn again.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "curves.png")
+            fileNames = renderTiterCurves(
+                self.plate, SERA, self.viruses[:1], fileName, rowsPerPage=1, only=[1.2]
+            )
+            self.assertEqual([os.path.join(dirname, "curves-1.2.png")], fileNames)
+            self.assertEqual(["curves-1.2.png"], os.listdir(dirname))
+
+    def testOnlyWithPDF(self):
+        """
+        A ValueError must be raised if only some pages would go in a PDF file.
+        """
+        self.assertRaisesRegex(
+            ValueError,
+            r"^All pages must be drawn to make a PDF file\.$",
+            renderTiterCurves,
+            self.plate,
+            SERA,
+            self.viruses,
+            only=["1.1"],
+            pdf="curves.pdf",
+        )
@@ -0,0 +1,599 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from civaclib.common import TESTDATA, VIRUSES, titerSteps
+from civaclib.parseTiters import (
+    convertRawCountsToNeutcurveDf,
+    fitContinuousCurve,
+    getPRNTContinuous,
+    parseTiterExcel,
+)
+from civaclib.plate import Plate
+from civaclib.titerTable import (
+    TITER_STEP_ADAPTATIONS,
+    applyFixedTiters,
+    fixedTiterConflicts,
+    fixedTiterLookup,
+    getTiterSteps,
+    loadTiterStepAdaptations,
+    makeConfidenceIntervals,
+    makeTiterTableFiles,
+    makeTiterTables,
+    readFixedTiters,
+    readLongTiters,
+    streamTiterTables,
+)
+
+VIRUS = "SARS-CoV-2_WT (984)"
+
+
+class TestGetTiterSteps(TestCase):
+    """
+    Tests for the getTiterSteps function.
+    """
+
+    def testDefault(self):
+        """
+        The default titer steps must be used if no adaptation is given.
+        """
+        self.assertEqual(titerSteps, getTiterSteps("8.3", "XBB.2"))
+
+    def testAdapted(self):
+        """
+        The adapted titer steps must be used for the pairs they apply to.
+        """
+        self.assertEqual("1:54", getTiterSteps("1.1", "XBB.2", "230219-xbb2-bn131")[2])
+        self.assertEqual(
+            "1:65", getTiterSteps("8.3", "BN.1.3.1", "230219-xbb2-bn131")[2]
+        )
+        self.assertEqual(
+            titerSteps, getTiterSteps("8.2", "BN.1.3.1", "230219-xbb2-bn131")
+        )
+
+    def testUnknownAdaptation(self):
+        """
+        A ValueError must be raised if the adaptation is unknown.
+        """
+        error = r"^Unknown titer step adaptation 'other'\.$"
+        self.assertRaisesRegex(ValueError, error, getTiterSteps, "1.1", VIRUS, "other")
+
+
+class TestLoadTiterStepAdaptations(TestCase):
+    """
+    Tests for the loadTiterStepAdaptations function.
+    """
+
+    def writeFile(self, dirname, text):
+        """
+        Write an adaptation file.
+        """
+        fileName = os.path.join(dirname, "adaptations.csv")
+        with open(fileName, "w") as fp:
+            fp.write("adaptation,serum,virus,steps\n" + text)
+        return fileName
+
+    def testAdaptations(self):
+        """
+        The adaptations in the file must be found, and pairs with the same
+        steps must share them.
+        """
+        self.assertEqual(("230219-xbb2-bn131",), TITER_STEP_ADAPTATIONS)
+        pairs = loadTiterStepAdaptations()["230219-xbb2-bn131"]
+        self.assertEqual(22, len(pairs))
+        self.assertIs(pairs["1.1", "XBB.2"], pairs["9.3", "BN.1.3.1"])
+        self.assertIs(pairs["8.1", "XBB.2"], pairs["8.3", "BN.1.3.1"])
+        self.assertIs(
+            pairs["1.1", "XBB.2"], getTiterSteps(1.1, "XBB.2", "230219-xbb2-bn131")
+        )
+
+    def testFile(self):
+        """
+        Adaptations must be read from the given file.
+        """
+        steps = "1:20 1:30 1:60 1:120 1:240 1:480 1:960 1:1920 1:3840"
+        with TemporaryDirectory() as dirname:
+            adaptations = loadTiterStepAdaptations(
+                self.writeFile(
+                    dirname, f"a,1.1,{VIRUS},{steps}\nb,1.1,{VIRUS},{steps}\n"
+                )
+            )
+        self.assertEqual({"a", "b"}, set(adaptations))
+        self.assertEqual(steps.split(), adaptations["a"]["1.1", VIRUS])
+        self.assertIs(adaptations["a"]["1.1", VIRUS], adaptations["b"]["1.1", VIRUS])
+
+    def testErrors(self):
+        """
+        A ValueError must be raised if a pair is given twice or its steps
+        are invalid.
+        """
+        steps = " ".join(titerSteps)
+        for text, error in (
+            (f"a,1.1,{VIRUS},{steps}\na,1.1,{VIRUS},{steps}\n", "more than once"),
+            (f"a,1.1,{VIRUS},1:20 1:40\n", r"line 2: expected 9 titer steps"),
+            (f"a,1.1,{VIRUS},{steps.replace('1:40', '40')}\n", "expected 9"),
+        ):
+            with TemporaryDirectory() as dirname:
+                self.assertRaisesRegex(
+                    ValueError,
+                    error,
+                    loadTiterStepAdaptations,
+                    self.writeFile(dirname, text),
+                )
+
+
+class TestApplyFixedTiters(TestCase):
+    """
+    Tests for the applyFixedTiters function.
+    """
+
+    def titersLong(self):
+        return pd.DataFrame(
+            {
+                "serum": ["1.1", "1.2", "12SE0030", "1.1"],
+                "virus": ["A", "A", "A", "B"],
+                "prnt": ["80", "<20", "830.37", "nan"],
+            }
+        )
+
+    def testReplace(self):
+        """
+        The titers of the pairs in the fixed titer file must be replaced,
+        whether the sera and original titers were read as numbers or not.
+        """
+        fixedTiters = pd.DataFrame(
+            {
+                "serum": [1.1, 1.2, 1.1],
+                "virus": ["A", "A", "B"],
+                "prnt": [160, 40, 5120],
+                "prntOrig": [80, "<20", float("nan")],
+            }
+        )
+        titersLong = applyFixedTiters(self.titersLong(), fixedTiters)
+        self.assertEqual([160, 40, "830.37", 5120], list(titersLong["prnt"]))
+
+    def testContinuousOriginal(self):
+        """
+        Original continuous titers must be compared with two decimals.
+        """
+        fixedTiters = pd.DataFrame(
+            {
+                "serum": ["12SE0030"],
+                "virus": ["A"],
+                "prnt": ["5120"],
+                "prntOrig": [830.371],
+            }
+        )
+        titersLong = applyFixedTiters(self.titersLong(), fixedTiters)
+        self.assertEqual("5120", titersLong["prnt"][2])
+
+    def testAllConflicts(self):
+        """
+        All conflicts must be reported at once, and no titer replaced.
+        """
+        fixedTiters = pd.DataFrame(
+            {
+                "serum": [1.1, 1.2, 1.3, 1.1],
+                "virus": ["A", "A", "A", "B"],
+                "prnt": [160, 40, 40, 5120],
+                "prntOrig": [40, "<20", "<20", "<20"],
+            }
+        )
+        titersLong = self.titersLong()
+        error = (
+            r"^For 1\.1 vs A, the original titers differ \(80 vs 40\)\.\n"
+            r"For 1\.3 vs A, the pair is not in the table\.\n"
+            r"For 1\.1 vs B, the original titers differ \(nan vs <20\)\.$"
+        )
+        self.assertRaisesRegex(
+            ValueError, error, applyFixedTiters, titersLong, fixedTiters
+        )
+        self.assertEqual(list(self.titersLong()["prnt"]), list(titersLong["prnt"]))
+
+        conflicts = fixedTiterConflicts(titersLong, fixedTiters)
+        self.assertEqual(["1.1", "1.3", "1.1"], list(conflicts["serum"]))
+        self.assertEqual(["A", "A", "B"], list(conflicts["virus"]))
+        self.assertEqual(
+            [
+                "the original titers differ (80 vs 40)",
+                "the pair is not in the table",
+                "the original titers differ (nan vs <20)",
+            ],
+            list(conflicts["reason"]),
+        )
+
+    def testDuplicate(self):
+        """
+        A pair given more than once must be a conflict.
+        """
+        fixedTiters = pd.DataFrame(
+            {
+                "serum": ["1.1", "1.1"],
+                "virus": ["A", "A"],
+                "prnt": [160, 320],
+                "prntOrig": [80, 80],
+            }
+        )
+        conflicts = fixedTiterConflicts(self.titersLong(), fixedTiters)
+        self.assertEqual(
+            ["the pair is given more than once"] * 2, list(conflicts["reason"])
+        )
+
+    def testNoFixedTiters(self):
+        """
+        An empty fixed titer file must change nothing.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "fixed.csv")
+            with open(fileName, "w") as fp:
+                fp.write("serum,virus,prnt,prntOrig\n")
+            titersLong = applyFixedTiters(self.titersLong(), readFixedTiters(fileName))
+            self.assertEqual({}, fixedTiterLookup(fileName))
+        self.assertEqual(list(self.titersLong()["prnt"]), list(titersLong["prnt"]))
+
+
+class TestFixedTiterLookup(TestCase):
+    """
+    Tests for the fixedTiterLookup function.
+    """
+
+    def testLookup(self):
+        """
+        The fixed titers must be keyed by C{str} serum and virus.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "fixed.csv")
+            with open(fileName, "w") as fp:
+                fp.write(
+                    "serum,virus,prnt,prntOrig\n"
+                    "4.1,SARS-CoV-2_Alpha (21528),5120,nan\n"
+                    "7.1,SARS-CoV-2_WT (984),5442.78,<160\n"
+                )
+            self.assertEqual(
+                {
+                    ("4.1", "SARS-CoV-2_Alpha (21528)"): 5120.0,
+                    ("7.1", "SARS-CoV-2_WT (984)"): 5442.78,
+                },
+                fixedTiterLookup(fileName),
+            )
+
+
+class TestMakeTiterTables(TestCase):
+    """
+    Tests for the makeTiterTables function.
+    """
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+
+    def testTables(self):
+        """
+        One table must be returned per requested method and limit, with
+        viruses as rows and sera as columns.
+        """
+        discrete50, discrete90, continuous50 = makeTiterTables(
+            self.plate,
+            [VIRUS],
+            [
+                ("discrete", 50, None),
+                ("discrete", 90, None),
+                ("continuous-fixtop-fixbottom", 50, None),
+            ],
+        )
+        self.assertEqual([VIRUS], list(discrete50.index))
+        self.assertEqual(sorted(self.plate.sera), list(discrete50.columns))
+        self.assertEqual("320", discrete50.loc[VIRUS, "1.3"])
+        self.assertEqual("<160", discrete90.loc[VIRUS, "1.3"])
+
+        expected = getPRNTContinuous(
+            convertRawCountsToNeutcurveDf(self.plate.pair("1.3", VIRUS))
+        )[0]
+        self.assertEqual(expected, continuous50.loc[VIRUS, "1.3"])
+
+    def testCurvesAreFittedOnce(self):
+        """
+        The curve of a pair must only be fitted once per method, whatever the
+        number of limits.
+        """
+        with patch(
+            "civaclib.parseTiters.fitContinuousCurve", side_effect=fitContinuousCurve
+        ) as fit:
+            makeTiterTables(
+                self.plate,
+                [VIRUS],
+                [
+                    ("continuous-fixtop", 50, None),
+                    ("continuous-fixtop", 90, None),
+                    ("continuous-fixtop", 99, None),
+                ],
+            )
+        self.assertEqual(len(self.plate.sera), fit.call_count)
+
+    def testFitStats(self):
+        """
+        If asked for, each continuous fit must be described, with its pair,
+        method, titers and how they were read out.
+        """
+        fitStats = []
+        (table50,) = makeTiterTables(
+            self.plate,
+            [VIRUS],
+            [("continuous-fixtop", 50, None)],
+            fitStats=fitStats,
+        )
+        self.assertEqual(
+            sorted(
+                serum for serum in self.plate.sera if len(self.plate.pair(serum, VIRUS))
+            ),
+            sorted(stats["serum"] for stats in fitStats),
+        )
+        for stats in fitStats:
+            self.assertEqual(VIRUS, stats["virus"])
+            self.assertEqual("continuous-fixtop", stats["method"])
+            self.assertEqual("neutcurve", stats["fitter"])
+            self.assertEqual(table50.loc[VIRUS, stats["serum"]], stats["titer50"])
+            self.assertIn(stats["readout50"], {"in range", "bound"})
+
+    def testUnknownMethod(self):
+        """
+        A ValueError must be raised if a method is unknown.
+        """
+        error = r"^Unknown method 'continuous-fixnothing'\.$"
+        self.assertRaisesRegex(
+            ValueError,
+            error,
+            makeTiterTables,
+            self.plate,
+            [VIRUS],
+            [("continuous-fixnothing", 50, None)],
+        )
+
+
+class TestMakeTiterTableFiles(TestCase):
+    """
+    Tests for the makeTiterTableFiles function.
+    """
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+
+    def makeTables(self, dirname, incremental=True):
+        """
+        Make a discrete and a continuous table.
+        """
+        return makeTiterTableFiles(
+            self.plate,
+            [VIRUS],
+            [
+                ("discrete", 50, None, os.path.join(dirname, "discrete.csv")),
+                (
+                    "continuous-fixtop-fixbottom",
+                    50,
+                    None,
+                    os.path.join(dirname, "continuous.csv"),
+                ),
+            ],
+            incremental=incremental,
+        )
+
+    def testIncremental(self):
+        """
+        Only the titers of pairs whose plaque counts changed must be
+        calculated again, and the tables must be the same as when all titers
+        are calculated.
+        """
+        nPairs = len(self.plate.sera)
+        with TemporaryDirectory() as dirname, TemporaryDirectory() as expected:
+            self.assertEqual([nPairs, nPairs], self.makeTables(dirname))
+            self.assertTrue(os.path.exists(f"{dirname}/continuous.csv.blocks.json"))
+            self.assertEqual([0, 0], self.makeTables(dirname))
+
+            row = self.plate.replicateRows("1.3", VIRUS, "PFU Ansatz 2")[0]
+            self.plate.counts[row, 3] += 5
+            self.assertEqual([1, 1], self.makeTables(dirname))
+
+            self.assertEqual([nPairs, nPairs], self.makeTables(expected, False))
+            for name in "discrete.csv", "continuous.csv":
+                with open(os.path.join(dirname, name)) as fp:
+                    with open(os.path.join(expected, name)) as expectedFp:
+                        self.assertEqual(expectedFp.read(), fp.read())
+
+    def testOptionsChanged(self):
+        """
+        All titers must be calculated again if the options of a table change.
+        """
+        nPairs = len(self.plate.sera)
+        with TemporaryDirectory() as dirname:
+            self.makeTables(dirname)
+            self.assertEqual(
+                [nPairs],
+                makeTiterTableFiles(
+                    self.plate,
+                    [VIRUS],
+                    [("discrete", 50, None, os.path.join(dirname, "discrete.csv"))],
+                    nd="<10",
+                    incremental=True,
+                ),
+            )
+
+
+class TestStreamTiterTables(TestCase):
+    """
+    Tests for the streamTiterTables function.
+    """
+
+    TABLES = [
+        ("discrete", 50, None),
+        ("continuous-fixtop-fixbottom", 50, None),
+        ("continuous-fixtop-fixbottom", 90, None),
+    ]
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+
+    def testSameAsMakeTiterTables(self):
+        """
+        The tables must be the same as those of makeTiterTables, and the long
+        file must have a titer and flags per pair, method and limit.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "long.csv")
+            tables = streamTiterTables(
+                self.plate, [VIRUS], self.TABLES, fileName, chunkSize=5
+            )
+            long = readLongTiters(fileName)
+
+        for table, expected in zip(
+            tables, makeTiterTables(self.plate, [VIRUS], self.TABLES)
+        ):
+            self.assertTrue(table.equals(expected))
+
+        self.assertEqual(3 * len(self.plate.sera), len(long))
+        self.assertEqual(("320", "in range"), long["1.3", VIRUS, "discrete", 50])
+        self.assertEqual(
+            tables[1].loc[VIRUS, "1.3"],
+            long["1.3", VIRUS, "continuous-fixtop-fixbottom", 50][0],
+        )
+        self.assertEqual({"in range", "bound"}, {flags for _, flags in long.values()})
+
+    def testResume(self):
+        """
+        If the long file of an interrupted run is given, only the missing
+        titers must be calculated, and an incomplete last line ignored.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "long.csv")
+            expected = streamTiterTables(self.plate, [VIRUS], self.TABLES, fileName)
+            with open(fileName) as fp:
+                lines = fp.readlines()
+            with open(fileName, "w") as fp:
+                # The header, the titers of three pairs and part of a line.
+                fp.writelines(lines[:10])
+                fp.write(lines[10][:8])
+
+            fitStats = []
+            tables = streamTiterTables(
+                self.plate, [VIRUS], self.TABLES, fileName, fitStats=fitStats
+            )
+            with open(fileName) as fp:
+                self.assertEqual(lines, fp.readlines())
+
+        for table, expectedTable in zip(tables, expected):
+            self.assertTrue(table.equals(expectedTable))
+        self.assertNotIn(self.plate.sera[0], {stats["serum"] for stats in fitStats})
+        self.assertIn(self.plate.sera[-1], {stats["serum"] for stats in fitStats})
+
+    def testOptionsChanged(self):
+        """
+        If the long file was written with other options, its titers must not
+        be reused.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "long.csv")
+            streamTiterTables(self.plate, [VIRUS], self.TABLES, fileName)
+            fitStats = []
+            streamTiterTables(
+                self.plate,
+                [VIRUS],
+                self.TABLES,
+                fileName,
+                interpolate=True,
+                fitStats=fitStats,
+            )
+            long = readLongTiters(fileName)
+            with open(fileName) as fp:
+                self.assertEqual(1 + 3 * len(self.plate.sera), len(fp.readlines()))
+
+        self.assertEqual(len(self.plate.sera), len(fitStats))
+        self.assertEqual(3 * len(self.plate.sera), len(long))
+
+    def testCountsChanged(self):
+        """
+        If the long file was written from other plaque counts, its titers
+        must not be reused.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "long.csv")
+            streamTiterTables(self.plate, [VIRUS], self.TABLES, fileName)
+            row = self.plate.replicateRows("1.3", VIRUS, "PFU Ansatz 1")[0]
+            self.plate.counts[row, 3] += 1
+            fitStats = []
+            streamTiterTables(
+                self.plate, [VIRUS], self.TABLES, fileName, fitStats=fitStats
+            )
+
+        self.assertEqual(len(self.plate.sera), len(fitStats))
+
+    def testNotLongFile(self):
+        """
+        A ValueError must be raised if the file isn't a long-format titer
+        file.
+        """
+        with TemporaryDirectory() as dirname:
+            fileName = os.path.join(dirname, "long.csv")
+            with open(fileName, "w") as fp:
+                fp.write("virus,1.1\n")
+            error = r"is not a long-format titer file\.$"
+            self.assertRaisesRegex(
+                ValueError,
+                error,
+                streamTiterTables,
+                self.plate,
+                [VIRUS],
+                self.TABLES,
+                fileName,
+            )
+
+
+class TestMakeConfidenceIntervals(TestCase):
+    """
+    Tests for the makeConfidenceIntervals function.
+    """
+
+    def setUp(self):
+        self.plate = Plate(parseTiterExcel(TESTDATA, 10, 3, VIRUSES, addAverage=True))
+
+    def testIntervals(self):
+        """
+        There must be an interval per pair and continuous method and limit,
+        and none for discrete methods.
+        """
+        intervals = makeConfidenceIntervals(
+            self.plate,
+            [VIRUS],
+            [
+                ("discrete", 50),
+                ("continuous-fixtop-fixbottom", 50),
+                ("continuous-fixtop-fixbottom", 90),
+                ("continuous", 50),
+            ],
+            resamples=10,
+        )
+        self.assertEqual(3 * len(self.plate.sera), len(intervals))
+        self.assertEqual(
+            [
+                ("continuous-fixtop-fixbottom", 50),
+                ("continuous-fixtop-fixbottom", 90),
+                ("continuous", 50),
+            ],
+            list(dict.fromkeys(zip(intervals.method, intervals.limit))),
+        )
+        self.assertEqual({VIRUS}, set(intervals.virus))
+        self.assertTrue((intervals.resamples <= 10).all())
+
+    def testUnknownMethod(self):
+        """
+        A ValueError must be raised if a method is unknown.
+        """
+        error = r"^Unknown method 'continuous-fixnothing'\.$"
+        self.assertRaisesRegex(
+            ValueError,
+            error,
+            makeConfidenceIntervals,
+            self.plate,
+            [VIRUS],
+            [("continuous-fixnothing", 50)],
+        )